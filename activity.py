@@ -0,0 +1,310 @@
+"""
+Time-bucketed activity analytics.
+
+Writes are rolled up per entity, action and day into `activity_rollups` by
+triggers, and the last time each trope was touched (edited, re-categorised or
+given a new example) is kept in `trope_activity`. Reports aggregate the daily
+rows into day, week or month buckets, so their cost depends on the length of
+the requested range rather than on the number of rows in the catalogue. Weeks
+are ISO weeks (Monday to Sunday, labelled 2026-W01), so a week spanning New
+Year is one bucket.
+"""
+from datetime import date, timedelta
+
+import schema
+
+ENTITIES = ('tropes', 'works', 'examples')
+ACTIONS = ('created', 'updated', 'deleted')
+BUCKETS = ('day', 'week', 'month')
+
+# Default lookback per bucket size, and the most buckets one report may span
+DEFAULT_SPAN = {'day': 30, 'week': 12, 'month': 12}
+MAX_BUCKETS = 366
+
+# Caveats returned with the growth curves they apply to
+GROWTH_NOTES = {
+    'tropes': (
+        "Tropes have no creation time, so this curve counts the net tropes created "
+        "since activity tracking began and starts at 0, not at the catalogue size"
+    ),
+}
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+_TODAY = "date('now', 'localtime')"
+
+_BUMP = "ON CONFLICT (entity, action, day) DO UPDATE SET count = count + excluded.count"
+_TOUCH = (
+    "ON CONFLICT (trope_pk) DO UPDATE "
+    "SET touched_at = MAX(touched_at, excluded.touched_at)"
+)
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_activity_tropes_insert
+AFTER INSERT ON tropes
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('tropes', 'created', {_TODAY}, 1) {_BUMP};
+    INSERT INTO trope_activity (trope_pk, touched_at) VALUES (NEW.pk, {_NOW}) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_tropes_update
+AFTER UPDATE ON tropes
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('tropes', 'updated', {_TODAY}, 1) {_BUMP};
+    INSERT INTO trope_activity (trope_pk, touched_at) VALUES (NEW.pk, {_NOW}) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_tropes_delete
+AFTER DELETE ON tropes
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('tropes', 'deleted', {_TODAY}, 1) {_BUMP};
+    DELETE FROM trope_activity WHERE trope_pk = OLD.pk;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_trope_categories_insert
+AFTER INSERT ON trope_categories
+BEGIN
+    INSERT INTO trope_activity (trope_pk, touched_at)
+    SELECT NEW.trope_pk, {_NOW}
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = NEW.trope_pk) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_trope_categories_delete
+AFTER DELETE ON trope_categories
+BEGIN
+    INSERT INTO trope_activity (trope_pk, touched_at)
+    SELECT OLD.trope_pk, {_NOW}
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = OLD.trope_pk) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_works_insert
+AFTER INSERT ON works
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('works', 'created', substr(NEW.created_at, 1, 10), 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_works_update
+AFTER UPDATE OF updated_at ON works
+WHEN NEW.updated_at IS NOT OLD.updated_at
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('works', 'updated', substr(NEW.updated_at, 1, 10), 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_works_delete
+AFTER DELETE ON works
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('works', 'deleted', {_TODAY}, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_examples_insert
+AFTER INSERT ON examples
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('examples', 'created', substr(NEW.created_at, 1, 10), 1) {_BUMP};
+    INSERT INTO trope_activity (trope_pk, touched_at)
+    SELECT NEW.trope_pk, NEW.created_at
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = NEW.trope_pk) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_examples_update
+AFTER UPDATE ON examples
+WHEN NEW.updated_at IS NOT OLD.updated_at OR NEW.trope_pk IS NOT OLD.trope_pk
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('examples', 'updated', substr(NEW.updated_at, 1, 10), 1) {_BUMP};
+    INSERT INTO trope_activity (trope_pk, touched_at)
+    SELECT pk, NEW.updated_at FROM tropes
+    WHERE pk IN (NEW.trope_pk, OLD.trope_pk) {_TOUCH};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activity_examples_delete
+AFTER DELETE ON examples
+BEGIN
+    INSERT INTO activity_rollups (entity, action, day, count)
+    VALUES ('examples', 'deleted', {_TODAY}, 1) {_BUMP};
+    INSERT INTO trope_activity (trope_pk, touched_at)
+    SELECT OLD.trope_pk, {_NOW}
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = OLD.trope_pk) {_TOUCH};
+END;
+"""
+
+
+def ensure_schema(conn):
+    """Create timestamp indexes, rollup tables and triggers, backfilling once"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activity_rollups'"
+    ).fetchone()
+    # Touch times keyed by the public id predate schema version 3
+    if 'trope_id' in schema.columns(conn, 'trope_activity'):
+        conn.executescript("""
+        ALTER TABLE trope_activity RENAME TO trope_activity_v2;
+        CREATE TABLE trope_activity (
+            trope_pk INTEGER PRIMARY KEY,
+            touched_at TEXT NOT NULL
+        );
+        INSERT INTO trope_activity (trope_pk, touched_at)
+        SELECT t.pk, a.touched_at FROM trope_activity_v2 a JOIN tropes t ON t.id = a.trope_id;
+        DROP TABLE trope_activity_v2;
+        """)
+
+    conn.executescript("""
+    CREATE INDEX IF NOT EXISTS idx_works_created_at_id ON works (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_works_updated_at ON works (updated_at);
+    CREATE INDEX IF NOT EXISTS idx_examples_created_at_id ON examples (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_examples_updated_at ON examples (updated_at);
+
+    CREATE TABLE IF NOT EXISTS activity_rollups (
+        entity TEXT NOT NULL,
+        action TEXT NOT NULL,
+        day TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (entity, action, day)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS trope_activity (
+        trope_pk INTEGER PRIMARY KEY,
+        touched_at TEXT NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_trope_activity_touched_at
+        ON trope_activity (touched_at);
+    """ + _TRIGGERS)
+
+    if not exists:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute rollups from the timestamp columns.
+
+    Only works and examples carry timestamps, so trope rows and deletions
+    recorded before the rollups existed cannot be recovered.
+    """
+    conn.execute("DELETE FROM activity_rollups WHERE entity IN ('works', 'examples')")
+    for table in ('works', 'examples'):
+        conn.execute(f"""
+            INSERT INTO activity_rollups (entity, action, day, count)
+            SELECT '{table}', 'created', substr(created_at, 1, 10), COUNT(*)
+            FROM {table}
+            GROUP BY substr(created_at, 1, 10)
+        """)
+        conn.execute(f"""
+            INSERT INTO activity_rollups (entity, action, day, count)
+            SELECT '{table}', 'updated', substr(updated_at, 1, 10), COUNT(*)
+            FROM {table}
+            WHERE updated_at != created_at
+            GROUP BY substr(updated_at, 1, 10)
+        """)
+
+    conn.execute("""
+        INSERT INTO trope_activity (trope_pk, touched_at)
+        SELECT e.trope_pk, MAX(e.updated_at)
+        FROM examples e
+        JOIN tropes t ON t.pk = e.trope_pk
+        GROUP BY e.trope_pk
+    """ + _TOUCH)
+
+
+def _bucket_label(day, bucket):
+    if bucket == 'day':
+        return day.isoformat()
+    if bucket == 'week':
+        return day.strftime('%G-W%V')
+    return day.strftime('%Y-%m')
+
+
+# First day of each rollup day's bucket; weeks start on the Monday
+_BUCKET_SQL = {
+    'day': 'day',
+    'week': "date(day, 'weekday 0', '-6 days')",
+    'month': "substr(day, 1, 7) || '-01'",
+}
+
+
+def bucket_labels(start, end, bucket):
+    """Ordered bucket labels covering start..end inclusive"""
+    labels = []
+    day = start
+    while day <= end:
+        label = _bucket_label(day, bucket)
+        if not labels or labels[-1] != label:
+            labels.append(label)
+        day += timedelta(days=1)
+    return labels
+
+
+def default_range(bucket, today=None):
+    """Default (start, end) dates for a bucket size"""
+    end = today or date.today()
+    span = DEFAULT_SPAN[bucket]
+    if bucket == 'day':
+        start = end - timedelta(days=span - 1)
+    elif bucket == 'week':
+        start = end - timedelta(weeks=span - 1)
+    else:
+        month_index = end.year * 12 + end.month - 1 - (span - 1)
+        start = date(month_index // 12, month_index % 12 + 1, 1)
+    return start, end
+
+
+def activity_report(conn, bucket, start, end, entities=ENTITIES):
+    """Created/updated/deleted counts and growth curves per bucket.
+
+    Returns {'buckets': [...], 'series': {entity: {action: [counts]}},
+    'growth': {entity: [running totals]}, 'growth_notes': {entity: note}}
+    with one value per bucket label.
+    """
+    labels = bucket_labels(start, end, bucket)
+    positions = {label: index for index, label in enumerate(labels)}
+    bucket_sql = _BUCKET_SQL[bucket]
+
+    series = {}
+    growth = {}
+    for entity in entities:
+        counts = {action: [0] * len(labels) for action in ACTIONS}
+        rows = conn.execute(f"""
+            SELECT {bucket_sql} AS bucket, action, SUM(count)
+            FROM activity_rollups
+            WHERE entity = ? AND day BETWEEN ? AND ?
+            GROUP BY bucket, action
+        """, (entity, start.isoformat(), end.isoformat())).fetchall()
+        for first_day, action, count in rows:
+            label = _bucket_label(date.fromisoformat(first_day), bucket)
+            if label in positions and action in counts:
+                counts[action][positions[label]] = count
+        series[entity] = counts
+
+        # Net rows that existed before the range starts
+        baseline = conn.execute("""
+            SELECT COALESCE(SUM(CASE action WHEN 'created' THEN count
+                                            WHEN 'deleted' THEN -count ELSE 0 END), 0)
+            FROM activity_rollups
+            WHERE entity = ? AND day < ?
+        """, (entity, start.isoformat())).fetchone()[0]
+
+        running = baseline
+        curve = []
+        for created, deleted in zip(counts['created'], counts['deleted']):
+            running += created - deleted
+            curve.append(running)
+        growth[entity] = curve
+
+    notes = {entity: GROWTH_NOTES[entity] for entity in entities if entity in GROWTH_NOTES}
+    return {'buckets': labels, 'series': series, 'growth': growth, 'growth_notes': notes}
+
+
+def recently_touched_tropes(conn, limit=10):
+    """Tropes ordered by their most recent edit or example change"""
+    rows = conn.execute("""
+        SELECT t.id, t.name, ta.touched_at
+        FROM trope_activity ta
+        JOIN tropes t ON t.pk = ta.trope_pk
+        ORDER BY ta.touched_at DESC
+        LIMIT ?
+    """, (limit,)).fetchall()
+    return [{'id': row[0], 'name': row[1], 'touched_at': row[2]} for row in rows]
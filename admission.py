@@ -0,0 +1,180 @@
+"""
+Admission control and load shedding.
+
+Each request is put in a class by its endpoint (cheap reads, heavy reads,
+writes, exports; see classify) and must hold one of its class's slots while
+it runs. Slots are lock files under the admission directory taken with
+flock, so a limit holds across all gunicorn workers on the host, and a slot
+is released by the kernel if its worker dies.
+
+A request that finds every slot taken waits up to its class's `wait`, with
+at most `queue` requests of the class waiting per process. After that it is
+shed with 503 and Retry-After instead of piling up behind busy workers until
+gunicorn's timeout kills it. Requests whose X-Request-Start header (set by
+the proxy) shows they already waited MAX_REQUEST_AGE are shed straight away:
+their client has most likely given up. Health endpoints are always admitted.
+"""
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no flock on this platform
+    fcntl = None
+
+Limit = namedtuple('Limit', 'concurrency queue wait retry_after')
+
+# Host-wide running requests, per-process waiting requests, seconds a request
+# may wait for a slot and the Retry-After sent when it is shed
+CLASSES = {
+    'cheap': Limit(concurrency=32, queue=64, wait=0.5, retry_after=1),
+    'heavy': Limit(concurrency=4, queue=16, wait=1.0, retry_after=2),
+    'write': Limit(concurrency=8, queue=32, wait=2.0, retry_after=1),
+    'export': Limit(concurrency=1, queue=2, wait=0.0, retry_after=10),
+}
+
+HEALTH_ENDPOINTS = {'health', 'api_info', 'get_metrics', 'static'}
+HEAVY_ENDPOINTS = {
+    'search', 'get_analytics', 'get_activity_analytics', 'get_trope_duplicates',
+    'get_trope_neighborhood', 'get_examples', 'lookup', 'run_batch',
+}
+EXPORT_ENDPOINTS = {'export_csv', 'get_job_artifact'}
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Requests that spent longer than this queued in front of the app are shed
+MAX_REQUEST_AGE = 8.0
+
+# Seconds between slot scans while waiting; releases in this process wake
+# waiters immediately
+POLL_INTERVAL = 0.01
+
+
+class Shed(Exception):
+    """The request was not admitted"""
+
+    def __init__(self, request_class, reason, retry_after):
+        super().__init__(reason)
+        self.request_class = request_class
+        self.retry_after = retry_after
+
+
+def classify(endpoint, method):
+    """Request class for an endpoint, or None for requests that are always admitted"""
+    if endpoint in HEALTH_ENDPOINTS or endpoint is None:
+        return None
+    if endpoint in EXPORT_ENDPOINTS:
+        return 'export'
+    if endpoint in HEAVY_ENDPOINTS:
+        return 'heavy'
+    return 'cheap' if method in READ_METHODS else 'write'
+
+
+def request_age(header, now=None):
+    """Seconds since a proxy's X-Request-Start (t=<s|ms|us>), or None"""
+    if not header:
+        return None
+    value = header.strip()
+    value = value[2:] if value.startswith('t=') else value
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # nginx sends seconds with a fraction; others send ms or us
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return (now or time.time()) - started
+
+
+class Ticket:
+    """A held slot; release() gives it back"""
+
+    def __init__(self, controller, request_class, fd):
+        self.controller = controller
+        self.request_class = request_class
+        self.fd = fd
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.controller._released(self.request_class)
+
+
+class Controller:
+    """Grants per-class slots backed by lock files"""
+
+    def __init__(self, directory, classes=CLASSES):
+        # Callable returning the slot directory, resolved on every use
+        self.directory = directory
+        self.classes = classes
+        self._waiting = {name: 0 for name in classes}
+        self._cond = threading.Condition()
+        for name in classes:
+            metrics.set_gauge(f'admission.waiting.{name}', lambda name=name: self._waiting[name])
+
+    def admit(self, request_class, age=None):
+        """Ticket for a slot of the class, or Shed"""
+        limit = self.classes[request_class]
+        if age is not None and age > MAX_REQUEST_AGE:
+            raise self._shed(request_class, f"Request waited {age:.1f}s before reaching the server")
+
+        ticket = self._try(request_class, limit)
+        if ticket is not None:
+            metrics.incr(f'admission.admitted.{request_class}')
+            return ticket
+
+        with self._cond:
+            if self._waiting[request_class] >= limit.queue:
+                raise self._shed(request_class, f"Too many {request_class} requests waiting")
+            self._waiting[request_class] += 1
+        started = time.monotonic()
+        deadline = started + limit.wait
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._shed(request_class, f"No {request_class} capacity free within {limit.wait}s")
+                with self._cond:
+                    self._cond.wait(min(POLL_INTERVAL, remaining))
+                ticket = self._try(request_class, limit)
+                if ticket is not None:
+                    metrics.incr(f'admission.queued.{request_class}')
+                    metrics.observe('admission.wait_ms', (time.monotonic() - started) * 1000)
+                    return ticket
+        finally:
+            with self._cond:
+                self._waiting[request_class] -= 1
+
+    def _try(self, request_class, limit):
+        """Lock any free slot of the class without blocking"""
+        if fcntl is None:
+            return Ticket(self, request_class, None)
+        directory = self.directory()
+        os.makedirs(directory, exist_ok=True)
+        # Start at a random slot so concurrent requests do not all probe slot 0
+        first = random.randrange(limit.concurrency)
+        for i in range(limit.concurrency):
+            path = os.path.join(directory, f'{request_class}.{(first + i) % limit.concurrency}.lock')
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return Ticket(self, request_class, fd)
+        return None
+
+    def _released(self, request_class):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _shed(self, request_class, reason):
+        metrics.incr(f'admission.shed.{request_class}')
+        return Shed(request_class, reason, self.classes[request_class].retry_after)
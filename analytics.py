@@ -0,0 +1,397 @@
+"""
+Incrementally maintained analytics aggregates.
+
+All aggregates live in one `analytics_counters` table keyed by (metric, bucket)
+and are kept current by triggers on the base tables, so reading analytics costs
+O(number of buckets) no matter how many rows the catalogue holds.
+
+Metrics:
+    totals                   tropes, categories, works, examples, trope_categories
+    category_tropes          trope links per category id (0 for unused categories)
+    categories_per_trope     histogram: number of tropes with N categories
+    examples_by_work_type    examples per work type
+    works_by_decade          works per decade ('unknown' when year is empty)
+    category_cooccurrence    shared works per category pair ('<id>|<id>')
+
+`rebuild()` recomputes everything from scratch and `verify()` reports any drift
+between the maintained counters and a fresh computation.
+"""
+
+METRICS = (
+    'totals',
+    'category_tropes',
+    'categories_per_trope',
+    'examples_by_work_type',
+    'works_by_decade',
+    'category_cooccurrence',
+)
+
+_BUMP = "ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value"
+
+_DECADE_OLD = "CASE WHEN OLD.year IS NULL THEN 'unknown' ELSE CAST((CAST(OLD.year AS INTEGER) / 10) * 10 AS TEXT) END"
+_DECADE_NEW = "CASE WHEN NEW.year IS NULL THEN 'unknown' ELSE CAST((CAST(NEW.year AS INTEGER) / 10) * 10 AS TEXT) END"
+
+# Bucket for a category pair, whichever trope of the pair the rows come from
+_PAIR = "MIN(ca.id, cb.id) || '|' || MAX(ca.id, cb.id)"
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_analytics_tropes_insert
+AFTER INSERT ON tropes
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'tropes', 1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(COUNT(*) AS TEXT), 1
+    FROM trope_categories WHERE trope_pk = NEW.pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_tropes_delete
+AFTER DELETE ON tropes
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'tropes', -1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(COUNT(*) AS TEXT), -1
+    FROM trope_categories WHERE trope_pk = OLD.pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_categories_insert
+AFTER INSERT ON categories
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'categories', 1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_tropes', NEW.id, COUNT(*)
+    FROM trope_categories WHERE category_pk = NEW.pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_categories_delete
+AFTER DELETE ON categories
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'categories', -1) {_BUMP};
+    DELETE FROM analytics_counters WHERE metric = 'category_tropes' AND bucket = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_trope_categories_insert
+AFTER INSERT ON trope_categories
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'trope_categories', 1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_tropes', id, 1 FROM categories WHERE pk = NEW.category_pk
+    {_BUMP};
+
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(link_count - 1 AS TEXT), -1
+    FROM (SELECT COUNT(*) AS link_count FROM trope_categories WHERE trope_pk = NEW.trope_pk)
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = NEW.trope_pk)
+    {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(link_count AS TEXT), 1
+    FROM (SELECT COUNT(*) AS link_count FROM trope_categories WHERE trope_pk = NEW.trope_pk)
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = NEW.trope_pk)
+    {_BUMP};
+
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_cooccurrence', {_PAIR}, co.count
+    FROM categories ca
+    JOIN trope_cooccurrence co ON co.trope_pk = NEW.trope_pk
+    JOIN trope_categories tc ON tc.trope_pk = co.other_trope_pk
+    JOIN categories cb ON cb.pk = tc.category_pk
+    WHERE ca.pk = NEW.category_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_trope_categories_delete
+AFTER DELETE ON trope_categories
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'trope_categories', -1) {_BUMP};
+    UPDATE analytics_counters SET value = value - 1
+    WHERE metric = 'category_tropes'
+      AND bucket = (SELECT id FROM categories WHERE pk = OLD.category_pk);
+
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(link_count + 1 AS TEXT), -1
+    FROM (SELECT COUNT(*) AS link_count FROM trope_categories WHERE trope_pk = OLD.trope_pk)
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = OLD.trope_pk)
+    {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'categories_per_trope', CAST(link_count AS TEXT), 1
+    FROM (SELECT COUNT(*) AS link_count FROM trope_categories WHERE trope_pk = OLD.trope_pk)
+    WHERE EXISTS (SELECT 1 FROM tropes WHERE pk = OLD.trope_pk)
+    {_BUMP};
+
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_cooccurrence', {_PAIR}, -co.count
+    FROM categories ca
+    JOIN trope_cooccurrence co ON co.trope_pk = OLD.trope_pk
+    JOIN trope_categories tc ON tc.trope_pk = co.other_trope_pk
+    JOIN categories cb ON cb.pk = tc.category_pk
+    WHERE ca.pk = OLD.category_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_works_insert
+AFTER INSERT ON works
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'works', 1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    VALUES ('works_by_decade', {_DECADE_NEW}, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_works_delete
+AFTER DELETE ON works
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'works', -1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    VALUES ('works_by_decade', {_DECADE_OLD}, -1) {_BUMP};
+END;
+
+-- Runs before ON DELETE CASCADE removes the work's examples
+CREATE TRIGGER IF NOT EXISTS trg_analytics_works_before_delete
+BEFORE DELETE ON works
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', name, -(SELECT COUNT(*) FROM examples WHERE work_pk = OLD.pk)
+    FROM work_types WHERE id = OLD.type_id
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_works_update_year
+AFTER UPDATE OF year ON works
+WHEN OLD.year IS NOT NEW.year
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    VALUES ('works_by_decade', {_DECADE_OLD}, -1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    VALUES ('works_by_decade', {_DECADE_NEW}, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_works_update_type
+AFTER UPDATE OF type_id ON works
+WHEN OLD.type_id IS NOT NEW.type_id
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', name, -(SELECT COUNT(*) FROM examples WHERE work_pk = NEW.pk)
+    FROM work_types WHERE id = OLD.type_id
+    {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', name, (SELECT COUNT(*) FROM examples WHERE work_pk = NEW.pk)
+    FROM work_types WHERE id = NEW.type_id
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_examples_insert
+AFTER INSERT ON examples
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'examples', 1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', wt.name, 1
+    FROM works w JOIN work_types wt ON wt.id = w.type_id
+    WHERE w.pk = NEW.work_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_examples_delete
+AFTER DELETE ON examples
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value) VALUES ('totals', 'examples', -1) {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', wt.name, -1
+    FROM works w JOIN work_types wt ON wt.id = w.type_id
+    WHERE w.pk = OLD.work_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_examples_update_work
+AFTER UPDATE OF work_pk ON examples
+WHEN OLD.work_pk IS NOT NEW.work_pk
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', wt.name, -1
+    FROM works w JOIN work_types wt ON wt.id = w.type_id
+    WHERE w.pk = OLD.work_pk
+    {_BUMP};
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'examples_by_work_type', wt.name, 1
+    FROM works w JOIN work_types wt ON wt.id = w.type_id
+    WHERE w.pk = NEW.work_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_cooccurrence_insert
+AFTER INSERT ON trope_cooccurrence
+WHEN NEW.trope_pk < NEW.other_trope_pk
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_cooccurrence', {_PAIR}, NEW.count
+    FROM trope_categories ta
+    JOIN categories ca ON ca.pk = ta.category_pk
+    JOIN trope_categories tb ON tb.trope_pk = NEW.other_trope_pk
+    JOIN categories cb ON cb.pk = tb.category_pk
+    WHERE ta.trope_pk = NEW.trope_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_cooccurrence_update
+AFTER UPDATE OF count ON trope_cooccurrence
+WHEN NEW.trope_pk < NEW.other_trope_pk AND OLD.count != NEW.count
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_cooccurrence', {_PAIR}, NEW.count - OLD.count
+    FROM trope_categories ta
+    JOIN categories ca ON ca.pk = ta.category_pk
+    JOIN trope_categories tb ON tb.trope_pk = NEW.other_trope_pk
+    JOIN categories cb ON cb.pk = tb.category_pk
+    WHERE ta.trope_pk = NEW.trope_pk
+    {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_cooccurrence_delete
+AFTER DELETE ON trope_cooccurrence
+WHEN OLD.trope_pk < OLD.other_trope_pk
+BEGIN
+    INSERT INTO analytics_counters (metric, bucket, value)
+    SELECT 'category_cooccurrence', {_PAIR}, -OLD.count
+    FROM trope_categories ta
+    JOIN categories ca ON ca.pk = ta.category_pk
+    JOIN trope_categories tb ON tb.trope_pk = OLD.other_trope_pk
+    JOIN categories cb ON cb.pk = tb.category_pk
+    WHERE ta.trope_pk = OLD.trope_pk
+    {_BUMP};
+END;
+"""
+
+# Fresh computation of every metric straight from the base tables
+_FULL_QUERIES = {
+    'totals': """
+        SELECT 'tropes', COUNT(*) FROM tropes
+        UNION ALL SELECT 'categories', COUNT(*) FROM categories
+        UNION ALL SELECT 'works', COUNT(*) FROM works
+        UNION ALL SELECT 'examples', COUNT(*) FROM examples
+        UNION ALL SELECT 'trope_categories', COUNT(*) FROM trope_categories
+    """,
+    'category_tropes': """
+        SELECT c.id, COUNT(tc.trope_pk)
+        FROM categories c
+        LEFT JOIN trope_categories tc ON tc.category_pk = c.pk
+        GROUP BY c.pk
+    """,
+    'categories_per_trope': """
+        SELECT CAST(category_count AS TEXT), COUNT(*)
+        FROM (
+            SELECT (SELECT COUNT(*) FROM trope_categories tc WHERE tc.trope_pk = t.pk)
+                AS category_count
+            FROM tropes t
+        )
+        GROUP BY category_count
+    """,
+    'examples_by_work_type': """
+        SELECT wt.name, COUNT(*)
+        FROM examples e
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
+        GROUP BY wt.name
+    """,
+    'works_by_decade': """
+        SELECT CASE WHEN year IS NULL THEN 'unknown'
+                    ELSE CAST((CAST(year AS INTEGER) / 10) * 10 AS TEXT) END AS decade,
+               COUNT(*)
+        FROM works
+        GROUP BY decade
+    """,
+    'category_cooccurrence': f"""
+        SELECT {_PAIR} AS pair, SUM(co.count)
+        FROM trope_cooccurrence co
+        JOIN trope_categories ta ON ta.trope_pk = co.trope_pk
+        JOIN categories ca ON ca.pk = ta.category_pk
+        JOIN trope_categories tb ON tb.trope_pk = co.other_trope_pk
+        JOIN categories cb ON cb.pk = tb.category_pk
+        WHERE co.trope_pk < co.other_trope_pk
+        GROUP BY pair
+    """,
+}
+
+
+def ensure_schema(conn):
+    """Create the counters table and triggers, backfilling on first creation.
+
+    Depends on the co-occurrence table, so it must run after
+    `cooccurrence.ensure_schema()`.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analytics_counters'"
+    ).fetchone()
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS analytics_counters (
+        metric TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, bucket)
+    ) WITHOUT ROWID;
+    """ + _TRIGGERS)
+
+    if not exists:
+        rebuild(conn)
+
+
+def compute(conn):
+    """Compute every metric from the base tables: {metric: {bucket: value}}"""
+    return {
+        metric: {row[0]: row[1] for row in conn.execute(query).fetchall()}
+        for metric, query in _FULL_QUERIES.items()
+    }
+
+
+def rebuild(conn):
+    """Replace the maintained counters with a fresh computation"""
+    conn.execute('DELETE FROM analytics_counters')
+    for metric, buckets in compute(conn).items():
+        conn.executemany(
+            'INSERT INTO analytics_counters (metric, bucket, value) VALUES (?, ?, ?)',
+            [(metric, bucket, value) for bucket, value in buckets.items()]
+        )
+
+
+def load(conn, metric=None):
+    """Read maintained counters: {metric: {bucket: value}}"""
+    if metric:
+        rows = conn.execute(
+            'SELECT metric, bucket, value FROM analytics_counters WHERE metric = ?',
+            (metric,)
+        ).fetchall()
+    else:
+        rows = conn.execute('SELECT metric, bucket, value FROM analytics_counters').fetchall()
+
+    counters = {name: {} for name in METRICS}
+    for name, bucket, value in rows:
+        counters.setdefault(name, {})[bucket] = value
+    return counters
+
+
+def verify(conn):
+    """Compare maintained counters with a fresh computation.
+
+    Returns a list of (metric, bucket, maintained, expected) mismatches, treating
+    missing buckets as zero. An empty list means the aggregates are consistent.
+    """
+    maintained = load(conn)
+    expected = compute(conn)
+
+    mismatches = []
+    for metric in METRICS:
+        have = maintained.get(metric, {})
+        want = expected.get(metric, {})
+        for bucket in sorted(set(have) | set(want)):
+            if have.get(bucket, 0) != want.get(bucket, 0):
+                mismatches.append((metric, bucket, have.get(bucket, 0), want.get(bucket, 0)))
+    return mismatches
+
+
+def total(conn, name):
+    """Single maintained total, e.g. total(conn, 'examples')"""
+    row = conn.execute(
+        "SELECT value FROM analytics_counters WHERE metric = 'totals' AND bucket = ?",
+        (name,)
+    ).fetchone()
+    return row[0] if row else 0
@@ -1,28 +1,346 @@
-from flask import Flask, jsonify, request, render_template, send_file, make_response
+from flask import Flask, jsonify, request, render_template, send_file, make_response, copy_current_request_context, g
 from flask_cors import CORS
 import sqlite3
+import functools
+import json
 import os
 import uuid
 import csv
 import io
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, date, timedelta
+
+import activity
+import admission
+import analytics
+import assets
+import backup
+import batch
+import budgets
+import coalesce
+import compression
+import constraints
+import cooccurrence
+import dedup
+import fieldsets
+import jobs
+import maintenance
+import metrics
+import multiget
+import pagination
+import replica
+import schema
+import trope_detail
+import versioning
+import writer
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration later
+# Compress responses for clients that accept gzip or brotli
+app.wsgi_app = compression.Middleware(app.wsgi_app)
+
+# Content-hashed names written by scripts/build_assets.py
+asset_manifest = assets.Manifest(lambda: app.static_folder)
+
+@app.url_defaults
+def hashed_static_urls(endpoint, values):
+    """Make url_for('static', ...) point at the built, content-hashed file"""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = asset_manifest.resolve(values['filename'])
+
+def static_file(filename):
+    """Serve a static file, or its precompressed .br/.gz copy"""
+    hashed = assets.is_hashed(filename)
+    max_age = assets.IMMUTABLE_MAX_AGE if hashed else app.get_send_file_max_age(filename)
+    response = compression.send_static(app.static_folder, filename, request.headers.get('Accept-Encoding'),
+                                       max_age=max_age)
+    if hashed and response.status_code in (200, 304):
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
 
 # Database path
 DB_PATH = os.path.join(os.path.dirname(__file__), 'db', 'genre_tropes.db')
 
+# Seconds a connection waits on a locked database before SQLITE_BUSY
+BUSY_TIMEOUT = 5.0
+
+# Set to serve reads from snapshots published by a primary (see replica.py);
+# writes are then redirected to PRIMARY_URL, or refused when it is not set
+REPLICA_DIR = os.environ.get('TROPES_REPLICA_DIR') or None
+PRIMARY_URL = os.environ.get('TROPES_PRIMARY_URL') or None
+
+# Database paths whose supporting tables have been created by this process
+_initialized_db_paths = set()
+_init_lock = threading.Lock()
+
+def init_db(conn):
+    """Create supporting tables and indexes and backfill derived data"""
+    # WAL lets readers run alongside the writer and makes commits cheaper
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Core table migrations first: rebuilt tables get their triggers back below
+    schema.migrate(conn)
+    dedup.ensure_schema(conn)
+    dedup.ensure_index(conn)
+    cooccurrence.ensure_schema(conn)
+    analytics.ensure_schema(conn)
+    activity.ensure_schema(conn)
+    jobs.ensure_schema(conn)
+    trope_detail.ensure_schema(conn)
+    versioning.ensure_schema(conn)
+    pagination.ensure_indexes(conn)
+    constraints.ensure_schema(conn)
+    conn.commit()
+
 def get_db_connection():
     """Get a database connection"""
-    conn = sqlite3.connect(DB_PATH)
+    # Sub-requests of a batch and queued writes share their owner's connection
+    shared = batch.current_connection() or writer.current_connection()
+    if shared is not None:
+        return shared
+    
+    return open_db_connection()
+
+def open_db_connection(path=None):
+    """Open a new connection to path (default DB_PATH), creating supporting tables on first use"""
+    if REPLICA_DIR:
+        # Snapshots arrive migrated from the primary; replicas never write
+        conn = replica_reader.connect(timeout=BUSY_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        return budgets.install(conn)
+    
+    # Read once, so the path connected to is the path initialized below
+    path = path or DB_PATH
+    # Closing runs PRAGMA optimize so planner statistics follow the data
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, factory=maintenance.OptimizingConnection)
     conn.row_factory = sqlite3.Row  # This makes rows behave like dictionaries
-    return conn
+    # Safe with WAL: a crash can lose the last commits but never corrupts
+    conn.execute('PRAGMA synchronous=NORMAL')
+    # Writes rely on the declared foreign keys instead of checking first
+    conn.execute('PRAGMA foreign_keys=ON')
+    if path not in _initialized_db_paths:
+        with _init_lock:
+            if path not in _initialized_db_paths:
+                init_db(conn)
+                _initialized_db_paths.add(path)
+    # Statements on a request thread stop at the request's time budget
+    return budgets.install(conn)
+
+# Mutations run one at a time on this process's writer thread, group-committed
+write_coordinator = writer.WriteCoordinator(
+    connect=open_db_connection,
+    database_key=lambda: DB_PATH,
+    failed=lambda response: response.status_code >= 400
+)
+
+# Per-class concurrency limits shared by every worker on this host
+admission_controller = admission.Controller(lambda: os.path.join(os.path.dirname(DB_PATH), 'admission'))
+
+@app.before_request
+def admit_request():
+    """Hold a slot of the request's class while it runs, or shed it with 503"""
+    # Batch sub-requests run inside their batch's slot
+    if batch.current_connection() is not None:
+        return None
+    
+    request_class = admission.classify(request.endpoint, request.method)
+    if request_class is None:
+        return None
+    
+    try:
+        age = admission.request_age(request.headers.get('X-Request-Start'))
+        request.admission_ticket = admission_controller.admit(request_class, age)
+    except admission.Shed as e:
+        response = jsonify({"error": str(e), "class": e.request_class})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    ticket = getattr(request, 'admission_ticket', None)
+    if ticket is not None:
+        ticket.release()
+
+replica_reader = replica.Replica(lambda: REPLICA_DIR)
+
+# POST endpoints that only read, allowed on replicas
+READ_ONLY_POSTS = {'lookup', 'run_batch'}
+
+@app.before_request
+def replica_guard():
+    """On a replica, send writes to the primary and refuse reads from a stale snapshot"""
+    if not REPLICA_DIR or not request.path.startswith('/api'):
+        return None
+    
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and request.endpoint not in READ_ONLY_POSTS:
+        if PRIMARY_URL:
+            # 307 keeps the method and body
+            response = jsonify({"error": "Writes go to the primary", "primary": PRIMARY_URL})
+            response.headers['Location'] = PRIMARY_URL.rstrip('/') + request.full_path.rstrip('?')
+            return response, 307
+        return jsonify({"error": "This server is a read-only replica"}), 403
+    
+    try:
+        g.replica_manifest = replica_reader.check()
+    except replica.ReplicaError as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = str(int(replica.PUBLISH_INTERVAL) + 1)
+        return response, 503
+    return None
+
+@app.after_request
+def replica_headers(response):
+    """Tell clients which snapshot served the request and how far behind it is"""
+    manifest = g.get('replica_manifest')
+    if manifest is not None:
+        response.headers['X-Replica-Snapshot'] = manifest['snapshot']
+        response.headers['X-Replica-Lag'] = f"{replica_reader.lag(manifest):.3f}"
+    return response
+
+@app.before_request
+def start_query_budget():
+    """Give the request's SQL statements a deadline"""
+    request.query_budget = budgets.start(request.endpoint)
+
+@app.after_request
+def query_budget_response(response):
+    """Answer 503 for a request whose statement was stopped at its deadline"""
+    budget = getattr(request, 'query_budget', None)
+    if budget is None or not budget['aborted']:
+        return response
+    
+    metrics.incr('query_budget.aborts')
+    metrics.incr(f"query_budget.aborts.{budget['endpoint']}")
+    limit_ms = int(budgets.budget_for(budget['endpoint']) * 1000)
+    return app.make_response((jsonify({
+        "error": f"Query took longer than this endpoint's {limit_ms} ms budget",
+        "budget_ms": limit_ms
+    }), 503))
+
+@app.teardown_request
+def finish_query_budget(exc):
+    if getattr(request, 'query_budget', None) is not None:
+        budgets.finish()
+
+def submit_write(fn):
+    """Run fn on the writer thread; answer 503 only when the write did not happen.
+
+    A write still queued after writer.WRITE_TIMEOUT is cancelled, and a busy
+    database that outlasts the retries rolls the whole group back. Any other
+    error is a bug and goes to Flask's 500 handling.
+    """
+    try:
+        return write_coordinator.submit(fn)
+    except writer.WriteTimeout as e:
+        return jsonify({"error": str(e)}), 503
+    except sqlite3.OperationalError as e:
+        if not writer.is_busy_error(e):
+            raise
+        return jsonify({"error": f"Database is busy, the write was not applied: {e}"}), 503
+
+def serialized_write(view):
+    """Run a mutating view on the writer thread and return once it has committed"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Sub-requests of a batch are already on the writer thread
+        if batch.current_connection() is not None:
+            return view(*args, **kwargs)
+        
+        return submit_write(copy_current_request_context(lambda: app.make_response(view(*args, **kwargs))))
+    return wrapper
+
+# Identical concurrent GETs share one computation (see coalesce.py)
+request_coalescer = coalesce.Coalescer()
+data_version = coalesce.DataVersion()
+
+def current_data_version():
+    """Token that changes with every commit: the replica snapshot or PRAGMA data_version"""
+    return replica_reader.manifest()['snapshot'] if REPLICA_DIR else data_version(DB_PATH)
+
+def coalesced(view):
+    """Share one response among identical GETs at the same data version"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Batch sub-requests may see their batch's uncommitted writes, and the
+        # first request initializes the database, which moves the version
+        if request.method != 'GET' or batch.current_connection() is not None:
+            return view(*args, **kwargs)
+        if not REPLICA_DIR and DB_PATH not in _initialized_db_paths:
+            return view(*args, **kwargs)
+        
+        try:
+            version = current_data_version()
+        except (replica.ReplicaError, sqlite3.Error):
+            return view(*args, **kwargs)
+        
+        def compute():
+            response = app.make_response(view(*args, **kwargs))
+            return response.status_code, list(response.headers), response.get_data()
+        
+        key = (DB_PATH, version, request.path, request.query_string)
+        (status, headers, body), how = request_coalescer.run(
+            key, compute, shareable=lambda result: result[0] == 200
+        )
+        response = app.response_class(body, status=status, headers=headers)
+        if how in ('joined', 'cached'):
+            response.headers['X-Coalesced'] = how
+        return response
+    return wrapper
+
+# Serialized trope detail payloads, checked against trope_versions on every hit
+detail_cache = trope_detail.PayloadCache()
+
+def cached_json_response(body, cache_status):
+    """Build a JSON response from an already-serialized body"""
+    response = app.response_class(body, mimetype=app.json.mimetype)
+    response.headers['X-Cache'] = cache_status
+    return response
 
 def dict_from_row(row):
     """Convert sqlite3.Row to dictionary"""
     return {key: row[key] for key in row.keys()}
 
+# The API speaks UUIDs and type names; these look up the integer keys behind them.
+# An unknown id yields NULL, which the NOT NULL key columns reject.
+TROPE_PK = '(SELECT pk FROM tropes WHERE id = ?)'
+WORK_PK = '(SELECT pk FROM works WHERE id = ?)'
+CATEGORY_PK = '(SELECT pk FROM categories WHERE id = ?)'
+WORK_TYPE_ID = '(SELECT id FROM work_types WHERE name = ?)'
+
+# A work as the API returns it: its type by name and without the internal pk
+WORK_COLUMNS = f'id, title, {fieldsets.WORK_TYPE} AS type, year, author, description, created_at, updated_at, version'
+
+def missing_example_parent(conn, trope_id):
+    """Error for an example whose trope or work key did not resolve: its trope or else its work"""
+    trope = conn.execute("SELECT 1 FROM tropes WHERE id = ?", (trope_id,)).fetchone()
+    return "Trope not found" if not trope else "Work not found"
+
+def missing_or_modified(conn, table, row_id, label):
+    """Response for a conditional write that matched no row: 404 or 412"""
+    version = versioning.current_version(conn, table, row_id)
+    conn.close()
+    if version is None:
+        return jsonify({"error": f"{label} not found"}), 404
+    response = jsonify({"error": f"{label} has been modified since it was read", "version": version})
+    return versioning.with_etag(response, version), 412
+
+def sync_trope_categories(conn, trope_id, category_ids):
+    """Make a trope's category links match category_ids, writing only the links that change"""
+    conn.execute(
+        f'DELETE FROM trope_categories WHERE trope_pk = {TROPE_PK} '
+        'AND category_pk NOT IN (SELECT pk FROM categories WHERE id IN (SELECT value FROM json_each(?)))',
+        (trope_id, json.dumps(category_ids))
+    )
+    conn.executemany(
+        f'INSERT INTO trope_categories (trope_pk, category_pk) VALUES ({TROPE_PK}, {CATEGORY_PK}) '
+        'ON CONFLICT DO NOTHING',
+        [(trope_id, category_id) for category_id in dict.fromkeys(category_ids)]
+    )
+
 def format_category_name(name):
     """Convert category name to Title Case and replace underscores with spaces"""
     if not name:
@@ -63,10 +381,48 @@ def get_database_stats():
             'examples': 0
         }
 
+# Initial data embedded in the home page, keyed by database and data version
+bootstrap_cache = trope_detail.PayloadCache(maxsize=4)
+
+# Keys of the home page's data island and the API paths whose bodies they hold
+BOOTSTRAP_SOURCES = (('tropes', '/api/tropes'), ('categories', '/api/categories'))
+
+def bootstrap_json():
+    """The tropes and categories API bodies as one HTML-safe JSON object, or None"""
+    try:
+        version = current_data_version()
+    except (replica.ReplicaError, sqlite3.Error):
+        version = None
+    if version is not None:
+        body = bootstrap_cache.get(DB_PATH, version)
+        if body is not None:
+            return body
+    
+    parts = []
+    for key, path in BOOTSTRAP_SOURCES:
+        # Dispatched as the API path so coalescing shares the API's cache entry
+        with app.test_request_context(path):
+            response = app.make_response(app.view_functions[request.url_rule.endpoint]())
+        if response.status_code != 200:
+            return None
+        parts.append(f'"{key}":{response.get_data(as_text=True)}')
+    
+    # Escaped so no string in the data can close the <script> element
+    body = '{' + ','.join(parts) + '}'
+    body = body.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    if version is not None:
+        bootstrap_cache.put(DB_PATH, version, body)
+    return body
+
 @app.route('/')
 def home():
-    """Serve the main web interface"""
-    return render_template('index.html', title="Personal Trope Database")
+    """Serve the main web interface with the first tropes and categories embedded"""
+    return render_template('index.html', title="Personal Trope Database", bootstrap=bootstrap_json())
+
+@app.route('/api/health')
+def health():
+    """Liveness check; always admitted and never touches the database"""
+    return jsonify({"status": "ok", "pid": os.getpid()})
 
 @app.route('/api')
 def api_info():
@@ -76,16 +432,26 @@ def api_info():
         "version": "5.0.0",
         "description": "API for managing tropes, categories, works, and examples",
         "endpoints": {
+            "health": "/api/health",
             "categories": "/api/categories",
             "tropes": "/api/tropes",
             "trope_detail": "/api/tropes/{id}",
+            "trope_duplicates": "/api/tropes/duplicates",
+            "trope_cooccurring": "/api/tropes/{id}/cooccurring",
+            "trope_neighborhood": "/api/tropes/{id}/neighborhood",
             "works": "/api/works",
             "work_detail": "/api/works/{id}",
             "examples": "/api/examples", 
             "example_detail": "/api/examples/{id}",
             "search": "/api/search",
             "analytics": "/api/analytics",
-            "export_csv": "/api/export/csv"
+            "activity": "/api/analytics/activity",
+            "export_csv": "/api/export/csv",
+            "batch": "/api/batch",
+            "metrics": "/api/metrics",
+            "jobs": "/api/jobs",
+            "job_detail": "/api/jobs/{id}",
+            "job_artifact": "/api/jobs/{id}/artifact"
         },
         "features": [
             "Full CRUD operations for tropes",
@@ -100,51 +466,56 @@ def api_info():
     })
 
 @app.route('/api/tropes')
+@coalesced
 def get_tropes():
     """Get all tropes with their categories"""
+    if 'ids' in request.args:
+        return multi_get('tropes', request.args['ids'], request.args.get('fields'), request.args.get('expand'))
+    
     try:
-        conn = get_db_connection()
-        
-        # Get all tropes with their associated categories and relationship counts
-        query = """
+        try:
+            fields = fieldsets.parse_fields(request.args.get('fields'), fieldsets.TROPE_FIELDS)
+            expand = fieldsets.parse_expand(request.args.get('expand'), fieldsets.TROPE_EXPANSIONS)
+        except fieldsets.FieldsetError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Expanded categories replace the name list, so skip its join
+        if 'categories' in expand and 'categories' in fields:
+            fields.remove('categories')
+        
+        # Only join what the requested fields need
+        joins = fieldsets.required_joins(fields, fieldsets.TROPE_FIELDS)
+        query = f"""
         SELECT 
-            t.id,
-            t.name,
-            t.description,
-            GROUP_CONCAT(c.name) as categories,
-            COALESCE(example_stats.example_count, 0) as example_count,
-            COALESCE(example_stats.work_count, 0) as work_count
+            {fieldsets.select_list(fields, fieldsets.TROPE_FIELDS)}
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
-        LEFT JOIN (
-            SELECT 
-                e.trope_id,
-                COUNT(*) as example_count,
-                COUNT(DISTINCT e.work_id) as work_count
-            FROM examples e
-            GROUP BY e.trope_id
-        ) example_stats ON t.id = example_stats.trope_id
-        GROUP BY t.id, t.name, t.description, example_stats.example_count, example_stats.work_count
+        {''.join(fieldsets.TROPE_JOINS[join] for join in sorted(joins))}
+        {'GROUP BY t.pk' if 'categories' in joins else ''}
         ORDER BY t.name
         """
         
+        conn = get_db_connection()
         tropes = conn.execute(query).fetchall()
-        conn.close()
         
         # Convert to list of dictionaries and split categories
         result = []
         for trope in tropes:
             trope_dict = dict_from_row(trope)
             # Split categories into a list (handle None case)
-            if trope_dict['categories']:
-                # Format each category name
-                category_names = trope_dict['categories'].split(',')
-                trope_dict['categories'] = [format_category_name(cat) for cat in category_names]
-            else:
-                trope_dict['categories'] = []
+            if 'categories' in trope_dict:
+                if trope_dict['categories']:
+                    # Format each category name
+                    category_names = trope_dict['categories'].split(',')
+                    trope_dict['categories'] = [format_category_name(cat) for cat in category_names]
+                else:
+                    trope_dict['categories'] = []
             result.append(trope_dict)
         
+        if expand:
+            fieldsets.expand_tropes(conn, result, expand, format_category_name)
+        
+        conn.close()
+        
         return jsonify({
             "count": len(result),
             "tropes": result
@@ -154,6 +525,7 @@ def get_tropes():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/tropes', methods=['POST'])
+@serialized_write
 def create_trope():
     """Create a new trope"""
     try:
@@ -213,58 +585,56 @@ def create_trope():
         
         conn = get_db_connection()
         
-        # Check if trope name already exists
-        existing = conn.execute(
-            'SELECT id FROM tropes WHERE LOWER(name) = LOWER(?)', 
-            (name,)
-        ).fetchone()
-        
-        if existing:
-            return jsonify({"error": "A trope with this name already exists"}), 409
-        
         # Generate UUID for new trope
         trope_id = str(uuid.uuid4())
         
-        # Insert the new trope
-        cursor = conn.execute(
-            'INSERT INTO tropes (id, name, description) VALUES (?, ?, ?)',
-            (trope_id, name, description)
-        )
+        # The unique index on LOWER(name) rejects duplicate names
+        try:
+            conn.execute(
+                'INSERT INTO tropes (id, name, description) VALUES (?, ?, ?)',
+                (trope_id, name, description)
+            )
+        except sqlite3.IntegrityError as e:
+            if constraints.violation(e) != constraints.UNIQUE:
+                raise
+            conn.close()
+            return jsonify({"error": "A trope with this name already exists"}), 409
         
-        # Add category associations if provided
+        # Add category associations if provided; unknown IDs leave category_pk NULL
         if category_ids:
-            # Validate that all category IDs exist
-            placeholders = ','.join(['?' for _ in category_ids])
-            valid_categories = conn.execute(
-                f'SELECT id FROM categories WHERE id IN ({placeholders})',
-                category_ids
-            ).fetchall()
-            
-            if len(valid_categories) != len(category_ids):
+            try:
+                conn.executemany(
+                    f'INSERT INTO trope_categories (trope_pk, category_pk) VALUES ({TROPE_PK}, {CATEGORY_PK})',
+                    [(trope_id, category_id) for category_id in category_ids]
+                )
+            except sqlite3.IntegrityError:
                 # Rollback the trope insertion
                 conn.rollback()
+                conn.close()
                 return jsonify({"error": "One or more category IDs are invalid"}), 400
-            
-            # Insert category associations
-            for category_id in category_ids:
-                conn.execute(
-                    'INSERT INTO trope_categories (trope_id, category_id) VALUES (?, ?)',
-                    (trope_id, category_id)
-                )
+        
+        # Keep the near-duplicate index in step with the new trope
+        dedup.index_trope(conn, trope_id, name, description)
         
         conn.commit()
         
+        # Likely near-duplicates are reported back rather than rejected
+        possible_duplicates = dedup.find_similar(
+            conn, name, description, exclude_id=trope_id
+        )
+        
         # Fetch the created trope with its categories for response
         query = """
         SELECT 
             t.id,
             t.name,
             t.description,
+            t.version,
             GROUP_CONCAT(c.name) as categories,
             GROUP_CONCAT(c.id) as category_ids
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk
         WHERE t.id = ?
         GROUP BY t.id, t.name, t.description
         """
@@ -282,170 +652,201 @@ def create_trope():
                 trope_dict['categories'] = []
                 trope_dict['category_ids'] = []
             
-            return jsonify({
+            response = jsonify({
                 "message": "Trope created successfully",
-                "trope": trope_dict
-            }), 201
+                "trope": trope_dict,
+                "possible_duplicates": possible_duplicates
+            })
+            return versioning.with_etag(response, trope_dict['version']), 201
         else:
             return jsonify({"error": "Failed to retrieve created trope"}), 500
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/tropes/duplicates')
+@coalesced
+def get_trope_duplicates():
+    """Cluster the catalogue into groups of likely near-duplicate tropes"""
+    try:
+        threshold = float(request.args.get('threshold', dedup.DEFAULT_THRESHOLD))
+    except ValueError:
+        return jsonify({"error": "threshold must be a number"}), 400
+    
+    if threshold <= 0 or threshold > 1:
+        return jsonify({"error": "threshold must be between 0 and 1"}), 400
+    
+    try:
+        conn = get_db_connection()
+        report = dedup.find_duplicate_clusters(conn, threshold=threshold)
+        conn.close()
+        
+        return jsonify({
+            "threshold": threshold,
+            "cluster_count": len(report['clusters']),
+            "clusters": report['clusters'],
+            "candidate_pairs": report['candidate_pairs'],
+            "skipped_buckets": report['skipped_buckets']
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/tropes/<trope_id>')
+@coalesced
 def get_trope_detail(trope_id):
     """Get detailed information about a specific trope"""
     try:
+        if wants_projection():
+            return projected_detail('tropes', trope_id)
+        
         conn = get_db_connection()
         
-        # Get the trope
-        trope = conn.execute(
-            "SELECT * FROM tropes WHERE id = ?", (trope_id,)
-        ).fetchone()
+        # Serve the cached payload unless the trope has changed since it was built
+        cache_key = (DB_PATH, 'detail', trope_id)
+        entry = detail_cache.get(cache_key, trope_detail.current_version(conn, trope_id))
+        cache_status = 'HIT'
+        
+        if entry is None:
+            result, version = trope_detail.load_detail(conn, trope_id, format_category_name)
+            if result is None:
+                conn.close()
+                return jsonify({"error": "Trope not found"}), 404
+            # Cached with the row version so hits can still send an ETag
+            entry = (app.json.response(result).get_data(), result['version'])
+            # Never cache data from a transaction that might still roll back
+            if not conn.in_transaction:
+                detail_cache.put(cache_key, version, entry)
+            cache_status = 'MISS'
+        
+        conn.close()
+        body, row_version = entry
+        return versioning.with_etag(cached_json_response(body, cache_status), row_version)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tropes/<trope_id>/cooccurring')
+@coalesced
+def get_cooccurring_tropes(trope_id):
+    """Get the tropes that most often appear in the same works as this trope"""
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    try:
+        conn = get_db_connection()
         
+        trope = conn.execute("SELECT name FROM tropes WHERE id = ?", (trope_id,)).fetchone()
         if not trope:
             conn.close()
             return jsonify({"error": "Trope not found"}), 404
         
-        # Get associated categories
-        categories = conn.execute("""
-            SELECT c.id, c.name
-            FROM categories c
-            JOIN trope_categories tc ON c.id = tc.category_id
-            WHERE tc.trope_id = ?
-        """, (trope_id,)).fetchall()
-        
-        # Get related examples with work information
-        examples = conn.execute("""
-            SELECT 
-                e.id,
-                e.description,
-                e.page_reference,
-                e.created_at,
-                w.id as work_id,
-                w.title as work_title,
-                w.type as work_type,
-                w.year as work_year,
-                w.author as work_author
-            FROM examples e
-            JOIN works w ON e.work_id = w.id
-            WHERE e.trope_id = ?
-            ORDER BY w.title
-        """, (trope_id,)).fetchall()
-        
+        related = cooccurrence.top_cooccurring(conn, trope_id, limit=limit)
         conn.close()
         
-        # Build response
-        result = dict_from_row(trope)
-        result['categories'] = [
-            {
-                'id': cat['id'], 
-                'name': format_category_name(cat['name'])
-            } for cat in [dict_from_row(cat) for cat in categories]
-        ]
+        return jsonify({
+            'trope_id': trope_id,
+            'trope_name': trope['name'],
+            'cooccurring': related,
+            'count': len(related)
+        })
         
-        # Add examples with work details
-        result['examples'] = []
-        result['related_works'] = []
-        work_ids_seen = set()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tropes/<trope_id>/neighborhood')
+@coalesced
+def get_trope_neighborhood(trope_id):
+    """Get the tropes within a few co-occurrence hops of this trope"""
+    try:
+        depth = int(request.args.get('depth', 2))
+        limit = int(request.args.get('limit', 50))
+        fanout = min(max(int(request.args.get('fanout', cooccurrence.DEFAULT_FANOUT)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "depth, limit and fanout must be integers"}), 400
+    
+    try:
+        conn = get_db_connection()
         
-        for example in examples:
-            example_dict = dict_from_row(example)
-            result['examples'].append({
-                'id': example_dict['id'],
-                'description': example_dict['description'],
-                'page_reference': example_dict['page_reference'],
-                'created_at': example_dict['created_at'],
-                'work': {
-                    'id': example_dict['work_id'],
-                    'title': example_dict['work_title'],
-                    'type': example_dict['work_type'],
-                    'year': example_dict['work_year'],
-                    'author': example_dict['work_author']
-                }
-            })
-            
-            # Add to related works (avoid duplicates)
-            if example_dict['work_id'] not in work_ids_seen:
-                work_ids_seen.add(example_dict['work_id'])
-                result['related_works'].append({
-                    'id': example_dict['work_id'],
-                    'title': example_dict['work_title'],
-                    'type': example_dict['work_type'],
-                    'year': example_dict['work_year'],
-                    'author': example_dict['work_author']
-                })
+        trope = conn.execute("SELECT name FROM tropes WHERE id = ?", (trope_id,)).fetchone()
+        if not trope:
+            conn.close()
+            return jsonify({"error": "Trope not found"}), 404
         
-        # Add summary counts
-        result['stats'] = {
-            'example_count': len(result['examples']),
-            'work_count': len(result['related_works']),
-            'category_count': len(result['categories'])
-        }
+        graph = cooccurrence.neighborhood(
+            conn, trope_id, depth=depth, max_nodes=limit, fanout=fanout
+        )
+        conn.close()
         
-        return jsonify(result)
+        graph['trope_id'] = trope_id
+        graph['trope_name'] = trope['name']
+        return jsonify(graph)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/tropes/<trope_id>', methods=['PUT'])
+@app.route('/api/tropes/<trope_id>', methods=['PUT', 'PATCH'])
+@serialized_write
 def update_trope(trope_id):
-    """Update an existing trope"""
+    """Replace (PUT) or partially update (PATCH) an existing trope"""
     try:
         # Get JSON data from request
         data = request.get_json()
         
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
-            
-        # Validate required fields
-        if not data.get('name'):
-            return jsonify({"error": "Trope name is required"}), 400
-            
-        if not data.get('description'):
-            return jsonify({"error": "Trope description is required"}), 400
-        
-        name = data['name'].strip()
-        description = data['description'].strip()
-        category_ids = data.get('category_ids', [])
-        category_names = data.get('categories', [])
-        
-        # Validate name length
-        if len(name) < 2:
-            return jsonify({"error": "Trope name must be at least 2 characters"}), 400
-            
-        if len(name) > 200:
-            return jsonify({"error": "Trope name must be less than 200 characters"}), 400
-            
-        # Validate description length
-        if len(description) < 10:
-            return jsonify({"error": "Trope description must be at least 10 characters"}), 400
-            
-        if len(description) > 2000:
-            return jsonify({"error": "Trope description must be less than 2000 characters"}), 400
         
-        conn = get_db_connection()
+        # PATCH only touches the fields it was sent
+        partial = request.method == 'PATCH'
+        changes = {}
         
-        # Check if trope exists
-        existing = conn.execute(
-            'SELECT id FROM tropes WHERE id = ?', 
-            (trope_id,)
-        ).fetchone()
+        # Validate name
+        if not partial or 'name' in data:
+            if not data.get('name'):
+                return jsonify({"error": "Trope name is required"}), 400
+            name = changes['name'] = data['name'].strip()
+            if len(name) < 2:
+                return jsonify({"error": "Trope name must be at least 2 characters"}), 400
+            if len(name) > 200:
+                return jsonify({"error": "Trope name must be less than 200 characters"}), 400
         
-        if not existing:
-            conn.close()
-            return jsonify({"error": "Trope not found"}), 404
+        # Validate description
+        if not partial or 'description' in data:
+            if not data.get('description'):
+                return jsonify({"error": "Trope description is required"}), 400
+            description = changes['description'] = data['description'].strip()
+            if len(description) < 10:
+                return jsonify({"error": "Trope description must be at least 10 characters"}), 400
+            if len(description) > 2000:
+                return jsonify({"error": "Trope description must be less than 2000 characters"}), 400
+        
+        # PUT replaces the categories (none given clears them); PATCH only when given
+        category_ids = data.get('category_ids') or []
+        category_names = data.get('categories') or []
+        sync_categories = not partial or 'category_ids' in data or 'categories' in data
         
-        # Check if another trope with this name already exists (excluding current trope)
-        name_conflict = conn.execute(
-            'SELECT id FROM tropes WHERE LOWER(name) = LOWER(?) AND id != ?', 
-            (name, trope_id)
-        ).fetchone()
+        conn = get_db_connection()
         
-        if name_conflict:
+        # Bump the row version, but only from a version the client has seen
+        condition, params = versioning.precondition(versioning.expected_versions(request.if_match))
+        assignments = ''.join(f'{column} = ?, ' for column in changes)
+        try:
+            updated = conn.execute(
+                f'UPDATE tropes SET {assignments}version = version + 1 '
+                f'WHERE id = ?{condition} RETURNING name, description',
+                (*changes.values(), trope_id, *params)
+            ).fetchall()
+        except sqlite3.IntegrityError as e:
+            if constraints.violation(e) != constraints.UNIQUE:
+                raise
             conn.close()
             return jsonify({"error": "A trope with this name already exists"}), 409
         
+        if not updated:
+            return missing_or_modified(conn, 'tropes', trope_id, 'Trope')
+        
         # Convert category names to IDs if provided
         if category_names and not category_ids:
             # Convert display names to database names (reverse of format_category_name)
@@ -462,40 +863,21 @@ def update_trope(trope_id):
                 missing_db_names = [name for name in db_names if name not in found_names]
                 # Convert back to display names for error message
                 missing_display = [name.replace('_', ' ').title() for name in missing_db_names]
+                conn.rollback()
                 conn.close()
                 return jsonify({"error": f"Invalid category names: {', '.join(missing_display)}"}), 400
         
-        # Update the trope
-        conn.execute(
-            'UPDATE tropes SET name = ?, description = ? WHERE id = ?',
-            (name, description, trope_id)
-        )
+        if changes:
+            dedup.index_trope(conn, trope_id, updated[0]['name'], updated[0]['description'])
         
-        # Update category associations if provided
-        if category_ids is not None:  # Allow empty list to clear categories
-            # Remove existing category associations
-            conn.execute('DELETE FROM trope_categories WHERE trope_id = ?', (trope_id,))
-            
-            # Add new category associations
-            if category_ids:
-                # Validate that all category IDs exist
-                placeholders = ','.join(['?' for _ in category_ids])
-                valid_categories = conn.execute(
-                    f'SELECT id FROM categories WHERE id IN ({placeholders})',
-                    category_ids
-                ).fetchall()
-                
-                if len(valid_categories) != len(category_ids):
-                    conn.rollback()
-                    conn.close()
-                    return jsonify({"error": "One or more category IDs are invalid"}), 400
-                
-                # Insert new category associations
-                for category_id in category_ids:
-                    conn.execute(
-                        'INSERT INTO trope_categories (trope_id, category_id) VALUES (?, ?)',
-                        (trope_id, category_id)
-                    )
+        # Only links that were added or removed are written; unknown IDs are rejected
+        if sync_categories:
+            try:
+                sync_trope_categories(conn, trope_id, category_ids)
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                conn.close()
+                return jsonify({"error": "One or more category IDs are invalid"}), 400
         
         conn.commit()
         
@@ -505,11 +887,12 @@ def update_trope(trope_id):
             t.id,
             t.name,
             t.description,
+            t.version,
             GROUP_CONCAT(c.name) as categories,
             GROUP_CONCAT(c.id) as category_ids
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk
         WHERE t.id = ?
         GROUP BY t.id, t.name, t.description
         """
@@ -528,10 +911,11 @@ def update_trope(trope_id):
                 trope_dict['categories'] = []
                 trope_dict['category_ids'] = []
             
-            return jsonify({
+            response = jsonify({
                 "message": "Trope updated successfully",
                 "trope": trope_dict
-            }), 200
+            })
+            return versioning.with_etag(response, trope_dict['version']), 200
         else:
             return jsonify({"error": "Failed to retrieve updated trope"}), 500
             
@@ -539,28 +923,26 @@ def update_trope(trope_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/tropes/<trope_id>', methods=['DELETE'])
+@serialized_write
 def delete_trope(trope_id):
     """Delete an existing trope"""
     try:
         conn = get_db_connection()
         
-        # Check if trope exists
-        existing = conn.execute(
-            'SELECT name FROM tropes WHERE id = ?', 
+        # Category links have no ON DELETE action; examples cascade with the trope
+        conn.execute(f'DELETE FROM trope_categories WHERE trope_pk = {TROPE_PK}', (trope_id,))
+        deleted = conn.execute(
+            'DELETE FROM tropes WHERE id = ? RETURNING name',
             (trope_id,)
-        ).fetchone()
+        ).fetchall()
         
-        if not existing:
+        if not deleted:
             conn.close()
             return jsonify({"error": "Trope not found"}), 404
         
-        trope_name = existing['name']
+        trope_name = deleted[0]['name']
         
-        # Delete category associations first (foreign key constraint)
-        conn.execute('DELETE FROM trope_categories WHERE trope_id = ?', (trope_id,))
-        
-        # Delete the trope
-        conn.execute('DELETE FROM tropes WHERE id = ?', (trope_id,))
+        dedup.remove_trope(conn, trope_id)
         
         conn.commit()
         conn.close()
@@ -574,6 +956,7 @@ def delete_trope(trope_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/categories')
+@coalesced
 def get_categories():
     """Get all categories with trope counts"""
     try:
@@ -584,9 +967,9 @@ def get_categories():
         SELECT 
             c.id,
             c.name,
-            COUNT(tc.trope_id) as trope_count
+            COUNT(tc.trope_pk) as trope_count
         FROM categories c
-        LEFT JOIN trope_categories tc ON c.id = tc.category_id
+        LEFT JOIN trope_categories tc ON tc.category_pk = c.pk
         GROUP BY c.id, c.name
         ORDER BY c.name
         """
@@ -610,6 +993,7 @@ def get_categories():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/categories/<category_id>/tropes')
+@coalesced
 def get_tropes_by_category(category_id):
     """Get all tropes in a specific category"""
     try:
@@ -617,7 +1001,7 @@ def get_tropes_by_category(category_id):
         
         # First, check if category exists and get its name
         category = conn.execute(
-            "SELECT * FROM categories WHERE id = ?", (category_id,)
+            "SELECT id, name FROM categories WHERE id = ?", (category_id,)
         ).fetchone()
         
         if not category:
@@ -628,8 +1012,9 @@ def get_tropes_by_category(category_id):
         tropes = conn.execute("""
             SELECT t.id, t.name, t.description
             FROM tropes t
-            JOIN trope_categories tc ON t.id = tc.trope_id
-            WHERE tc.category_id = ?
+            JOIN trope_categories tc ON tc.trope_pk = t.pk
+            JOIN categories c ON c.pk = tc.category_pk
+            WHERE c.id = ?
             ORDER BY t.name
         """, (category_id,)).fetchall()
         
@@ -651,6 +1036,7 @@ def get_tropes_by_category(category_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/search')
+@coalesced
 def search():
     """Search tropes and categories with flexible matching"""
     query = request.args.get('q', '').strip()
@@ -678,8 +1064,8 @@ def search():
             t.description,
             GROUP_CONCAT(c.name) as categories
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk
         WHERE 
             LOWER(t.name) LIKE ? OR 
             LOWER(t.description) LIKE ? OR
@@ -704,9 +1090,9 @@ def search():
         SELECT 
             c.id,
             c.name,
-            COUNT(tc.trope_id) as trope_count
+            COUNT(tc.trope_pk) as trope_count
         FROM categories c
-        LEFT JOIN trope_categories tc ON c.id = tc.category_id
+        LEFT JOIN trope_categories tc ON tc.category_pk = c.pk
         WHERE LOWER(REPLACE(c.name, '_', ' ')) LIKE ?
         GROUP BY c.id, c.name
         ORDER BY c.name
@@ -743,26 +1129,33 @@ def search():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/analytics')
+@coalesced
 def get_analytics():
-    """Get database analytics and statistics"""
+    """Get database analytics and statistics from the maintained aggregates"""
     try:
         conn = get_db_connection()
         
-        # Basic counts
-        trope_count = conn.execute('SELECT COUNT(*) as count FROM tropes').fetchone()['count']
-        category_count = conn.execute('SELECT COUNT(*) as count FROM categories').fetchone()['count']
+        # Every figure below comes from trigger-maintained counters, so the
+        # cost is proportional to the number of categories, not rows
+        counters = analytics.load(conn)
+        category_names = {
+            row['id']: row['name'] for row in conn.execute('SELECT id, name FROM categories')
+        }
+        conn.close()
+        
+        totals = counters['totals']
+        trope_count = totals.get('tropes', 0)
+        category_count = totals.get('categories', 0)
         
         # Category usage statistics
-        category_usage = conn.execute("""
-        SELECT 
-            c.name,
-            c.id,
-            COUNT(tc.trope_id) as trope_count
-        FROM categories c
-        LEFT JOIN trope_categories tc ON c.id = tc.category_id
-        GROUP BY c.id, c.name
-        ORDER BY trope_count DESC
-        """).fetchall()
+        category_usage = sorted(
+            (
+                {'name': category_names[category_id], 'trope_count': count}
+                for category_id, count in counters['category_tropes'].items()
+                if category_id in category_names
+            ),
+            key=lambda cat: (-cat['trope_count'], cat['name'])
+        )
         
         # Most popular categories
         popular_categories = []
@@ -772,24 +1165,43 @@ def get_analytics():
                 'trope_count': cat['trope_count']
             })
         
-        # Calculate averages
-        avg_categories_per_trope = conn.execute("""
-        SELECT AVG(category_count) as avg_count
-        FROM (
-            SELECT COUNT(tc.category_id) as category_count
-            FROM tropes t
-            LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-            GROUP BY t.id
+        # Calculate averages from the categories-per-trope histogram
+        histogram = sorted(
+            (int(bucket), count)
+            for bucket, count in counters['categories_per_trope'].items()
+            if count > 0
+        )
+        histogram_tropes = sum(count for _, count in histogram)
+        avg_categories_per_trope = (
+            sum(size * count for size, count in histogram) / histogram_tropes
+            if histogram_tropes else 0
         )
-        """).fetchone()['avg_count'] or 0
         
-        conn.close()
+        # Unused categories
+        unused_categories = [cat['name'] for cat in category_usage if cat['trope_count'] == 0]
+        
+        # Category pairs that share works
+        category_cooccurrence = []
+        for pair, count in counters['category_cooccurrence'].items():
+            first_id, second_id = pair.split('|')
+            if count > 0 and first_id in category_names and second_id in category_names:
+                category_cooccurrence.append({
+                    'categories': [
+                        format_category_name(category_names[first_id]),
+                        format_category_name(category_names[second_id])
+                    ],
+                    'count': count
+                })
+        category_cooccurrence.sort(key=lambda entry: (-entry['count'], entry['categories']))
         
-        analytics = {
+        analytics_data = {
             'summary': {
                 'total_tropes': trope_count,
                 'total_categories': category_count,
-                'avg_categories_per_trope': round(avg_categories_per_trope, 2)
+                'total_works': totals.get('works', 0),
+                'total_examples': totals.get('examples', 0),
+                'avg_categories_per_trope': round(avg_categories_per_trope, 2),
+                'unused_categories': len(unused_categories)
             },
             'popular_categories': popular_categories,
             'category_distribution': [
@@ -797,10 +1209,84 @@ def get_analytics():
                     'name': format_category_name(cat['name']),
                     'count': cat['trope_count']
                 } for cat in category_usage
-            ]
+            ],
+            'categories_per_trope': [
+                {'categories': size, 'tropes': count} for size, count in histogram
+            ],
+            'examples_by_work_type': sorted(
+                (
+                    {'type': work_type, 'count': count}
+                    for work_type, count in counters['examples_by_work_type'].items()
+                    if count > 0
+                ),
+                key=lambda entry: (-entry['count'], entry['type'])
+            ),
+            'works_by_decade': sorted(
+                (
+                    {'decade': decade, 'count': count}
+                    for decade, count in counters['works_by_decade'].items()
+                    if count > 0
+                ),
+                key=lambda entry: entry['decade']
+            ),
+            'category_cooccurrence': category_cooccurrence,
+            'data_health': {
+                'unused_categories': [format_category_name(name) for name in unused_categories],
+                'database_size': f"{trope_count + category_count} total records"
+            }
         }
         
-        return jsonify(analytics)
+        return jsonify(analytics_data)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/activity')
+@coalesced
+def get_activity_analytics():
+    """Get created/updated/deleted activity per day, week or month"""
+    bucket = request.args.get('bucket', 'day').strip().lower()
+    if bucket not in activity.BUCKETS:
+        return jsonify({"error": f"bucket must be one of: {', '.join(activity.BUCKETS)}"}), 400
+    
+    try:
+        default_start, default_end = activity.default_range(bucket)
+        start_arg = request.args.get('from', '').strip()
+        end_arg = request.args.get('to', '').strip()
+        end = date.fromisoformat(end_arg) if end_arg else default_end
+        start = date.fromisoformat(start_arg) if start_arg else (
+            default_start if not end_arg else activity.default_range(bucket, end)[0]
+        )
+    except ValueError:
+        return jsonify({"error": "from and to must be dates in YYYY-MM-DD format"}), 400
+    
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    
+    if (end - start).days + 1 > activity.MAX_BUCKETS * {'day': 1, 'week': 7, 'month': 31}[bucket]:
+        return jsonify({"error": f"Date range too large (max {activity.MAX_BUCKETS} {bucket}s)"}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    try:
+        conn = get_db_connection()
+        report = activity.activity_report(conn, bucket, start, end)
+        recent_tropes = activity.recently_touched_tropes(conn, limit=limit)
+        conn.close()
+        
+        return jsonify({
+            "bucket": bucket,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "buckets": report['buckets'],
+            "series": report['series'],
+            "growth": report['growth'],
+            "growth_notes": report['growth_notes'],
+            "recently_touched_tropes": recent_tropes
+        })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -813,36 +1299,7 @@ def export_csv():
         
         # Create CSV data in memory
         output = io.StringIO()
-        
-        # Export tropes with their categories
-        query = """
-        SELECT 
-            t.id,
-            t.name,
-            t.description,
-            GROUP_CONCAT(c.name) as categories
-        FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
-        GROUP BY t.id, t.name, t.description
-        ORDER BY t.name
-        """
-        
-        tropes = conn.execute(query).fetchall()
-        
-        # Write CSV headers
-        fieldnames = ['id', 'name', 'description', 'categories']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # Write trope data
-        for trope in tropes:
-            writer.writerow({
-                'id': trope['id'],
-                'name': trope['name'],
-                'description': trope['description'],
-                'categories': trope['categories'] or ''
-            })
+        write_tropes_csv(conn, output)
         
         conn.close()
         
@@ -864,70 +1321,504 @@ def export_csv():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def write_tropes_csv(conn, output, progress=None):
+    """Write all tropes with their categories as CSV, returning the row count"""
+    # Export tropes with their categories
+    query = """
+    SELECT 
+        t.id,
+        t.name,
+        t.description,
+        GROUP_CONCAT(c.name) as categories
+    FROM tropes t
+    LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+    LEFT JOIN categories c ON c.pk = tc.category_pk
+    GROUP BY t.id, t.name, t.description
+    ORDER BY t.name
+    """
+    
+    total = analytics.total(conn, 'tropes')
+    
+    # Write CSV headers
+    fieldnames = ['id', 'name', 'description', 'categories']
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    
+    # Write trope data, streaming rows from the cursor
+    count = 0
+    for trope in conn.execute(query):
+        writer.writerow({
+            'id': trope['id'],
+            'name': trope['name'],
+            'description': trope['description'],
+            'categories': trope['categories'] or ''
+        })
+        count += 1
+        if progress and count % 500 == 0:
+            progress(count, total)
+    
+    return count
+
 # ======================
-# WORKS API ENDPOINTS
+# MULTI-GET
 # ======================
 
-@app.route('/api/works')
-def get_works():
-    """Get all works with optional filtering and sorting"""
-    try:
-        conn = get_db_connection()
-        
+def load_projected(conn, entity, ids, fields, expand):
+    """{id: item} for tropes, works or examples with only `fields`, plus `expand`"""
+    hidden = []
+    suffix = ''
+    if entity == 'tropes':
+        if 'categories' in expand and 'categories' in fields:
+            fields.remove('categories')
+        joins = fieldsets.required_joins(fields, fieldsets.TROPE_FIELDS)
+        query = f"""
+        SELECT {fieldsets.select_list(fields, fieldsets.TROPE_FIELDS)}
+        FROM tropes t
+        {''.join(fieldsets.TROPE_JOINS[join] for join in sorted(joins))}
+        WHERE t.id IN"""
+        if 'categories' in joins:
+            suffix = 'GROUP BY t.pk'
+    elif entity == 'works':
+        query = f"SELECT {fieldsets.select_list(fields, fieldsets.WORK_FIELDS)} FROM works WHERE id IN"
+    else:
+        fields, hidden = fieldsets.example_projection(fields, expand)
+        joins = fieldsets.required_joins(fields, fieldsets.EXAMPLE_FIELDS)
+        query = f"""
+        SELECT {fieldsets.select_list(fields, fieldsets.EXAMPLE_FIELDS)}
+        FROM examples e
+        {' '.join(fieldsets.EXAMPLE_JOINS[join] for join in sorted(joins))}
+        WHERE e.id IN"""
+    
+    rows = multiget.load_by_ids(conn, query, ids, suffix)
+    items = list(rows.values())
+    if entity == 'tropes':
+        for trope in items:
+            if 'categories' in trope:
+                names = trope['categories'].split(',') if trope['categories'] else []
+                trope['categories'] = [format_category_name(name) for name in names]
+        if expand:
+            fieldsets.expand_tropes(conn, items, expand, format_category_name)
+    elif entity == 'works':
+        if expand:
+            fieldsets.expand_works(conn, items, expand)
+    elif expand:
+        fieldsets.expand_examples(conn, items, expand)
+        for example in items:
+            for name in hidden:
+                example.pop(name)
+    return rows
+
+def multi_get(entity, raw_ids, raw_fields=None, raw_expand=None):
+    """Look up many tropes, works or examples by id, in request order"""
+    try:
+        try:
+            ids = multiget.parse_ids(raw_ids)
+            # The POST body may send field and expansion lists as arrays
+            if isinstance(raw_fields, list):
+                raw_fields = ','.join(raw_fields)
+            if isinstance(raw_expand, list):
+                raw_expand = ','.join(raw_expand)
+            fields, expand = fieldsets.parse(entity, raw_fields, raw_expand)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        rows = load_projected(conn, entity, ids, fields, expand)
+        conn.close()
+        items, not_found = multiget.in_request_order(ids, rows)
+        
+        return jsonify({
+            entity: items,
+            "count": len(items),
+            "not_found": not_found
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/<any(tropes, works, examples):entity>/lookup', methods=['POST'])
+def lookup(entity):
+    """Multi-get by id with the id list in the request body"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'ids' not in data:
+        return jsonify({"error": "Request body must be a JSON object with an 'ids' list"}), 400
+    
+    return multi_get(entity, data['ids'], data.get('fields'), data.get('expand'))
+
+def wants_projection():
+    """Whether a detail request asked for fields= or expand="""
+    return 'fields' in request.args or 'expand' in request.args
+
+def projected_detail(entity, item_id):
+    """One resource in its list representation, limited to fields= and with expand="""
+    try:
+        fields, expand = fieldsets.parse(entity, request.args.get('fields'), request.args.get('expand'))
+    except fieldsets.FieldsetError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_db_connection()
+    item = load_projected(conn, entity, [item_id], fields, expand).get(item_id)
+    row = conn.execute(f"SELECT version FROM {entity} WHERE id = ?", (item_id,)).fetchone()
+    conn.close()
+    
+    if item is None or row is None:
+        return jsonify({"error": f"{entity[:-1].capitalize()} not found"}), 404
+    return versioning.with_etag(jsonify(item), row['version'])
+
+def projected_collection(conn, entity, ids_query, owner_id, fields, expand):
+    """Resources whose ids `ids_query` selects for owner_id, in that order, projected like a list"""
+    ids = [row[0] for row in conn.execute(ids_query, (owner_id,))]
+    rows = load_projected(conn, entity, ids, fields, expand)
+    return multiget.in_request_order(ids, rows)[0]
+
+# ======================
+# BATCH
+# ======================
+
+@app.route('/api/batch', methods=['POST'])
+def run_batch():
+    """Execute many API sub-requests in one round trip"""
+    try:
+        if request.content_length and request.content_length > batch.MAX_BODY_BYTES:
+            return jsonify({"error": f"Batch body must be at most {batch.MAX_BODY_BYTES} bytes"}), 413
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        
+        try:
+            items = batch.validate(data.get('requests'))
+        except batch.BatchError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        atomic = bool(data.get('atomic', False))
+        started = time.perf_counter()
+        
+        def execute():
+            results, committed = batch.run_batch(app, get_db_connection, items, atomic=atomic)
+            return jsonify({
+                "responses": results,
+                "atomic": atomic,
+                "committed": committed,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+            })
+        
+        if not batch.has_writes(items):
+            return execute()
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    # The whole batch is one writer operation, committed with its group
+    return submit_write(copy_current_request_context(execute))
+
+# ======================
+# METRICS
+# ======================
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Get this worker's internal metrics"""
+    try:
+        return jsonify(dict(metrics.snapshot(), pid=os.getpid()))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ======================
+# BACKGROUND JOBS
+# ======================
+
+def _export_csv_job(job):
+    """Job: write the CSV export to a downloadable artifact"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = job.artifact_path(f'tropes_export_{timestamp}.csv', 'text/csv')
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        rows = write_tropes_csv(job.conn, output, progress=job.progress)
+    job.progress(rows, rows, force=True)
+    return {"rows": rows}
+
+def _rebuild_analytics_job(job):
+    """Job: recompute the analytics counters from the base tables"""
+    analytics.rebuild(job.conn)
+    return {"mismatches": analytics.verify(job.conn)}
+
+def _rebuild_cooccurrence_job(job):
+    """Job: recompute the trope co-occurrence matrix"""
+    cooccurrence.rebuild(job.conn)
+    pairs = job.conn.execute('SELECT COUNT(*) FROM trope_cooccurrence').fetchone()[0]
+    return {"pairs": pairs}
+
+def _rebuild_duplicates_job(job):
+    """Job: rebuild the MinHash index and report duplicate clusters"""
+    dedup.rebuild_index(job.conn)
+    job.progress(1, 2, message="Index rebuilt", force=True)
+    threshold = float(job.params.get('threshold', dedup.DEFAULT_THRESHOLD))
+    report = dedup.find_duplicate_clusters(job.conn, threshold=threshold)
+    return {
+        "clusters": len(report['clusters']),
+        "candidate_pairs": report['candidate_pairs']
+    }
+
+def _backup_job(job):
+    """Job: snapshot the database into a new backup generation and prune old ones"""
+    keep = int(job.params.get('keep', backup.KEEP_GENERATIONS))
+    if keep < 1:
+        raise jobs.JobError("keep must be at least 1")
+    backup_dir = os.path.join(os.path.dirname(job.database), 'backups')
+    path = backup.create_generation(
+        job.database, backup_dir,
+        progress=lambda done, total: job.progress(done, total, message="Copying pages")
+    )
+    return {
+        "generation": os.path.basename(path),
+        "pruned": backup.prune(backup_dir, keep=keep)
+    }
+
+def _maintenance_job(task):
+    """Job handler running one maintenance task within its time budget"""
+    def run(job):
+        budget = job.params.get('budget')
+        if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0):
+            raise jobs.JobError("budget must be a positive number of seconds")
+        return maintenance.run_task(job.conn, task, budget)
+    return run
+
+# Bound to DB_PATH when start_background_work() starts it
+job_runner = jobs.JobRunner(
+    connect=open_db_connection,
+    artifact_dir=lambda database: os.path.join(os.path.dirname(database), 'jobs')
+)
+job_runner.register('export_csv', _export_csv_job, concurrency=2)
+job_runner.register('rebuild_analytics', _rebuild_analytics_job)
+job_runner.register('rebuild_cooccurrence', _rebuild_cooccurrence_job)
+job_runner.register('rebuild_duplicates', _rebuild_duplicates_job)
+job_runner.register('backup', _backup_job)
+for task, (every, _) in maintenance.TASKS.items():
+    job_runner.register(f'maintenance_{task}', _maintenance_job(task))
+    job_runner.schedule(f'maintenance_{task}', timedelta(seconds=every))
+
+def start_background_work():
+    """Start this process's job runner on DB_PATH; call once per server process, after forking"""
+    # Replicas never write, so their queued jobs are left to the primary
+    if not REPLICA_DIR:
+        job_runner.start(DB_PATH)
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a background job"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if not data.get('type'):
+            return jsonify({"error": "Job type is required"}), 400
+        
+        job = job_runner.submit(data['type'], data.get('params'))
+        
+        response = jsonify(job)
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response
+        
+    except jobs.JobError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs')
+def get_jobs():
+    """List recent background jobs"""
+    try:
+        status = request.args.get('status')
+        if status and status not in jobs.JOB_STATUSES:
+            return jsonify({"error": f"status must be one of: {', '.join(jobs.JOB_STATUSES)}"}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        
+        return jsonify({
+            "jobs": job_runner.list(status=status, limit=limit),
+            "types": sorted(job_runner.handlers)
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Get a background job's status and progress"""
+    try:
+        job = job_runner.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        if job['has_artifact']:
+            job['artifact_url'] = f"/api/jobs/{job_id}/artifact"
+        
+        return jsonify(job)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>/artifact')
+def get_job_artifact(job_id):
+    """Download the file produced by a finished job"""
+    try:
+        job = job_runner.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        artifact = job_runner.artifact(job_id)
+        if not artifact:
+            return jsonify({"error": f"Job has no artifact (status: {job['status']})"}), 409
+        
+        path, filename, mimetype = artifact
+        return send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ======================
+# MAINTENANCE
+# ======================
+
+@app.route('/api/maintenance')
+def get_maintenance():
+    """Database and WAL sizes and the last run of each maintenance task"""
+    try:
+        conn = get_db_connection()
+        database = maintenance.database_stats(conn, None if REPLICA_DIR else DB_PATH)
+        conn.close()
+        
+        tasks = {}
+        for task, (every, budget) in maintenance.TASKS.items():
+            last = job_runner.last(f'maintenance_{task}')
+            tasks[task] = {
+                "every_seconds": every,
+                "budget_seconds": budget,
+                "last_run": last and {
+                    key: last[key] for key in ('id', 'status', 'created_at', 'finished_at', 'result', 'error')
+                }
+            }
+        
+        return jsonify({"database": database, "tasks": tasks})
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ======================
+# WORKS API ENDPOINTS
+# ======================
+
+@app.route('/api/works')
+@coalesced
+def get_works():
+    """Get a page of works with optional filtering and sorting"""
+    if 'ids' in request.args:
+        return multi_get('works', request.args['ids'], request.args.get('fields'), request.args.get('expand'))
+    
+    try:
         # Get query parameters
         search = request.args.get('search', '').strip()
         work_type = request.args.get('type', '').strip()
-        sort_by = request.args.get('sort', 'title')  # title, year, author, type
+        sort_by = request.args.get('sort', 'title')  # title, year, author, type, created_at
         sort_order = request.args.get('order', 'asc')  # asc or desc
+        cursor = request.args.get('cursor', '').strip()
+        
+        try:
+            page_size = pagination.parse_page_size(request.args.get('limit'))
+            fields = fieldsets.parse_fields(request.args.get('fields'), fieldsets.WORK_FIELDS)
+            expand = fieldsets.parse_expand(request.args.get('expand'), fieldsets.WORK_EXPANSIONS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Build base query
-        query = "SELECT * FROM works WHERE 1=1"
+        if sort_by not in pagination.WORK_SORT_KEYS:
+            sort_by = 'title'
+        sort_order = 'desc' if sort_order.lower() == 'desc' else 'asc'
+        sort_direction = sort_order.upper()
+        sort_key = pagination.WORK_SORT_KEYS[sort_by]
+        
+        # Totals default to on for the first page only
+        include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
+        
+        # Build filter clause
+        where = " WHERE 1=1"
         params = []
         
         # Add search filter
         if search:
-            query += " AND (title LIKE ? OR author LIKE ? OR description LIKE ?)"
+            where += " AND (title LIKE ? OR author LIKE ? OR description LIKE ?)"
             search_term = f"%{search}%"
             params.extend([search_term, search_term, search_term])
         
         # Add type filter
         if work_type and work_type != 'all':
-            query += " AND type = ?"
+            where += f" AND type_id = {WORK_TYPE_ID}"
             params.append(work_type)
         
-        # Add sorting
-        valid_sort_fields = ['title', 'year', 'author', 'type', 'created_at']
-        if sort_by not in valid_sort_fields:
-            sort_by = 'title'
+        filtered = len(params) > 0
         
-        sort_direction = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
-        query += f" ORDER BY {sort_by} {sort_direction}"
+        # Unfiltered totals come from the analytics counters; filtered ones from a
+        # window over the whole filtered set, so the page is cut in an outer query
+        columns = fieldsets.select_list(fields, fieldsets.WORK_FIELDS)
+        query = f"SELECT {columns}, {sort_key} AS sort_key FROM works" + where
+        key_sql = sort_key
+        if include_total and filtered:
+            query = f"SELECT * FROM (SELECT *, COUNT(*) OVER () AS total_count FROM ({query})) WHERE 1=1"
+            key_sql = 'sort_key'
         
+        if cursor:
+            try:
+                cursor_key, cursor_id = pagination.decode_cursor(cursor, sort_by, sort_order)
+            except pagination.CursorError as e:
+                return jsonify({"error": str(e)}), 400
+            keyset_sql, keyset_params = pagination.keyset_clause(
+                key_sql, 'id', sort_direction, cursor_key, cursor_id
+            )
+            query += keyset_sql
+            params.extend(keyset_params)
+        
+        query += pagination.order_clause(key_sql, 'id', sort_direction)
+        query += " LIMIT ?"
+        params.append(page_size + 1)
+        
+        conn = get_db_connection()
         works = conn.execute(query, params).fetchall()
         
-        # Convert to list of dictionaries
-        works_list = [dict_from_row(work) for work in works]
+        total_count = None
+        if include_total:
+            if not filtered:
+                total_count = analytics.total(conn, 'works')
+            else:
+                total_count = works[0]['total_count'] if works else 0
         
-        # Get total count for metadata
-        count_query = "SELECT COUNT(*) as total FROM works WHERE 1=1"
-        count_params = []
+        has_more = len(works) > page_size
+        works = works[:page_size]
+        next_cursor = None
+        if has_more:
+            last = works[-1]
+            next_cursor = pagination.encode_cursor(sort_by, sort_order, last['sort_key'], last['id'])
         
-        if search:
-            count_query += " AND (title LIKE ? OR author LIKE ? OR description LIKE ?)"
-            search_term = f"%{search}%"
-            count_params.extend([search_term, search_term, search_term])
+        # Convert to list of dictionaries
+        works_list = []
+        for work in works:
+            work_dict = dict_from_row(work)
+            work_dict.pop('sort_key')
+            work_dict.pop('total_count', None)
+            works_list.append(work_dict)
         
-        if work_type and work_type != 'all':
-            count_query += " AND type = ?"
-            count_params.append(work_type)
-            
-        total_count = conn.execute(count_query, count_params).fetchone()['total']
+        if expand:
+            fieldsets.expand_works(conn, works_list, expand)
         
         conn.close()
         
         return jsonify({
             "works": works_list,
             "total": total_count,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "limit": page_size,
             "filters": {
                 "search": search,
                 "type": work_type
@@ -942,6 +1833,7 @@ def get_works():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/works', methods=['POST'])
+@serialized_write
 def create_work():
     """Create a new work"""
     try:
@@ -990,46 +1882,50 @@ def create_work():
         # Insert into database
         conn = get_db_connection()
         
-        # Check for duplicate title
-        existing = conn.execute("SELECT id FROM works WHERE title = ?", (title,)).fetchone()
-        if existing:
+        # The unique index on title rejects duplicates
+        try:
+            new_work = conn.execute(f"""
+                INSERT INTO works (id, title, type_id, year, author, description, created_at, updated_at)
+                VALUES (?, ?, {WORK_TYPE_ID}, ?, ?, ?, ?, ?)
+                RETURNING {WORK_COLUMNS}
+            """, (work_id, title, work_type, year, author, description, timestamp, timestamp)).fetchall()[0]
+        except sqlite3.IntegrityError as e:
+            if constraints.violation(e) != constraints.UNIQUE:
+                raise
             conn.close()
             return jsonify({"error": "A work with this title already exists"}), 400
         
-        conn.execute("""
-            INSERT INTO works (id, title, type, year, author, description, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (work_id, title, work_type, year, author, description, timestamp, timestamp))
-        
         conn.commit()
-        
-        # Fetch the created work
-        new_work = conn.execute("SELECT * FROM works WHERE id = ?", (work_id,)).fetchone()
         conn.close()
         
-        return jsonify({
+        response = jsonify({
             "message": "Work created successfully",
             "work": dict_from_row(new_work)
-        }), 201
+        })
+        return versioning.with_etag(response, new_work['version']), 201
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/works/<work_id>')
+@coalesced
 def get_work(work_id):
     """Get a specific work by ID with related tropes"""
     try:
+        if wants_projection():
+            return projected_detail('works', work_id)
+        
         conn = get_db_connection()
         
         # Get the work
-        work = conn.execute("SELECT * FROM works WHERE id = ?", (work_id,)).fetchone()
+        work = conn.execute(f"SELECT {WORK_COLUMNS} FROM works WHERE id = ?", (work_id,)).fetchone()
         
         if not work:
             conn.close()
             return jsonify({"error": "Work not found"}), 404
         
         # Get related tropes through examples
-        examples_query = """
+        examples_query = f"""
         SELECT 
             e.id as example_id,
             e.description as example_description,
@@ -1038,8 +1934,8 @@ def get_work(work_id):
             t.name as trope_name,
             t.description as trope_description
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        WHERE e.work_id = ?
+        JOIN tropes t ON t.pk = e.trope_pk
+        WHERE e.work_pk = {WORK_PK}
         ORDER BY t.name
         """
         
@@ -1052,83 +1948,75 @@ def get_work(work_id):
         work_data['examples'] = [dict_from_row(example) for example in examples]
         work_data['trope_count'] = len(examples)
         
-        return jsonify(work_data)
+        return versioning.with_etag(jsonify(work_data), work_data['version'])
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/tropes/<trope_id>/works')
+@coalesced
 def get_trope_works(trope_id):
     """Get all works that use a specific trope"""
     try:
-        conn = get_db_connection()
-        
-        # Verify trope exists
-        trope = conn.execute("SELECT name FROM tropes WHERE id = ?", (trope_id,)).fetchone()
-        if not trope:
+        if wants_projection():
+            try:
+                fields, expand = fieldsets.parse('works', request.args.get('fields'), request.args.get('expand'))
+            except fieldsets.FieldsetError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            conn = get_db_connection()
+            trope = conn.execute("SELECT name FROM tropes WHERE id = ?", (trope_id,)).fetchone()
+            if not trope:
+                conn.close()
+                return jsonify({"error": "Trope not found"}), 404
+            works = projected_collection(conn, 'works', f"""
+                SELECT w.id FROM works w
+                WHERE w.pk IN (SELECT work_pk FROM examples WHERE trope_pk = {TROPE_PK})
+                ORDER BY w.title
+            """, trope_id, fields, expand)
             conn.close()
-            return jsonify({"error": "Trope not found"}), 404
+            return jsonify({
+                'trope_name': trope['name'],
+                'trope_id': trope_id,
+                'works': works,
+                'work_count': len(works)
+            })
         
-        # Get works with example details
-        query = """
-        SELECT 
-            w.id,
-            w.title,
-            w.type,
-            w.year,
-            w.author,
-            w.description,
-            e.id as example_id,
-            e.description as example_description,
-            e.page_reference,
-            e.created_at as example_created_at
-        FROM works w
-        JOIN examples e ON w.id = e.work_id
-        WHERE e.trope_id = ?
-        ORDER BY w.title
-        """
+        conn = get_db_connection()
         
-        results = conn.execute(query, (trope_id,)).fetchall()
-        conn.close()
+        cache_key = (DB_PATH, 'works', trope_id)
+        body = detail_cache.get(cache_key, trope_detail.current_version(conn, trope_id))
+        cache_status = 'HIT'
         
-        # Group by work
-        works_dict = {}
-        for row in results:
-            row_dict = dict_from_row(row)
-            work_id = row_dict['id']
-            
-            if work_id not in works_dict:
-                works_dict[work_id] = {
-                    'id': work_id,
-                    'title': row_dict['title'],
-                    'type': row_dict['type'],
-                    'year': row_dict['year'],
-                    'author': row_dict['author'],
-                    'description': row_dict['description'],
-                    'examples': []
-                }
-            
-            works_dict[work_id]['examples'].append({
-                'id': row_dict['example_id'],
-                'description': row_dict['example_description'],
-                'page_reference': row_dict['page_reference'],
-                'created_at': row_dict['example_created_at']
-            })
+        if body is None:
+            result, version = trope_detail.load_works(conn, trope_id)
+            if result is None:
+                conn.close()
+                return jsonify({"error": "Trope not found"}), 404
+            body = app.json.response(result).get_data()
+            # Never cache data from a transaction that might still roll back
+            if not conn.in_transaction:
+                detail_cache.put(cache_key, version, body)
+            cache_status = 'MISS'
         
-        return jsonify({
-            'trope_name': trope['name'],
-            'trope_id': trope_id,
-            'works': list(works_dict.values()),
-            'work_count': len(works_dict)
-        })
+        conn.close()
+        return cached_json_response(body, cache_status)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/works/<work_id>/tropes')
+@coalesced
 def get_work_tropes(work_id):
     """Get all tropes used in a specific work"""
     try:
+        projection = None
+        if wants_projection():
+            try:
+                projection = fieldsets.parse('tropes', request.args.get('fields'), request.args.get('expand'))
+            except fieldsets.FieldsetError as e:
+                return jsonify({"error": str(e)}), 400
+        
         conn = get_db_connection()
         
         # Verify work exists
@@ -1137,8 +2025,22 @@ def get_work_tropes(work_id):
             conn.close()
             return jsonify({"error": "Work not found"}), 404
         
+        if projection:
+            tropes = projected_collection(conn, 'tropes', f"""
+                SELECT t.id FROM tropes t
+                WHERE t.pk IN (SELECT trope_pk FROM examples WHERE work_pk = {WORK_PK})
+                ORDER BY t.name
+            """, work_id, *projection)
+            conn.close()
+            return jsonify({
+                'work_title': work['title'],
+                'work_id': work_id,
+                'tropes': tropes,
+                'trope_count': len(tropes)
+            })
+        
         # Get tropes with example details
-        query = """
+        query = f"""
         SELECT 
             t.id,
             t.name,
@@ -1149,10 +2051,10 @@ def get_work_tropes(work_id):
             e.page_reference,
             e.created_at as example_created_at
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
-        JOIN examples e ON t.id = e.trope_id
-        WHERE e.work_id = ?
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk
+        JOIN examples e ON e.trope_pk = t.pk
+        WHERE e.work_pk = {WORK_PK}
         GROUP BY t.id, t.name, t.description, e.id, e.description, e.page_reference, e.created_at
         ORDER BY t.name
         """
@@ -1196,7 +2098,8 @@ def get_work_tropes(work_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/works/<work_id>', methods=['PUT'])
+@app.route('/api/works/<work_id>', methods=['PUT', 'PATCH'])
+@serialized_write
 def update_work(work_id):
     """Update an existing work"""
     try:
@@ -1205,113 +2108,106 @@ def update_work(work_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        conn = get_db_connection()
-        
-        # Check if work exists
-        existing_work = conn.execute("SELECT * FROM works WHERE id = ?", (work_id,)).fetchone()
-        if not existing_work:
-            conn.close()
-            return jsonify({"error": "Work not found"}), 404
-        
-        # Get current values as defaults
-        current = dict_from_row(existing_work)
-        
-        title = data.get('title', current['title']).strip()
-        work_type = data.get('type', current['type']).strip()
-        year = data.get('year', current['year'])
-        author = data.get('author', current['author'] or '').strip()
-        description = data.get('description', current['description'] or '').strip()
+        # Only provided fields change; stored values already satisfy the table checks
+        changes = {}
         
         # Validate title
-        if len(title) < 1 or len(title) > 200:
-            conn.close()
-            return jsonify({"error": "Title must be between 1 and 200 characters"}), 400
+        if 'title' in data:
+            changes['title'] = data['title'].strip()
+            if len(changes['title']) < 1 or len(changes['title']) > 200:
+                return jsonify({"error": "Title must be between 1 and 200 characters"}), 400
         
         # Validate type
-        valid_types = ['Novel', 'Film', 'TV Show', 'Short Story', 'Comic', 'Game', 'Other']
-        if work_type not in valid_types:
-            conn.close()
-            return jsonify({"error": f"Type must be one of: {', '.join(valid_types)}"}), 400
+        if 'type' in data:
+            changes['type'] = data['type'].strip()
+            valid_types = ['Novel', 'Film', 'TV Show', 'Short Story', 'Comic', 'Game', 'Other']
+            if changes['type'] not in valid_types:
+                return jsonify({"error": f"Type must be one of: {', '.join(valid_types)}"}), 400
         
         # Validate year if provided
-        if year is not None:
-            try:
-                year = int(year)
-                if year < 1000 or year > 2100:
-                    conn.close()
-                    return jsonify({"error": "Year must be between 1000 and 2100"}), 400
-            except (ValueError, TypeError):
-                conn.close()
-                return jsonify({"error": "Year must be a valid number"}), 400
+        if 'year' in data:
+            year = data['year']
+            if year is not None:
+                try:
+                    year = int(year)
+                    if year < 1000 or year > 2100:
+                        return jsonify({"error": "Year must be between 1000 and 2100"}), 400
+                except (ValueError, TypeError):
+                    return jsonify({"error": "Year must be a valid number"}), 400
+            changes['year'] = year
         
         # Validate lengths
-        if author and len(author) > 100:
-            conn.close()
-            return jsonify({"error": "Author must be 100 characters or less"}), 400
+        if 'author' in data:
+            changes['author'] = data['author'].strip()
+            if len(changes['author']) > 100:
+                return jsonify({"error": "Author must be 100 characters or less"}), 400
+        
+        if 'description' in data:
+            changes['description'] = data['description'].strip()
+            if len(changes['description']) > 2000:
+                return jsonify({"error": "Description must be 2000 characters or less"}), 400
+        
+        changes['updated_at'] = datetime.now().isoformat()
+        # The type is stored as its work_types id
+        assignments = ''.join(
+            f'type_id = {WORK_TYPE_ID}, ' if column == 'type' else f'{column} = ?, ' for column in changes
+        )
         
-        if description and len(description) > 2000:
-            conn.close()
-            return jsonify({"error": "Description must be 2000 characters or less"}), 400
+        # Bump the row version, but only from a version the client has seen
+        condition, params = versioning.precondition(versioning.expected_versions(request.if_match))
         
-        # Check for duplicate title (excluding current work)
-        duplicate_check = conn.execute(
-            "SELECT id FROM works WHERE title = ? AND id != ?", 
-            (title, work_id)
-        ).fetchone()
+        conn = get_db_connection()
         
-        if duplicate_check:
+        # The unique index rejects title clashes
+        try:
+            updated = conn.execute(
+                f"UPDATE works SET {assignments}version = version + 1 WHERE id = ?{condition} RETURNING {WORK_COLUMNS}",
+                (*changes.values(), work_id, *params)
+            ).fetchall()
+        except sqlite3.IntegrityError as e:
+            if constraints.violation(e) != constraints.UNIQUE:
+                raise
             conn.close()
             return jsonify({"error": "A work with this title already exists"}), 400
         
-        # Update the work
-        timestamp = datetime.now().isoformat()
-        
-        conn.execute("""
-            UPDATE works 
-            SET title = ?, type = ?, year = ?, author = ?, description = ?, updated_at = ?
-            WHERE id = ?
-        """, (title, work_type, year, author, description, timestamp, work_id))
+        if not updated:
+            return missing_or_modified(conn, 'works', work_id, 'Work')
         
         conn.commit()
-        
-        # Fetch updated work
-        updated_work = conn.execute("SELECT * FROM works WHERE id = ?", (work_id,)).fetchone()
         conn.close()
         
-        return jsonify({
+        response = jsonify({
             "message": "Work updated successfully",
-            "work": dict_from_row(updated_work)
+            "work": dict_from_row(updated[0])
         })
+        return versioning.with_etag(response, updated[0]['version'])
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/works/<work_id>', methods=['DELETE'])
+@serialized_write
 def delete_work(work_id):
     """Delete a work and all its examples"""
     try:
         conn = get_db_connection()
         
-        # Check if work exists
-        work = conn.execute("SELECT * FROM works WHERE id = ?", (work_id,)).fetchone()
-        if not work:
+        # Examples would cascade with the work; deleting them first counts them
+        example_count = len(conn.execute(
+            f"DELETE FROM examples WHERE work_pk = {WORK_PK} RETURNING id",
+            (work_id,)
+        ).fetchall())
+        deleted = conn.execute(f"DELETE FROM works WHERE id = ? RETURNING {WORK_COLUMNS}", (work_id,)).fetchall()
+        if not deleted:
             conn.close()
             return jsonify({"error": "Work not found"}), 404
         
-        # Get count of examples that will be deleted
-        example_count = conn.execute(
-            "SELECT COUNT(*) as count FROM examples WHERE work_id = ?", 
-            (work_id,)
-        ).fetchone()['count']
-        
-        # Delete the work (examples will be deleted automatically due to CASCADE)
-        conn.execute("DELETE FROM works WHERE id = ?", (work_id,))
         conn.commit()
         conn.close()
         
         return jsonify({
             "message": "Work deleted successfully",
-            "deleted_work": dict_from_row(work),
+            "deleted_work": dict_from_row(deleted[0]),
             "deleted_examples": example_count
         })
         
@@ -1323,37 +2219,53 @@ def delete_work(work_id):
 # ======================
 
 @app.route('/api/examples')
+@coalesced
 def get_examples():
-    """Get all examples with optional filtering and sorting"""
+    """Get a page of examples with optional filtering and sorting"""
+    if 'ids' in request.args:
+        return multi_get('examples', request.args['ids'], request.args.get('fields'), request.args.get('expand'))
+    
     try:
-        conn = get_db_connection()
-        
         # Get query parameters
         search = request.args.get('search', '').strip()
         trope_id = request.args.get('trope_id', '').strip()
         work_id = request.args.get('work_id', '').strip()
-        sort_by = request.args.get('sort', 'created_at')  # created_at, trope_name, work_title
+        sort_by = request.args.get('sort', 'created_at')  # created_at, trope_name, work_title, description
         sort_order = request.args.get('order', 'desc')  # asc or desc
-        
-        # Build base query with joins for trope and work information
-        query = """
+        cursor = request.args.get('cursor', '').strip()
+        
+        try:
+            page_size = pagination.parse_page_size(request.args.get('limit'))
+            fields = fieldsets.parse_fields(request.args.get('fields'), fieldsets.EXAMPLE_FIELDS)
+            expand = fieldsets.parse_expand(request.args.get('expand'), fieldsets.EXAMPLE_EXPANSIONS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if sort_by not in pagination.EXAMPLE_SORT_KEYS:
+            sort_by = 'created_at'
+        sort_order = 'desc' if sort_order.lower() == 'desc' else 'asc'
+        sort_direction = sort_order.upper()
+        sort_key = pagination.EXAMPLE_SORT_KEYS[sort_by]
+        
+        # Totals default to on for the first page only
+        include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
+        
+        # Expansions look related rows up by these ids; drop them again if not requested
+        fields, hidden = fieldsets.example_projection(fields, expand)
+        
+        # Join tropes and works only when a field, the sort or the search needs them
+        joins = fieldsets.required_joins(fields, fieldsets.EXAMPLE_FIELDS)
+        if search or sort_by == 'trope_name':
+            joins.add('trope')
+        if search or sort_by == 'work_title':
+            joins.add('work')
+        
+        query = f"""
         SELECT 
-            e.id,
-            e.trope_id,
-            e.work_id,
-            e.description,
-            e.page_reference,
-            e.created_at,
-            e.updated_at,
-            t.name as trope_name,
-            t.description as trope_description,
-            w.title as work_title,
-            w.type as work_type,
-            w.year as work_year,
-            w.author as work_author
+            {fieldsets.select_list(fields, fieldsets.EXAMPLE_FIELDS)},
+            {sort_key} as sort_key
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id  
-        JOIN works w ON e.work_id = w.id
+        {' '.join(fieldsets.EXAMPLE_JOINS[join] for join in sorted(joins))}
         WHERE 1=1
         """
         params = []
@@ -1366,61 +2278,77 @@ def get_examples():
         
         # Add trope filter
         if trope_id:
-            query += " AND e.trope_id = ?"
+            query += f" AND e.trope_pk = {TROPE_PK}"
             params.append(trope_id)
         
         # Add work filter  
         if work_id:
-            query += " AND e.work_id = ?"
+            query += f" AND e.work_pk = {WORK_PK}"
             params.append(work_id)
         
-        # Add sorting
-        sort_fields_map = {
-            'created_at': 'e.created_at',
-            'trope_name': 't.name',
-            'work_title': 'w.title',
-            'description': 'e.description'
-        }
+        filtered = len(params) > 0
         
-        sort_field = sort_fields_map.get(sort_by, 'e.created_at')
-        sort_direction = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
-        query += f" ORDER BY {sort_field} {sort_direction}"
+        # Unfiltered totals come from the analytics counters; filtered ones from a
+        # window over the whole filtered set, so the page is cut in an outer query
+        key_sql, id_sql = sort_key, 'e.id'
+        if include_total and filtered:
+            query = f"SELECT * FROM (SELECT *, COUNT(*) OVER () AS total_count FROM ({query})) WHERE 1=1"
+            key_sql, id_sql = 'sort_key', 'id'
         
+        if cursor:
+            try:
+                cursor_key, cursor_id = pagination.decode_cursor(cursor, sort_by, sort_order)
+            except pagination.CursorError as e:
+                return jsonify({"error": str(e)}), 400
+            keyset_sql, keyset_params = pagination.keyset_clause(
+                key_sql, id_sql, sort_direction, cursor_key, cursor_id
+            )
+            query += keyset_sql
+            params.extend(keyset_params)
+        
+        query += pagination.order_clause(key_sql, id_sql, sort_direction)
+        query += " LIMIT ?"
+        params.append(page_size + 1)
+        
+        conn = get_db_connection()
         examples = conn.execute(query, params).fetchall()
         
-        # Convert to list of dictionaries
-        examples_list = [dict_from_row(example) for example in examples]
+        total_count = None
+        if include_total:
+            if not filtered:
+                total_count = analytics.total(conn, 'examples')
+            else:
+                total_count = examples[0]['total_count'] if examples else 0
         
-        # Get total count for metadata
-        count_query = """
-        SELECT COUNT(*) as total 
-        FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        JOIN works w ON e.work_id = w.id
-        WHERE 1=1
-        """
-        count_params = []
+        has_more = len(examples) > page_size
+        examples = examples[:page_size]
+        next_cursor = None
+        if has_more:
+            last = examples[-1]
+            next_cursor = pagination.encode_cursor(sort_by, sort_order, last['sort_key'], last['id'])
         
-        if search:
-            count_query += " AND (e.description LIKE ? OR e.page_reference LIKE ? OR t.name LIKE ? OR w.title LIKE ?)"
-            search_term = f"%{search}%"
-            count_params.extend([search_term, search_term, search_term, search_term])
+        # Convert to list of dictionaries
+        examples_list = []
+        for example in examples:
+            example_dict = dict_from_row(example)
+            example_dict.pop('sort_key')
+            example_dict.pop('total_count', None)
+            examples_list.append(example_dict)
         
-        if trope_id:
-            count_query += " AND e.trope_id = ?"
-            count_params.append(trope_id)
-            
-        if work_id:
-            count_query += " AND e.work_id = ?"
-            count_params.append(work_id)
-            
-        total_count = conn.execute(count_query, count_params).fetchone()['total']
+        if expand:
+            fieldsets.expand_examples(conn, examples_list, expand)
+            for example_dict in examples_list:
+                for name in hidden:
+                    example_dict.pop(name)
         
         conn.close()
         
         return jsonify({
             "examples": examples_list,
             "total": total_count,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "limit": page_size,
             "filters": {
                 "search": search,
                 "trope_id": trope_id,
@@ -1436,6 +2364,7 @@ def get_examples():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/examples', methods=['POST'])
+@serialized_write
 def create_example():
     """Create a new example linking a trope to a work"""
     try:
@@ -1460,76 +2389,73 @@ def create_example():
         
         conn = get_db_connection()
         
-        # Validate that trope exists
-        trope = conn.execute("SELECT id, name FROM tropes WHERE id = ?", (trope_id,)).fetchone()
-        if not trope:
-            conn.close()
-            return jsonify({"error": "Trope not found"}), 400
-        
-        # Validate that work exists
-        work = conn.execute("SELECT id, title FROM works WHERE id = ?", (work_id,)).fetchone()
-        if not work:
-            conn.close()
-            return jsonify({"error": "Work not found"}), 400
-        
-        # Check for duplicate example (same trope + work combination)
-        existing = conn.execute(
-            "SELECT id FROM examples WHERE trope_id = ? AND work_id = ?", 
-            (trope_id, work_id)
-        ).fetchone()
-        if existing:
-            conn.close()
-            return jsonify({"error": "An example already exists for this trope and work combination"}), 400
-        
         # Generate UUID and timestamps
         example_id = str(uuid.uuid4())
         timestamp = datetime.now().isoformat()
         
-        # Insert into database
-        conn.execute("""
-            INSERT INTO examples (id, trope_id, work_id, description, page_reference, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (example_id, trope_id, work_id, description, page_reference, timestamp, timestamp))
+        # An unknown trope or work leaves its key NULL, the (trope_pk, work_pk) key rejects a repeat
+        try:
+            conn.execute(f"""
+                INSERT INTO examples (id, trope_pk, work_pk, description, page_reference, created_at, updated_at)
+                VALUES (?, {TROPE_PK}, {WORK_PK}, ?, ?, ?, ?)
+            """, (example_id, trope_id, work_id, description, page_reference, timestamp, timestamp))
+        except sqlite3.IntegrityError as e:
+            violation = constraints.violation(e)
+            if violation == constraints.NOT_NULL:
+                error = missing_example_parent(conn, trope_id)
+            elif violation == constraints.UNIQUE:
+                error = "An example already exists for this trope and work combination"
+            else:
+                raise
+            conn.close()
+            return jsonify({"error": error}), 400
         
         conn.commit()
         
         # Fetch the created example with related data
         example_query = """
         SELECT 
-            e.id, e.trope_id, e.work_id, e.description, e.page_reference, e.created_at, e.updated_at,
-            t.name as trope_name, w.title as work_title, w.type as work_type
+            e.id, t.id as trope_id, w.id as work_id, e.description, e.page_reference, e.created_at, e.updated_at, e.version,
+            t.name as trope_name, w.title as work_title, wt.name as work_type
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        JOIN works w ON e.work_id = w.id
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
         WHERE e.id = ?
         """
         
         new_example = conn.execute(example_query, (example_id,)).fetchone()
         conn.close()
         
-        return jsonify({
+        response = jsonify({
             "message": "Example created successfully",
             "example": dict_from_row(new_example)
-        }), 201
+        })
+        return versioning.with_etag(response, new_example['version']), 201
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/examples/<example_id>')
+@coalesced
 def get_example(example_id):
     """Get a specific example by ID with related trope and work data"""
     try:
+        if wants_projection():
+            return projected_detail('examples', example_id)
+        
         conn = get_db_connection()
         
         # Get the example with related trope and work information
         example_query = """
         SELECT 
-            e.id, e.trope_id, e.work_id, e.description, e.page_reference, e.created_at, e.updated_at,
+            e.id, t.id as trope_id, w.id as work_id, e.description, e.page_reference, e.created_at, e.updated_at, e.version,
             t.name as trope_name, t.description as trope_description,
-            w.title as work_title, w.type as work_type, w.year as work_year, w.author as work_author
+            w.title as work_title, wt.name as work_type, w.year as work_year, w.author as work_author
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        JOIN works w ON e.work_id = w.id
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
         WHERE e.id = ?
         """
         
@@ -1541,12 +2467,13 @@ def get_example(example_id):
         
         conn.close()
         
-        return jsonify(dict_from_row(example))
+        return versioning.with_etag(jsonify(dict_from_row(example)), example['version'])
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/examples/<example_id>', methods=['PUT'])
+@app.route('/api/examples/<example_id>', methods=['PUT', 'PATCH'])
+@serialized_write
 def update_example(example_id):
     """Update an existing example"""
     try:
@@ -1555,91 +2482,84 @@ def update_example(example_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        conn = get_db_connection()
-        
-        # Check if example exists
-        existing_example = conn.execute("SELECT * FROM examples WHERE id = ?", (example_id,)).fetchone()
-        if not existing_example:
-            conn.close()
-            return jsonify({"error": "Example not found"}), 404
+        # Only provided fields change; stored values already satisfy the table checks
+        changes = {}
         
-        # Get current values as defaults
-        current = dict_from_row(existing_example)
-        
-        trope_id = data.get('trope_id', current['trope_id']).strip()
-        work_id = data.get('work_id', current['work_id']).strip()
-        description = data.get('description', current['description']).strip()
-        page_reference = data.get('page_reference', current['page_reference'] or '').strip()
+        for column in ('trope_id', 'work_id'):
+            if column in data:
+                changes[column] = data[column].strip()
         
         # Validate description
-        if len(description) < 5 or len(description) > 2000:
-            conn.close()
-            return jsonify({"error": "Description must be between 5 and 2000 characters"}), 400
+        if 'description' in data:
+            changes['description'] = data['description'].strip()
+            if len(changes['description']) < 5 or len(changes['description']) > 2000:
+                return jsonify({"error": "Description must be between 5 and 2000 characters"}), 400
         
         # Validate page_reference length
-        if page_reference and len(page_reference) > 100:
-            conn.close()
-            return jsonify({"error": "Page reference must be 100 characters or less"}), 400
+        if 'page_reference' in data:
+            changes['page_reference'] = data['page_reference'].strip()
+            if len(changes['page_reference']) > 100:
+                return jsonify({"error": "Page reference must be 100 characters or less"}), 400
         
-        # Validate that trope exists (if changed)
-        if trope_id != current['trope_id']:
-            trope = conn.execute("SELECT id FROM tropes WHERE id = ?", (trope_id,)).fetchone()
-            if not trope:
-                conn.close()
-                return jsonify({"error": "Trope not found"}), 400
+        changes['updated_at'] = datetime.now().isoformat()
+        # The trope and work are stored by their integer keys
+        keys = {'trope_id': f'trope_pk = {TROPE_PK}', 'work_id': f'work_pk = {WORK_PK}'}
+        assignments = ''.join(f"{keys.get(column, f'{column} = ?')}, " for column in changes)
         
-        # Validate that work exists (if changed)
-        if work_id != current['work_id']:
-            work = conn.execute("SELECT id FROM works WHERE id = ?", (work_id,)).fetchone()
-            if not work:
-                conn.close()
-                return jsonify({"error": "Work not found"}), 400
-        
-        # Check for duplicate if trope_id or work_id changed
-        if trope_id != current['trope_id'] or work_id != current['work_id']:
-            duplicate_check = conn.execute(
-                "SELECT id FROM examples WHERE trope_id = ? AND work_id = ? AND id != ?", 
-                (trope_id, work_id, example_id)
-            ).fetchone()
-            
-            if duplicate_check:
-                conn.close()
-                return jsonify({"error": "An example already exists for this trope and work combination"}), 400
+        # Bump the row version, but only from a version the client has seen
+        condition, params = versioning.precondition(versioning.expected_versions(request.if_match))
         
-        # Update the example
-        timestamp = datetime.now().isoformat()
+        conn = get_db_connection()
+        
+        # An unknown trope or work leaves its key NULL, the (trope_pk, work_pk) key rejects a repeat
+        try:
+            updated = conn.execute(
+                f"UPDATE examples SET {assignments}version = version + 1 WHERE id = ?{condition} RETURNING id",
+                (*changes.values(), example_id, *params)
+            ).fetchall()
+        except sqlite3.IntegrityError as e:
+            violation = constraints.violation(e)
+            if violation == constraints.NOT_NULL:
+                error = (missing_example_parent(conn, changes['trope_id'])
+                         if 'trope_id' in changes else "Work not found")
+            elif violation == constraints.UNIQUE:
+                error = "An example already exists for this trope and work combination"
+            else:
+                raise
+            conn.close()
+            return jsonify({"error": error}), 400
         
-        conn.execute("""
-            UPDATE examples 
-            SET trope_id = ?, work_id = ?, description = ?, page_reference = ?, updated_at = ?
-            WHERE id = ?
-        """, (trope_id, work_id, description, page_reference, timestamp, example_id))
+        if not updated:
+            return missing_or_modified(conn, 'examples', example_id, 'Example')
         
         conn.commit()
         
         # Fetch updated example with related data
         example_query = """
         SELECT 
-            e.id, e.trope_id, e.work_id, e.description, e.page_reference, e.created_at, e.updated_at,
-            t.name as trope_name, w.title as work_title, w.type as work_type
+            e.id, t.id as trope_id, w.id as work_id, e.description, e.page_reference, e.created_at, e.updated_at, e.version,
+            t.name as trope_name, w.title as work_title, wt.name as work_type
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        JOIN works w ON e.work_id = w.id
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
         WHERE e.id = ?
         """
         
         updated_example = conn.execute(example_query, (example_id,)).fetchone()
         conn.close()
         
-        return jsonify({
+        response = jsonify({
             "message": "Example updated successfully",
             "example": dict_from_row(updated_example)
         })
+        return versioning.with_etag(response, updated_example['version'])
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/examples/<example_id>', methods=['DELETE'])
+@serialized_write
 def delete_example(example_id):
     """Delete an example"""
     try:
@@ -1648,11 +2568,12 @@ def delete_example(example_id):
         # Get example with related data before deletion
         example_query = """
         SELECT 
-            e.id, e.trope_id, e.work_id, e.description, e.page_reference, e.created_at, e.updated_at,
-            t.name as trope_name, w.title as work_title, w.type as work_type
+            e.id, t.id as trope_id, w.id as work_id, e.description, e.page_reference, e.created_at, e.updated_at, e.version,
+            t.name as trope_name, w.title as work_title, wt.name as work_type
         FROM examples e
-        JOIN tropes t ON e.trope_id = t.id
-        JOIN works w ON e.work_id = w.id
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
         WHERE e.id = ?
         """
         
@@ -1683,6 +2604,7 @@ def main():
         exit(1)
     
     print(f"Starting Flask app with database at: {DB_PATH}")
+    start_background_work()
     app.run(debug=True, host='0.0.0.0', port=8000, use_reloader=False)
 
 if __name__ == '__main__':
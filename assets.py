@@ -0,0 +1,260 @@
+"""
+Static asset pipeline: minified, content-hashed copies with a manifest.
+
+build() minifies CSS and JavaScript under static/, writes each file to
+static/dist/ under a name with a hash of its content (app.3f9c2a71d0e4.js),
+precompresses the results for compression.send_static and records the names
+in static/dist/manifest.json. A changed file gets a new name, so hashed files
+never change and can be cached by browsers for a year with `immutable`.
+Files from the previous build are kept, so pages rendered before a deploy can
+still load the assets they reference.
+
+Manifest resolves source names to hashed names for url_for. A source edited
+after the last build resolves to itself, so development never serves stale
+code. Without a build everything is served from static/ as before.
+
+The minifiers are deliberately conservative: they only drop comments and
+collapse whitespace, and leave line breaks in JavaScript so automatic
+semicolon insertion still applies.
+"""
+import hashlib
+import json
+import os
+import re
+
+import compression
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+
+# Hashed assets never change, so clients may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Tokens after which a / starts a regular expression rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield', 'await', 'delete', 'instanceof'}
+
+
+def _string_end(text, i):
+    """Index just past the quoted string starting at i"""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def minify_css(text):
+    """Drop comments and collapse whitespace outside strings"""
+    out, strings = [], []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in '"\'':
+            # Strings are set aside so the substitutions below cannot touch them
+            j = _string_end(text, i)
+            strings.append(text[i:j])
+            out.append(f'\0{len(strings) - 1}\0')
+            i = j
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif c.isspace():
+            while i < n and text[i].isspace():
+                i += 1
+            out.append(' ')
+        else:
+            out.append(c)
+            i += 1
+    css = ''.join(out)
+    # Spaces before ':' are kept: `.card :hover` is not `.card:hover`
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: strings[int(m.group(1))], css)
+
+
+def _previous_word(out):
+    """Identifier or keyword just before the end of out"""
+    word = []
+    for piece in reversed(out):
+        for ch in reversed(piece):
+            if ch.isalnum() or ch in '_$':
+                word.append(ch)
+            elif word or not ch.isspace():
+                return ''.join(reversed(word))
+    return ''.join(reversed(word))
+
+
+def minify_js(text):
+    """Drop comments, indentation and blank lines outside strings, templates and regexes"""
+    out = []
+    templates = []  # open brace depth inside each `${ ... }`
+    last = ''  # last significant character written
+    i, n = 0, len(text)
+
+    def newline():
+        while out and out[-1] == ' ':
+            out.pop()
+        if out and out[-1] != '\n':
+            out.append('\n')
+
+    while i < n:
+        c = text[i]
+        if c == '`' or (c == '}' and templates and templates[-1] == 0):
+            if c == '}':
+                templates.pop()
+            j = i + 1
+            while j < n and text[j] != '`' and not text.startswith('${', j):
+                j += 2 if text[j] == '\\' else 1
+            if text.startswith('${', j):
+                templates.append(0)
+                j += 2
+            else:
+                j += 1
+            out.append(text[i:j])
+            last = text[j - 1]
+            i = j
+        elif c in '"\'':
+            j = _string_end(text, i)
+            out.append(text[i:j])
+            last = c
+            i = j
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            comment = text[i:n if end < 0 else end]
+            i = n if end < 0 else end + 2
+            if '\n' in comment:
+                newline()
+            elif out and out[-1] not in ' \n':
+                out.append(' ')
+        elif c == '/' and (last == '' or last in _REGEX_PRECEDERS or _previous_word(out) in _REGEX_KEYWORDS):
+            j, in_class = i + 1, False
+            while j < n and text[j] != '\n' and (in_class or text[j] != '/'):
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and text[j].isalpha():
+                j += 1
+            out.append(text[i:j])
+            last = '/'
+            i = j
+        elif c in '\r\n':
+            newline()
+            i += 1
+        elif c.isspace():
+            while i < n and text[i] in ' \t':
+                i += 1
+            if out and out[-1] not in ' \n':
+                out.append(' ')
+        else:
+            if templates and c == '{':
+                templates[-1] += 1
+            elif templates and c == '}':
+                templates[-1] -= 1
+            out.append(c)
+            last = c
+            i += 1
+    newline()
+    return ''.join(out)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(static_dir):
+    """Write minified, hashed copies of everything under static_dir and return the manifest"""
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    os.makedirs(build_dir, exist_ok=True)
+    manifest_path = os.path.join(build_dir, MANIFEST)
+    previous = _read_manifest(manifest_path)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir:
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for name in sorted(files):
+            stem, suffix = os.path.splitext(name)
+            if suffix in compression.SUFFIXES.values():
+                continue
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            if suffix in MINIFIERS:
+                data = MINIFIERS[suffix](data.decode('utf-8')).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            hashed = os.path.join(os.path.dirname(logical), f'{stem}.{digest}{suffix}').replace(os.sep, '/')
+            target = os.path.join(build_dir, hashed)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(target + '.tmp', target)
+            manifest[logical] = f'{BUILD_DIR}/{hashed}'
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Keep this build and the previous one; precompress drops orphaned .gz/.br
+    keep = {os.path.join(static_dir, path) for path in list(manifest.values()) + list(previous.values())}
+    for root, _, files in os.walk(build_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if name != MANIFEST and os.path.splitext(name)[1] not in compression.SUFFIXES.values() and path not in keep:
+                os.remove(path)
+    compression.precompress(build_dir)
+    return manifest
+
+
+class Manifest:
+    """Hashed names from the last build, reloaded when the manifest changes"""
+
+    def __init__(self, static_dir):
+        # Callable returning the static folder, resolved on every use
+        self.static_dir = static_dir
+        self._cached = (None, {})
+
+    def resolve(self, filename):
+        """Hashed name for a static file, or the name itself when it is not built or was edited since"""
+        directory = self.static_dir()
+        path = os.path.join(directory, BUILD_DIR, MANIFEST)
+        try:
+            built = os.stat(path)
+        except OSError:
+            return filename
+        key = (path, built.st_ino, built.st_mtime_ns)
+        if self._cached[0] != key:
+            self._cached = (key, _read_manifest(path))
+        hashed = self._cached[1].get(filename)
+        if hashed is None:
+            return filename
+        try:
+            if os.stat(os.path.join(directory, filename)).st_mtime > built.st_mtime:
+                return filename
+        except OSError:
+            pass
+        return hashed
+
+
+def is_hashed(filename):
+    """Whether a static filename is a content-hashed build output"""
+    return filename.startswith(BUILD_DIR + '/') and filename != f'{BUILD_DIR}/{MANIFEST}'
@@ -0,0 +1,379 @@
+"""
+Online backups, WAL archiving and point-in-time restore.
+
+A backup is a *generation*: a snapshot of the database plus, when the WAL
+archiver is running, every WAL frame written after it. Snapshots use the
+SQLite backup API a few hundred pages at a time from inside one read
+transaction, so the copy is consistent, never restarts and never blocks
+writers; a pause between steps keeps a multi-GB copy from starving live
+requests of I/O.
+
+The archiver keeps a read transaction open between polls so the WAL cannot be
+restarted under it, and on each poll briefly takes the write lock to append
+the frames committed since the last poll to a segment file. Once the WAL is
+large it checkpoints before letting go of the write lock, so the next writer
+can restart the WAL with every frame already archived. An archiver that
+starts (or restarts) always begins a new generation.
+
+Restoring copies a generation's snapshot, replays its archived WAL cycles up
+to the requested time (SQLite's own recovery stops at the last complete
+commit), and verifies the result before moving it into place.
+
+Layout of the backup directory:
+
+    <generation>/snapshot.db
+    <generation>/generation.json
+    <generation>/wal/<cycle>-<offset>-<archived at, ms>.wal
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step and the pause between steps
+PAGES_PER_STEP = 1024
+STEP_PAUSE = 0.005
+
+# Seconds between WAL polls, and WAL size that makes the archiver checkpoint
+ARCHIVE_INTERVAL = 5
+ROTATE_BYTES = 16 * 1024 * 1024
+
+# Generations kept by prune()
+KEEP_GENERATIONS = 7
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+
+
+class BackupError(Exception):
+    """Raised when a backup cannot be taken or restored"""
+
+
+def _connect(path, **kwargs):
+    return sqlite3.connect(path, isolation_level=None, check_same_thread=False, **kwargs)
+
+
+def _generation_id():
+    """Sortable name for a new generation"""
+    now = time.time()
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f'.{int(now * 1e6) % 1_000_000:06d}Z'
+
+
+def snapshot(source, target_path, pages=PAGES_PER_STEP, pause=STEP_PAUSE, progress=None):
+    """Copy the database open on `source` to `target_path` in paced steps.
+
+    `source` is a connection or a path. The copy runs inside one read
+    transaction, so it is the database as of the moment the copy started.
+    `progress(done, total)` is called with page counts after each step.
+    """
+    def step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        time.sleep(pause)
+
+    own = isinstance(source, str)
+    conn = _connect(source) if own else source
+    tmp_path = target_path + '.partial'
+    target = sqlite3.connect(tmp_path)
+    started = time.perf_counter()
+    try:
+        began = not conn.in_transaction
+        if began:
+            conn.execute('BEGIN')
+            conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            conn.backup(target, pages=pages, progress=step)
+        finally:
+            if began:
+                conn.execute('COMMIT')
+        page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        page_size = target.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        target.close()
+        if own:
+            conn.close()
+    os.replace(tmp_path, target_path)
+    return {
+        'pages': page_count,
+        'bytes': page_count * page_size,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def create_generation(source, backup_dir, progress=None):
+    """Snapshot into a new generation directory; returns its path"""
+    path = os.path.join(backup_dir, _generation_id())
+    os.makedirs(os.path.join(path, 'wal'))
+    # The snapshot shows the database as it was when the copy started
+    created_at = time.time()
+    info = snapshot(source, os.path.join(path, 'snapshot.db'), progress=progress)
+    info['created_at'] = created_at
+    with open(os.path.join(path, 'generation.json'), 'w') as f:
+        json.dump(info, f)
+    return path
+
+
+def generations(backup_dir):
+    """Complete generations, oldest first, as dicts with path, created_at and segment count"""
+    if not os.path.isdir(backup_dir):
+        return []
+    found = []
+    for name in sorted(os.listdir(backup_dir)):
+        meta_path = os.path.join(backup_dir, name, 'generation.json')
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        segments = _segments(os.path.join(backup_dir, name))
+        meta.update({
+            'id': name,
+            'path': os.path.join(backup_dir, name),
+            'segments': len(segments),
+            'archived_until': segments[-1][2] / 1000 if segments else meta['created_at'],
+        })
+        found.append(meta)
+    return found
+
+
+def prune(backup_dir, keep=KEEP_GENERATIONS):
+    """Delete all but the newest `keep` generations; returns the removed ids"""
+    removed = []
+    for generation in generations(backup_dir)[:-keep] if keep > 0 else generations(backup_dir):
+        shutil.rmtree(generation['path'])
+        removed.append(generation['id'])
+    return removed
+
+
+def _segments(generation_path):
+    """[(cycle, offset, archived_ms, path)] in replay order"""
+    wal_dir = os.path.join(generation_path, 'wal')
+    segments = []
+    for name in os.listdir(wal_dir) if os.path.isdir(wal_dir) else ():
+        if name.endswith('.wal'):
+            cycle, offset, archived_ms = (int(part) for part in name[:-4].split('-'))
+            segments.append((cycle, offset, archived_ms, os.path.join(wal_dir, name)))
+    return sorted(segments)
+
+
+def _wal_header(data):
+    """(page_size, salt) from the first bytes of a WAL file, or None"""
+    if len(data) < WAL_HEADER_SIZE:
+        return None
+    magic, _, page_size, _, salt1, salt2 = struct.unpack('>IIIIII', data[:24])
+    if magic not in (0x377f0682, 0x377f0683):
+        return None
+    return page_size, (salt1, salt2)
+
+
+def _committed_end(data, offset, salt, page_size):
+    """End of the last commit frame in `data` (WAL bytes from `offset`) with this salt"""
+    frame_size = WAL_FRAME_HEADER_SIZE + page_size
+    position = WAL_HEADER_SIZE if offset == 0 else 0
+    end = offset
+    while position + frame_size <= len(data):
+        _, commit_size, salt1, salt2 = struct.unpack('>IIII', data[position:position + 16])
+        # Frames left over from an earlier cycle carry its salt
+        if (salt1, salt2) != salt:
+            break
+        position += frame_size
+        if commit_size:
+            end = offset + position
+    return end
+
+
+class WalArchiver:
+    """Copies committed WAL frames of one database into a generation.
+
+    A read transaction is held from one poll to the next. While it is open
+    SQLite cannot restart the WAL over frames that have not been archived:
+    either the reader pins frames in the WAL, or (if the WAL had been fully
+    checkpointed when it began) checkpoints cannot make progress. The hold is
+    only released with the write lock taken and every frame copied, so each
+    WAL cycle is archived completely before the next one starts.
+    """
+
+    def __init__(self, db_path, backup_dir, rotate_bytes=ROTATE_BYTES):
+        self.db_path = db_path
+        self.wal_path = db_path + '-wal'
+        self.backup_dir = backup_dir
+        self.rotate_bytes = rotate_bytes
+        self.generation = None
+        self._reader = None
+        self._writer = None
+        self._cycle = 0
+        self._salt = None
+        self._offset = 0
+        self._stop = threading.Event()
+
+    def _hold_read(self):
+        self._reader.execute('BEGIN')
+        self._reader.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+    def start_generation(self):
+        """Snapshot the database and archive the WAL from there on"""
+        if self._reader is None:
+            self._reader = _connect(self.db_path)
+            self._writer = _connect(self.db_path, timeout=5)
+        if self._reader.in_transaction:
+            self._reader.execute('COMMIT')
+        self._hold_read()
+        # Taken inside the held read transaction: frames already in the WAL are
+        # in the snapshot, so replaying them again on restore is harmless
+        self.generation = create_generation(self._reader, self.backup_dir)
+        self._cycle, self._salt, self._offset = 0, None, 0
+        logger.info("Started backup generation %s", self.generation)
+        return self.generation
+
+    def _copy(self):
+        """Append frames committed since the last copy; call with the write lock held"""
+        try:
+            with open(self.wal_path, 'rb') as f:
+                header = _wal_header(f.read(WAL_HEADER_SIZE))
+                if header is None:
+                    return
+                page_size, salt = header
+                if salt != self._salt:
+                    # The WAL was restarted: a new cycle begins at its header
+                    self._cycle, self._salt, self._offset = self._cycle + 1, salt, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        end = _committed_end(data, self._offset, salt, page_size)
+        if end <= self._offset:
+            return
+        name = f'{self._cycle:06d}-{self._offset:012d}-{int(time.time() * 1000):013d}.wal'
+        path = os.path.join(self.generation, 'wal', name)
+        with open(path + '.partial', 'wb') as out:
+            out.write(data[:end - self._offset])
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(path + '.partial', path)
+        self._offset = end
+
+    def poll(self):
+        """Archive newly committed frames, checkpointing once the WAL is large"""
+        if self.generation is None:
+            self.start_generation()
+        # Writers wait (on their busy timeout) only while new frames are copied
+        self._writer.execute('BEGIN IMMEDIATE')
+        try:
+            self._copy()
+            if self._offset >= self.rotate_bytes:
+                self._rotate()
+        finally:
+            self._writer.execute('ROLLBACK')
+
+    def _rotate(self):
+        """Let the WAL restart: everything in it has been archived"""
+        self._reader.execute('COMMIT')
+        try:
+            self._reader.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        finally:
+            self._hold_read()
+
+    def run(self, interval=ARCHIVE_INTERVAL, generation_every=None, keep=KEEP_GENERATIONS):
+        """Poll until stop() is called.
+
+        With `generation_every` (seconds) a fresh generation is started on that
+        schedule and generations beyond the newest `keep` are pruned.
+        """
+        self._stop.clear()
+        started_at = None
+        while not self._stop.is_set():
+            try:
+                if generation_every and (started_at is None or time.time() - started_at >= generation_every):
+                    if self.generation is not None:
+                        # Finish the outgoing generation up to this moment
+                        self.poll()
+                    self.start_generation()
+                    started_at = time.time()
+                    prune(self.backup_dir, keep=keep)
+                self.poll()
+            except sqlite3.Error:
+                logger.exception("WAL archiving failed; retrying")
+            self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                conn.close()
+        self._reader = self._writer = None
+
+
+def verify(path):
+    """Problems found in a database file; empty when it is sound"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check') if row[0] != 'ok']
+        problems += [
+            f"foreign key violation in {table} row {rowid} -> {parent}"
+            for table, rowid, parent, _ in conn.execute('PRAGMA foreign_key_check')
+        ]
+    finally:
+        conn.close()
+    return problems
+
+
+def restore(backup_dir, target_path, until=None, generation=None):
+    """Rebuild the database as of `until` (epoch seconds; default: latest).
+
+    Uses the newest generation whose snapshot is not after `until`, or the
+    named `generation`. The result is verified before it replaces
+    `target_path`; the server must not be running against that file.
+    """
+    candidates = generations(backup_dir)
+    if generation:
+        candidates = [g for g in candidates if g['id'] == generation]
+    elif until is not None:
+        candidates = [g for g in candidates if g['created_at'] <= until]
+    if not candidates:
+        raise BackupError("No backup generation covers the requested time")
+    chosen = candidates[-1]
+
+    work_path = target_path + '.restoring'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work_path + suffix):
+            os.remove(work_path + suffix)
+    shutil.copyfile(os.path.join(chosen['path'], 'snapshot.db'), work_path)
+
+    # Replay each WAL cycle in turn; recovery ignores frames after the last commit
+    cycles = {}
+    for cycle, _, archived_ms, path in _segments(chosen['path']):
+        if until is None or archived_ms / 1000 <= until:
+            cycles.setdefault(cycle, []).append(path)
+    replayed = 0
+    for cycle in sorted(cycles):
+        with open(work_path + '-wal', 'wb') as wal:
+            for path in cycles[cycle]:
+                with open(path, 'rb') as segment:
+                    shutil.copyfileobj(segment, wal)
+        conn = sqlite3.connect(work_path)
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+        replayed += len(cycles[cycle])
+
+    conn = sqlite3.connect(work_path)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.close()
+    problems = verify(work_path)
+    if problems:
+        raise BackupError(f"Restored database failed verification: {'; '.join(problems[:5])}")
+
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target_path + suffix):
+            os.remove(target_path + suffix)
+    os.replace(work_path, target_path)
+    return {'generation': chosen['id'], 'segments': replayed}
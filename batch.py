@@ -0,0 +1,157 @@
+"""
+In-process execution of batched API sub-requests.
+
+`run_batch` dispatches each sub-request through the normal Flask routing with
+a request context of its own, so handlers, validation and error responses are
+exactly those of individual calls. While a batch runs, `get_db_connection()`
+hands every handler on this thread the same connection through
+`SharedConnection`, and each sub-request runs inside its own savepoint:
+
+* a batch with writes is submitted whole to the single writer (writer.py) as
+  one operation, so it commits with the writer's group and never competes
+  with other writes in this process; an error status rolls back only that
+  sub-request, or in atomic mode the whole batch, skipping the rest;
+* a read-only batch runs in one read transaction of its own, and therefore
+  sees one snapshot.
+"""
+import threading
+import time
+
+MAX_ITEMS = 100
+MAX_BODY_BYTES = 1024 * 1024
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+READ_METHODS = ('GET',)
+
+_local = threading.local()
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch request"""
+
+
+class SharedConnection:
+    """Connection handed to handlers during a batch.
+
+    close() and commit() are no-ops: the batch ends its own transaction, or
+    the writer's group commit does. rollback() undoes the current sub-request.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.execute('ROLLBACK TO batch_item')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def current_connection():
+    """The shared connection if a batch is running on this thread"""
+    return getattr(_local, 'connection', None)
+
+
+def validate(items):
+    """Check the sub-request list, returning normalized (method, path, body) tuples"""
+    if not isinstance(items, list) or not items:
+        raise BatchError("requests must be a non-empty list")
+    if len(items) > MAX_ITEMS:
+        raise BatchError(f"A batch may contain at most {MAX_ITEMS} requests")
+
+    normalized = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BatchError(f"requests[{index}] must be an object")
+        method = str(item.get('method', 'GET')).upper()
+        path = item.get('path')
+        if method not in METHODS:
+            raise BatchError(f"requests[{index}].method must be one of: {', '.join(METHODS)}")
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise BatchError(f"requests[{index}].path must start with /api/")
+        if path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            raise BatchError(f"requests[{index}] cannot be a nested batch")
+        normalized.append((method, path, item.get('body')))
+    return normalized
+
+
+def _response_body(response):
+    response.direct_passthrough = False
+    if response.is_json:
+        return response.get_json()
+    return response.get_data(as_text=True)
+
+
+def has_writes(items):
+    """Whether any validated sub-request mutates"""
+    return any(method not in READ_METHODS for method, _, _ in items)
+
+
+def run_batch(app, connect, items, atomic=False):
+    """Execute validated sub-requests in order.
+
+    A batch with writes must be called as one operation on the writer thread,
+    where `connect()` returns the writer's connection inside its open
+    transaction. Read-only batches get a connection and transaction of their own.
+
+    Returns (results, committed) where results holds one dict per item with
+    its status, body and duration.
+    """
+    conn = connect()
+    writes = has_writes(items)
+    if writes and not conn.in_transaction:
+        conn.close()
+        raise RuntimeError("A batch with writes must run on the writer thread")
+    shared = SharedConnection(conn)
+    results = []
+    failed = False
+
+    _local.connection = shared
+    try:
+        if not writes:
+            conn.execute('BEGIN')
+
+        for index, (method, path, body) in enumerate(items):
+            if atomic and failed:
+                results.append({'index': index, 'status': None, 'skipped': True})
+                continue
+
+            started = time.perf_counter()
+            kwargs = {'method': method}
+            if body is not None:
+                kwargs['json'] = body
+            conn.execute('SAVEPOINT batch_item')
+            with app.test_request_context(path, **kwargs):
+                response = app.full_dispatch_request()
+            if response.status_code >= 400:
+                failed = True
+                conn.execute('ROLLBACK TO batch_item')
+            conn.execute('RELEASE batch_item')
+            duration_ms = round((time.perf_counter() - started) * 1000, 3)
+
+            result = {
+                'index': index,
+                'status': response.status_code,
+                'body': _response_body(response),
+                'duration_ms': duration_ms
+            }
+            if response.headers.get('Location'):
+                result['location'] = response.headers['Location']
+            results.append(result)
+
+        if writes and atomic and failed:
+            # Undoes the whole writer operation, leaving the rest of its group
+            conn.rollback()
+    finally:
+        _local.connection = None
+        if not writes:
+            conn.rollback()
+        conn.close()
+
+    return results, not (atomic and failed)
@@ -0,0 +1,75 @@
+"""
+Per-request time budgets for SQL statements.
+
+Each request gets a deadline from its endpoint's entry in ROUTE_BUDGETS (or
+DEFAULT_BUDGET). Every connection the app opens carries a progress handler
+that SQLite calls every PROGRESS_STEPS virtual machine steps; once the
+current request's deadline has passed it returns true, the running statement
+fails with "interrupted" and the request is marked as aborted so the app can
+answer 503 instead of whatever the view made of the error.
+
+Deadlines are thread-local, so they apply to the request thread only: writes
+on the writer thread and background jobs are not budgeted. Batch sub-requests
+push their own deadline but can never extend the batch's.
+"""
+import threading
+import time
+
+# Seconds of statement time a request may use, by Flask endpoint
+DEFAULT_BUDGET = 2.0
+ROUTE_BUDGETS = {
+    'search': 1.0,
+    'get_examples': 3.0,
+    'get_analytics': 5.0,
+    'get_activity_analytics': 5.0,
+    'export_csv': 30.0,
+    'run_batch': 10.0,
+}
+
+# Virtual machine steps between deadline checks
+PROGRESS_STEPS = 10000
+
+_local = threading.local()
+
+
+def budget_for(endpoint):
+    """Seconds allowed for an endpoint"""
+    return ROUTE_BUDGETS.get(endpoint, DEFAULT_BUDGET)
+
+
+def start(endpoint):
+    """Begin a request's budget and return it; nested requests keep the tighter deadline"""
+    stack = _local.__dict__.setdefault('stack', [])
+    deadline = time.monotonic() + budget_for(endpoint)
+    if stack:
+        deadline = min(deadline, stack[-1]['deadline'])
+    budget = {'endpoint': endpoint, 'deadline': deadline, 'aborted': False}
+    stack.append(budget)
+    return budget
+
+
+def finish():
+    """End the innermost request's budget; returns it, or None"""
+    stack = getattr(_local, 'stack', None)
+    return stack.pop() if stack else None
+
+
+def current():
+    """The innermost active budget on this thread, or None"""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def _check():
+    """Progress handler: non-zero aborts the running statement"""
+    budget = current()
+    if budget is None or time.monotonic() < budget['deadline']:
+        return 0
+    budget['aborted'] = True
+    return 1
+
+
+def install(conn):
+    """Enforce the calling thread's request budget on a connection"""
+    conn.set_progress_handler(_check, PROGRESS_STEPS)
+    return conn
@@ -0,0 +1,114 @@
+"""
+Single-flight coalescing of identical GET requests.
+
+Requests are keyed by path, query string and the database's data version.
+The first request for a key computes the response. Identical requests that
+arrive while it runs wait for it and reuse its serialized bytes, and for TTL
+seconds afterwards a finished response is served again as long as the data
+version has not moved. Any commit changes the version, so a client never gets
+a response computed before a write it has already seen succeed.
+
+The version comes from `PRAGMA data_version` on one idle connection per
+database and process (DataVersion): SQLite changes it whenever any other
+connection commits, in this process or another.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Seconds a finished response is reused at the same data version
+TTL = 2.0
+MAX_ENTRIES = 256
+
+# Longest a request waits for another's computation before running its own
+WAIT_TIMEOUT = 5.0
+
+
+class DataVersion:
+    """Commit counter for database files, read with PRAGMA data_version"""
+
+    def __init__(self):
+        self._conns = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            # Connections must not cross a fork
+            if self._pid != os.getpid():
+                self._conns, self._pid = {}, os.getpid()
+            conn = self._conns.get(path)
+            if conn is None:
+                conn = self._conns[path] = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            return conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class Coalescer:
+    """Runs one computation per key at a time and shares its result"""
+
+    def __init__(self, ttl=TTL, maxsize=MAX_ENTRIES, wait_timeout=WAIT_TIMEOUT):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.wait_timeout = wait_timeout
+        self._inflight = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.set_gauge('coalesce.inflight', lambda: len(self._inflight))
+
+    def run(self, key, compute, shareable=lambda result: True):
+        """(result, how) where how is 'computed', 'joined', 'cached' or 'fallback'"""
+        with self._lock:
+            entry = self._finished.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                metrics.incr('coalesce.cached')
+                return entry[1], 'cached'
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout) and flight.result is not None:
+                metrics.incr('coalesce.joined')
+                return flight.result, 'joined'
+            # The first request failed or is too slow; do not wait on it again
+            metrics.incr('coalesce.fallback')
+            return compute(), 'fallback'
+
+        result = None
+        try:
+            result = compute()
+            return result, 'computed'
+        finally:
+            shared = result if result is not None and shareable(result) else None
+            with self._lock:
+                del self._inflight[key]
+                if shared is not None:
+                    self._store(key, shared)
+            flight.result = shared
+            flight.done.set()
+            metrics.incr('coalesce.computed')
+
+    def _store(self, key, result):
+        now = time.monotonic()
+        self._finished[key] = (now + self.ttl, result)
+        self._finished.move_to_end(key)
+        while self._finished:
+            oldest_key, (expires, _) = next(iter(self._finished.items()))
+            if expires > now and len(self._finished) <= self.maxsize:
+                break
+            del self._finished[oldest_key]
+
+    def clear(self):
+        with self._lock:
+            self._finished.clear()
@@ -0,0 +1,242 @@
+"""
+Response compression.
+
+Middleware wraps the WSGI app and compresses text responses (JSON, HTML,
+CSS, JavaScript, CSV...) with brotli when the client accepts it and the
+`brotli` package is installed, or gzip otherwise. Bodies with a known length
+under MIN_SIZE are sent as they are; the extra headers would eat the saving.
+Responses without a length (generators) are compressed chunk by chunk and
+flushed after each chunk, so a client still gets data as it is produced.
+
+Static files are compressed once at build time (precompress, run by
+scripts/compress_static.py) into `.br` and `.gz` files next to each source,
+and send_static serves those copies. Nothing under static/ is compressed per
+request unless its precompressed copies are missing or older than the source.
+
+ETags are left alone: they are row versions that clients send back in
+If-Match, and they describe the resource rather than its encoding.
+"""
+import mimetypes
+import os
+import zlib
+
+from flask import send_from_directory
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_set_header
+from werkzeug.security import safe_join
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Known-length bodies smaller than this are not worth compressing
+MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'text/css', 'text/csv', 'text/html', 'text/javascript',
+    'text/plain', 'text/xml',
+}
+STATIC_EXTENSIONS = {'.css', '.csv', '.html', '.js', '.json', '.map', '.svg', '.txt', '.xml'}
+
+# Per-request levels favour speed, build-time levels favour size
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def encodings():
+    """Encodings this process can produce, preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, offered=None):
+    """Best encoding in `offered` that the Accept-Encoding header allows, or None"""
+    if not accept_encoding:
+        return None
+    accept = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in offered or encodings():
+        quality = accept.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def add_vary(headers, value='Accept-Encoding'):
+    vary = parse_set_header(headers.get('Vary'))
+    if value not in vary:
+        vary.add(value)
+        headers['Vary'] = vary.to_header()
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 31: gzip container with a zero timestamp, so output is reproducible
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b''):
+        return self._z.compress(data) + self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._b = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._b.process(data) + self._b.flush()
+
+    def finish(self, data=b''):
+        return self._b.process(data) + self._b.finish()
+
+
+def compressor(encoding, static=False):
+    if encoding == 'br':
+        return _Brotli(STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return _Gzip(STATIC_GZIP_LEVEL if static else GZIP_LEVEL)
+
+
+def compress(data, encoding, static=False):
+    return compressor(encoding, static).finish(data)
+
+
+def _compressible(status, headers):
+    code = int(status.split(None, 1)[0])
+    if code < 200 or code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in headers or 'Content-Range' in headers:
+        return False
+    if 'no-transform' in headers.get('Cache-Control', ''):
+        return False
+    mimetype = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+def _stream(chunks, codec):
+    for chunk in chunks:
+        if chunk:
+            out = codec.chunk(chunk)
+            if out:
+                yield out
+    yield codec.finish()
+
+
+class Middleware:
+    """WSGI middleware compressing responses the client accepts in a compressed form"""
+
+    def __init__(self, app, min_size=MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    @staticmethod
+    def _no_write(data):
+        raise RuntimeError("The legacy WSGI write() callable is not supported")
+
+    def __call__(self, environ, start_response):
+        started = []
+
+        def capture(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            return self._no_write
+
+        app_iter = self.app(environ, capture)
+        status, headers, exc_info = started
+        headers = Headers(headers)
+        if not _compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter
+
+        add_vary(headers)
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter
+
+        length = headers.get('Content-Length', type=int)
+        if length is not None:
+            try:
+                body = b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            if len(body) >= self.min_size:
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [body]
+
+        headers['Content-Encoding'] = encoding
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        close = getattr(app_iter, 'close', None)
+        return ClosingIterator(_stream(app_iter, compressor(encoding)), [close] if close else [])
+
+
+def _fresh(source, copy):
+    try:
+        return os.stat(copy).st_mtime >= os.stat(source).st_mtime
+    except OSError:
+        return False
+
+
+def send_static(directory, filename, accept_encoding, max_age=None):
+    """Serve a static file, or its precompressed copy when the client accepts one"""
+    source = safe_join(directory, filename)
+    # Copies made elsewhere are served even when this process has no brotli
+    offered = [] if source is None else [
+        encoding for encoding, suffix in SUFFIXES.items() if _fresh(source, source + suffix)
+    ]
+    if not offered:
+        return send_from_directory(directory, filename, max_age=max_age)
+
+    encoding = negotiate(accept_encoding, offered)
+    if encoding is None:
+        response = send_from_directory(directory, filename, max_age=max_age)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(directory, filename + SUFFIXES[encoding], mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    add_vary(response.headers)
+    return response
+
+
+def precompress(directory, min_size=MIN_SIZE):
+    """Write .gz (and .br when available) copies of compressible files under directory.
+
+    Returns (written, removed): copies written because they were missing or
+    stale, and orphaned copies whose source is gone.
+    """
+    written, removed = [], []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            base, suffix = os.path.splitext(path)
+            if suffix in SUFFIXES.values():
+                if not os.path.exists(base):
+                    os.remove(path)
+                    removed.append(path)
+                continue
+            if suffix not in STATIC_EXTENSIONS or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = None
+                for encoding in encodings():
+                    target = path + SUFFIXES[encoding]
+                    if _fresh(path, target):
+                        continue
+                    if data is None:
+                        data = f.read()
+                    tmp = target + '.tmp'
+                    with open(tmp, 'wb') as out:
+                        out.write(compress(data, encoding, static=True))
+                    os.replace(tmp, target)
+                    written.append(target)
+    return written, removed
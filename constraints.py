@@ -0,0 +1,80 @@
+"""
+Database constraints backing the write handlers.
+
+Uniqueness and referential integrity are enforced by SQLite itself, with
+`PRAGMA foreign_keys=ON` on every connection and the unique indexes created
+here, so handlers can write in a single statement and translate a constraint
+failure into the usual error response instead of checking first.
+
+Existing duplicate rows stop `ensure_schema` with `DuplicateRowsError` rather
+than leaving a table without its unique index.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# index name -> (table, indexed expression)
+UNIQUE_INDEXES = {
+    'idx_tropes_name_unique': ('tropes', 'LOWER(name)'),
+    'idx_works_title_unique': ('works', 'title'),
+}
+
+UNIQUE = 'unique'
+FOREIGN_KEY = 'foreign_key'
+CHECK = 'check'
+NOT_NULL = 'not_null'
+
+
+class DuplicateRowsError(sqlite3.IntegrityError):
+    """Existing rows prevent a unique index from being built"""
+
+
+def duplicates(conn, table, expression, limit=10):
+    """[(value, count)] for values of `expression` held by more than one row"""
+    return conn.execute(
+        f'SELECT {expression}, COUNT(*) FROM {table} GROUP BY {expression} '
+        f'HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC, {expression} LIMIT ?',
+        (limit,)
+    ).fetchall()
+
+
+def index_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def ensure_schema(conn):
+    """Create the unique indexes.
+
+    The write handlers rely on these indexes alone to reject duplicates, so
+    existing duplicate rows are fatal: the error lists them and they have to
+    be resolved before the app can start on this database.
+    """
+    for name, (table, expression) in UNIQUE_INDEXES.items():
+        try:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({expression})')
+        except sqlite3.IntegrityError:
+            found = ', '.join(f'{value!r} ({count} rows)' for value, count in duplicates(conn, table, expression))
+            logger.error("Cannot create %s: duplicate %s.%s values: %s", name, table, expression, found)
+            raise DuplicateRowsError(
+                f"Cannot create {name}: {table} has duplicate values of {expression}: {found}"
+            )
+    # The unique index on LOWER(name) serves the same lookups once it exists
+    if index_exists(conn, 'idx_tropes_name_unique'):
+        conn.execute('DROP INDEX IF EXISTS idx_tropes_name_lower')
+
+
+def violation(error):
+    """Kind of constraint an IntegrityError reports: UNIQUE, FOREIGN_KEY, CHECK or NOT_NULL"""
+    message = str(error)
+    if message.startswith('UNIQUE constraint failed'):
+        return UNIQUE
+    if message.startswith('FOREIGN KEY constraint failed'):
+        return FOREIGN_KEY
+    if message.startswith('CHECK constraint failed'):
+        return CHECK
+    if message.startswith('NOT NULL constraint failed'):
+        return NOT_NULL
+    return None
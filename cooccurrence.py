@@ -0,0 +1,230 @@
+"""
+Trope co-occurrence graph maintained from the examples table.
+
+`trope_cooccurrence` is a sparse trope x trope matrix stored as an adjacency
+list: one row per (trope, other trope) pair holding the number of works in
+which both appear. Both directions are stored so every lookup is a primary key
+range scan. Triggers on `examples` keep the counts current on insert, delete
+and update, so read queries never self-join the examples table. Tropes are
+identified by their integer `pk`.
+"""
+import schema
+
+# Hard limits for neighbourhood traversal
+MAX_DEPTH = 3
+MAX_NODES = 200
+DEFAULT_FANOUT = 10
+
+_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_examples_cooccurrence_insert
+AFTER INSERT ON examples
+BEGIN
+    INSERT INTO trope_cooccurrence (trope_pk, other_trope_pk, count)
+    SELECT NEW.trope_pk, e.trope_pk, 1
+    FROM examples e
+    WHERE e.work_pk = NEW.work_pk AND e.trope_pk != NEW.trope_pk
+    ON CONFLICT (trope_pk, other_trope_pk) DO UPDATE SET count = count + 1;
+
+    INSERT INTO trope_cooccurrence (trope_pk, other_trope_pk, count)
+    SELECT e.trope_pk, NEW.trope_pk, 1
+    FROM examples e
+    WHERE e.work_pk = NEW.work_pk AND e.trope_pk != NEW.trope_pk
+    ON CONFLICT (trope_pk, other_trope_pk) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_examples_cooccurrence_delete
+AFTER DELETE ON examples
+BEGIN
+    UPDATE trope_cooccurrence SET count = count - 1
+    WHERE trope_pk = OLD.trope_pk AND other_trope_pk IN (
+        SELECT e.trope_pk FROM examples e
+        WHERE e.work_pk = OLD.work_pk AND e.trope_pk != OLD.trope_pk
+    );
+
+    UPDATE trope_cooccurrence SET count = count - 1
+    WHERE other_trope_pk = OLD.trope_pk AND trope_pk IN (
+        SELECT e.trope_pk FROM examples e
+        WHERE e.work_pk = OLD.work_pk AND e.trope_pk != OLD.trope_pk
+    );
+
+    DELETE FROM trope_cooccurrence WHERE trope_pk = OLD.trope_pk AND count <= 0;
+
+    DELETE FROM trope_cooccurrence
+    WHERE other_trope_pk = OLD.trope_pk AND count <= 0 AND trope_pk IN (
+        SELECT e.trope_pk FROM examples e WHERE e.work_pk = OLD.work_pk
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_examples_cooccurrence_update
+AFTER UPDATE OF trope_pk, work_pk ON examples
+WHEN OLD.trope_pk IS NOT NEW.trope_pk OR OLD.work_pk IS NOT NEW.work_pk
+BEGIN
+    UPDATE trope_cooccurrence SET count = count - 1
+    WHERE trope_pk = OLD.trope_pk AND other_trope_pk IN (
+        SELECT e.trope_pk FROM examples e
+        WHERE e.work_pk = OLD.work_pk AND e.trope_pk != OLD.trope_pk AND e.id != NEW.id
+    );
+
+    UPDATE trope_cooccurrence SET count = count - 1
+    WHERE other_trope_pk = OLD.trope_pk AND trope_pk IN (
+        SELECT e.trope_pk FROM examples e
+        WHERE e.work_pk = OLD.work_pk AND e.trope_pk != OLD.trope_pk AND e.id != NEW.id
+    );
+
+    DELETE FROM trope_cooccurrence WHERE trope_pk = OLD.trope_pk AND count <= 0;
+
+    DELETE FROM trope_cooccurrence
+    WHERE other_trope_pk = OLD.trope_pk AND count <= 0 AND trope_pk IN (
+        SELECT e.trope_pk FROM examples e WHERE e.work_pk = OLD.work_pk
+    );
+
+    INSERT INTO trope_cooccurrence (trope_pk, other_trope_pk, count)
+    SELECT NEW.trope_pk, e.trope_pk, 1
+    FROM examples e
+    WHERE e.work_pk = NEW.work_pk AND e.trope_pk != NEW.trope_pk AND e.id != NEW.id
+    ON CONFLICT (trope_pk, other_trope_pk) DO UPDATE SET count = count + 1;
+
+    INSERT INTO trope_cooccurrence (trope_pk, other_trope_pk, count)
+    SELECT e.trope_pk, NEW.trope_pk, 1
+    FROM examples e
+    WHERE e.work_pk = NEW.work_pk AND e.trope_pk != NEW.trope_pk AND e.id != NEW.id
+    ON CONFLICT (trope_pk, other_trope_pk) DO UPDATE SET count = count + 1;
+END;
+"""
+
+
+def ensure_schema(conn):
+    """Create the adjacency table and triggers, backfilling on first creation"""
+    # Pairs keyed by the public id predate schema version 3; rebuild them
+    if 'trope_id' in schema.columns(conn, 'trope_cooccurrence'):
+        conn.execute('DROP TABLE trope_cooccurrence')
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trope_cooccurrence'"
+    ).fetchone()
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS trope_cooccurrence (
+        trope_pk INTEGER NOT NULL,
+        other_trope_pk INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (trope_pk, other_trope_pk)
+    ) WITHOUT ROWID;
+    """ + _TRIGGERS)
+
+    if not exists:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute the whole matrix from the examples table"""
+    conn.execute('DELETE FROM trope_cooccurrence')
+    conn.execute("""
+        INSERT INTO trope_cooccurrence (trope_pk, other_trope_pk, count)
+        SELECT a.trope_pk, b.trope_pk, COUNT(DISTINCT a.work_pk)
+        FROM examples a
+        JOIN examples b ON a.work_pk = b.work_pk AND a.trope_pk != b.trope_pk
+        GROUP BY a.trope_pk, b.trope_pk
+    """)
+
+
+def _tropes(conn, trope_pks):
+    """{pk: (id, name)} for the given tropes"""
+    tropes = {}
+    trope_pks = list(trope_pks)
+    for start in range(0, len(trope_pks), 500):
+        chunk = trope_pks[start:start + 500]
+        placeholders = ','.join('?' for _ in chunk)
+        tropes.update(
+            (row[0], (row[1], row[2])) for row in conn.execute(
+                f'SELECT pk, id, name FROM tropes WHERE pk IN ({placeholders})', chunk
+            ).fetchall()
+        )
+    return tropes
+
+
+def top_cooccurring(conn, trope_id, limit=10):
+    """Tropes that most often share a work with the given trope"""
+    rows = conn.execute("""
+        SELECT t.id, co.count, t.name
+        FROM tropes source
+        JOIN trope_cooccurrence co ON co.trope_pk = source.pk
+        JOIN tropes t ON t.pk = co.other_trope_pk
+        WHERE source.id = ?
+        ORDER BY co.count DESC, t.name
+        LIMIT ?
+    """, (trope_id, limit)).fetchall()
+
+    return [
+        {'id': row[0], 'name': row[2], 'shared_works': row[1]}
+        for row in rows
+    ]
+
+
+def neighborhood(conn, trope_id, depth=2, max_nodes=50, fanout=DEFAULT_FANOUT):
+    """Breadth-first traversal of the co-occurrence graph.
+
+    Each visited trope contributes at most `fanout` of its strongest edges and
+    the walk stops at `depth` hops or `max_nodes` tropes, whichever comes first.
+    The walk runs on surrogate keys; nodes and edges are reported by public id.
+    """
+    depth = max(1, min(depth, MAX_DEPTH))
+    max_nodes = max(1, min(max_nodes, MAX_NODES))
+
+    row = conn.execute('SELECT pk FROM tropes WHERE id = ?', (trope_id,)).fetchone()
+    if not row:
+        return {
+            'nodes': [{'id': trope_id, 'name': None, 'depth': 0}],
+            'edges': [],
+            'depth': depth,
+            'truncated': False
+        }
+
+    depths = {row[0]: 0}
+    edges = []
+    seen_edges = set()
+    frontier = [row[0]]
+    truncated = False
+
+    for level in range(1, depth + 1):
+        next_frontier = []
+        for source in frontier:
+            rows = conn.execute("""
+                SELECT other_trope_pk, count
+                FROM trope_cooccurrence
+                WHERE trope_pk = ?
+                ORDER BY count DESC
+                LIMIT ?
+            """, (source, fanout)).fetchall()
+
+            for target, count in rows:
+                if target not in depths:
+                    if len(depths) >= max_nodes:
+                        truncated = True
+                        continue
+                    depths[target] = level
+                    next_frontier.append(target)
+                # Record each undirected edge once
+                pair = (min(source, target), max(source, target))
+                if pair not in seen_edges:
+                    seen_edges.add(pair)
+                    edges.append((source, target, count))
+
+        frontier = next_frontier
+        if not frontier:
+            break
+
+    tropes = _tropes(conn, depths)
+    nodes = [
+        {'id': tropes[node][0], 'name': tropes[node][1], 'depth': node_depth}
+        for node, node_depth in sorted(depths.items(), key=lambda item: item[1])
+    ]
+
+    return {
+        'nodes': nodes,
+        'edges': [
+            {'source': tropes[source][0], 'target': tropes[target][0], 'shared_works': count}
+            for source, target, count in edges
+        ],
+        'depth': depth,
+        'truncated': truncated
+    }
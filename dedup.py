@@ -0,0 +1,334 @@
+"""
+Near-duplicate trope detection using MinHash signatures and LSH banding.
+
+Each trope gets two MinHash signatures: one over character trigrams of its
+normalized name and one over word shingles of its description. Signatures are
+split into bands and every band is hashed into a bucket row, so finding
+candidates for a new trope is a handful of indexed bucket lookups instead of a
+comparison against the whole catalogue.
+"""
+import random
+import re
+import struct
+import zlib
+
+# 64 permutations split into 16 bands of 4 rows gives a candidate threshold of
+# roughly (1/16) ** (1/4) ~= 0.5 Jaccard similarity
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# Minimum estimated similarity for two tropes to be reported as duplicates
+DEFAULT_THRESHOLD = 0.6
+
+# Buckets larger than this are skipped by the batch report to keep it linear
+MAX_BUCKET_SIZE = 50
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = random.Random(20250830)
+_PERMUTATIONS = [
+    (_rng.randint(1, _PRIME - 1), _rng.randint(0, _PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+
+def ensure_schema(conn):
+    """Create the signature and bucket tables if they do not exist"""
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS trope_signatures (
+        trope_id TEXT NOT NULL,
+        field TEXT NOT NULL,
+        signature BLOB NOT NULL,
+        PRIMARY KEY (trope_id, field)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS trope_lsh_buckets (
+        field TEXT NOT NULL,
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        trope_id TEXT NOT NULL,
+        PRIMARY KEY (field, band, bucket, trope_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_trope_lsh_buckets_trope_id
+        ON trope_lsh_buckets (trope_id);
+    """)
+
+
+def normalize_text(text):
+    """Lowercase text and collapse punctuation and whitespace to single spaces"""
+    if not text:
+        return ""
+    return re.sub(r'[\W_]+', ' ', text.lower()).strip()
+
+
+def name_shingles(name):
+    """Character trigrams of the name with separators removed"""
+    compact = normalize_text(name).replace(' ', '')
+    if len(compact) < 3:
+        return {compact} if compact else set()
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+
+def description_shingles(description, size=3):
+    """Overlapping word shingles of the description"""
+    words = normalize_text(description).split()
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingles):
+    """Compute the MinHash signature of a set of shingles, or None if empty"""
+    if not shingles:
+        return None
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    return tuple(
+        min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def band_buckets(signature):
+    """Yield (band, bucket) pairs for a signature"""
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        yield band, zlib.crc32(struct.pack(f'<{ROWS_PER_BAND}I', *rows))
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimate Jaccard similarity as the fraction of matching signature slots"""
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def compute_signatures(name, description):
+    """Return a dict of field -> signature for a trope"""
+    return {
+        'name': minhash(name_shingles(name)),
+        'description': minhash(description_shingles(description)),
+    }
+
+
+def _pack(signature):
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def _unpack(blob):
+    return struct.unpack(_SIGNATURE_FORMAT, blob)
+
+
+def index_trope(conn, trope_id, name, description):
+    """Add or refresh a trope's signatures and bucket rows"""
+    remove_trope(conn, trope_id)
+    for field, signature in compute_signatures(name, description).items():
+        if signature is None:
+            continue
+        conn.execute(
+            'INSERT INTO trope_signatures (trope_id, field, signature) VALUES (?, ?, ?)',
+            (trope_id, field, _pack(signature))
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO trope_lsh_buckets (field, band, bucket, trope_id) '
+            'VALUES (?, ?, ?, ?)',
+            [(field, band, bucket, trope_id) for band, bucket in band_buckets(signature)]
+        )
+
+
+def remove_trope(conn, trope_id):
+    """Drop a trope from the index"""
+    conn.execute('DELETE FROM trope_signatures WHERE trope_id = ?', (trope_id,))
+    conn.execute('DELETE FROM trope_lsh_buckets WHERE trope_id = ?', (trope_id,))
+
+
+def rebuild_index(conn):
+    """Recompute every signature from the tropes table"""
+    conn.execute('DELETE FROM trope_signatures')
+    conn.execute('DELETE FROM trope_lsh_buckets')
+    rows = conn.execute(
+        'SELECT id, name, description FROM tropes WHERE id IS NOT NULL'
+    ).fetchall()
+    for row in rows:
+        index_trope(conn, row[0], row[1], row[2])
+
+
+def ensure_index(conn):
+    """Build the index on first use, or when it has drifted from the tropes table"""
+    indexed = conn.execute(
+        "SELECT COUNT(*) FROM trope_signatures WHERE field = 'name'"
+    ).fetchone()[0]
+    total = conn.execute('SELECT COUNT(*) FROM tropes WHERE id IS NOT NULL').fetchone()[0]
+    if indexed != total:
+        rebuild_index(conn)
+        return True
+    return False
+
+
+def _load_signatures(conn, trope_ids):
+    """Return {trope_id: {field: signature}} for the given tropes"""
+    result = {}
+    trope_ids = list(trope_ids)
+    for start in range(0, len(trope_ids), 500):
+        chunk = trope_ids[start:start + 500]
+        placeholders = ','.join('?' for _ in chunk)
+        rows = conn.execute(
+            f'SELECT trope_id, field, signature FROM trope_signatures '
+            f'WHERE trope_id IN ({placeholders})',
+            chunk
+        ).fetchall()
+        for trope_id, field, blob in rows:
+            result.setdefault(trope_id, {})[field] = _unpack(blob)
+    return result
+
+
+def _score(sigs_a, sigs_b):
+    name_similarity = estimate_similarity(sigs_a.get('name'), sigs_b.get('name'))
+    description_similarity = estimate_similarity(
+        sigs_a.get('description'), sigs_b.get('description')
+    )
+    return name_similarity, description_similarity
+
+
+def find_similar(conn, name, description, exclude_id=None,
+                 threshold=DEFAULT_THRESHOLD, limit=10):
+    """Find tropes that are likely near-duplicates of the given name/description"""
+    signatures = compute_signatures(name, description)
+
+    candidates = set()
+    for field, signature in signatures.items():
+        if signature is None:
+            continue
+        pairs = list(band_buckets(signature))
+        placeholders = ','.join('(?, ?)' for _ in pairs)
+        params = [field] + [value for pair in pairs for value in pair]
+        rows = conn.execute(
+            f'SELECT DISTINCT trope_id FROM trope_lsh_buckets '
+            f'WHERE field = ? AND (band, bucket) IN (VALUES {placeholders})',
+            params
+        ).fetchall()
+        candidates.update(row[0] for row in rows)
+
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+
+    candidate_signatures = _load_signatures(conn, candidates)
+    scored = []
+    for trope_id, sigs in candidate_signatures.items():
+        name_similarity, description_similarity = _score(signatures, sigs)
+        similarity = max(name_similarity, description_similarity)
+        if similarity >= threshold:
+            scored.append((trope_id, similarity, name_similarity, description_similarity))
+
+    if not scored:
+        return []
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    scored = scored[:limit]
+
+    placeholders = ','.join('?' for _ in scored)
+    names = {
+        row[0]: row[1] for row in conn.execute(
+            f'SELECT id, name FROM tropes WHERE id IN ({placeholders})',
+            [item[0] for item in scored]
+        ).fetchall()
+    }
+
+    return [
+        {
+            'id': trope_id,
+            'name': names.get(trope_id),
+            'similarity': round(similarity, 3),
+            'name_similarity': round(name_similarity, 3),
+            'description_similarity': round(description_similarity, 3)
+        }
+        for trope_id, similarity, name_similarity, description_similarity in scored
+        if trope_id in names
+    ]
+
+
+def find_duplicate_clusters(conn, threshold=DEFAULT_THRESHOLD):
+    """Cluster the whole catalogue into groups of likely duplicates.
+
+    Only tropes sharing at least one LSH bucket are compared, so the work is
+    proportional to the number of colliding pairs rather than n^2.
+    """
+    buckets = conn.execute("""
+        SELECT GROUP_CONCAT(trope_id) AS members
+        FROM trope_lsh_buckets
+        GROUP BY field, band, bucket
+        HAVING COUNT(*) > 1
+    """).fetchall()
+
+    candidate_pairs = set()
+    skipped_buckets = 0
+    for row in buckets:
+        members = sorted(row[0].split(','))
+        if len(members) > MAX_BUCKET_SIZE:
+            skipped_buckets += 1
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                candidate_pairs.add((first, second))
+
+    involved = {trope_id for pair in candidate_pairs for trope_id in pair}
+    signatures = _load_signatures(conn, involved)
+
+    parent = {}
+
+    def find(trope_id):
+        parent.setdefault(trope_id, trope_id)
+        while parent[trope_id] != trope_id:
+            parent[trope_id] = parent[parent[trope_id]]
+            trope_id = parent[trope_id]
+        return trope_id
+
+    pair_scores = {}
+    for first, second in candidate_pairs:
+        similarity = max(_score(signatures.get(first, {}), signatures.get(second, {})))
+        if similarity >= threshold:
+            pair_scores[(first, second)] = similarity
+            parent[find(first)] = find(second)
+
+    groups = {}
+    for trope_id in list(parent):
+        groups.setdefault(find(trope_id), set()).add(trope_id)
+
+    clustered_ids = [trope_id for members in groups.values() for trope_id in members]
+    names = {}
+    for start in range(0, len(clustered_ids), 500):
+        chunk = clustered_ids[start:start + 500]
+        placeholders = ','.join('?' for _ in chunk)
+        names.update(
+            (row[0], row[1]) for row in conn.execute(
+                f'SELECT id, name FROM tropes WHERE id IN ({placeholders})', chunk
+            ).fetchall()
+        )
+
+    best_scores = {}
+    for (first, _), score in pair_scores.items():
+        root = find(first)
+        best_scores[root] = max(score, best_scores.get(root, 0))
+
+    clusters = []
+    for root, members in groups.items():
+        clusters.append({
+            'tropes': sorted(
+                ({'id': trope_id, 'name': names.get(trope_id)} for trope_id in members),
+                key=lambda trope: (trope['name'] or '').lower()
+            ),
+            'max_similarity': round(best_scores[root], 3)
+        })
+
+    clusters.sort(key=lambda cluster: (-len(cluster['tropes']), -cluster['max_similarity']))
+
+    return {
+        'clusters': clusters,
+        'candidate_pairs': len(candidate_pairs),
+        'skipped_buckets': skipped_buckets
+    }
@@ -190,6 +190,34 @@ def view_changelog():
     else:
         print("❌ CHANGELOG.md not found")
 
+def rebuild_analytics(check_only=False):
+    """Verify the maintained analytics aggregates and rebuild them from scratch."""
+    sys.path.insert(0, str(PROJECT_ROOT))
+    import analytics
+    from app import get_db_connection
+    
+    if not DB_PATH.exists():
+        print(f"❌ Database: Not found at {DB_PATH}")
+        return False
+    
+    conn = get_db_connection()
+    mismatches = analytics.verify(conn)
+    
+    if mismatches:
+        print(f"⚠️  {len(mismatches)} analytics counters have drifted:")
+        for metric, bucket, maintained, expected in mismatches:
+            print(f"   {metric}[{bucket}]: maintained={maintained} expected={expected}")
+    else:
+        print("✅ Analytics counters match a full recomputation")
+    
+    if not check_only:
+        analytics.rebuild(conn)
+        conn.commit()
+        print("✅ Analytics counters rebuilt")
+    
+    conn.close()
+    return not mismatches or not check_only
+
 def main():
     """Main development script entry point."""
     parser = argparse.ArgumentParser(description="Tropes Manager Development Helper")
@@ -217,6 +245,10 @@ def main():
     # View changelog
     subparsers.add_parser('changelog', help='View project changelog')
     
+    # Analytics aggregates
+    analytics_parser = subparsers.add_parser('rebuild-analytics', help='Verify and rebuild analytics aggregates')
+    analytics_parser.add_argument('--check', action='store_true', help='Only report drift, do not rebuild')
+    
     args = parser.parse_args()
     
     if args.command == 'setup-db':
@@ -233,6 +265,9 @@ def main():
         show_status()
     elif args.command == 'changelog':
         view_changelog()
+    elif args.command == 'rebuild-analytics':
+        if not rebuild_analytics(check_only=args.check):
+            sys.exit(1)
     else:
         parser.print_help()
 
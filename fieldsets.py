@@ -0,0 +1,285 @@
+"""
+Sparse fieldsets (`fields=`) and relationship expansion (`expand=`) for the
+read endpoints: lists, multi-get, single-resource detail and the
+`/api/tropes/<id>/works` and `/api/works/<id>/tropes` sub-collections.
+
+Each resource maps its public field names to SQL expressions and to the joins
+those expressions need. A request's field list becomes the SELECT list, so
+joins and aggregates that no requested field uses are left out of the query
+altogether. Expansions are loaded afterwards with one batched IN query per
+relationship over the ids on the page, never one query per row. Requests and
+responses use the public UUIDs; the queries join on the integer `pk` keys.
+"""
+
+# Largest IN list per query, well under SQLite's default variable limit
+CHUNK_SIZE = 500
+
+# field -> (SQL expression, join it needs or None)
+TROPE_FIELDS = {
+    'id': ('t.id', None),
+    'name': ('t.name', None),
+    'description': ('t.description', None),
+    'categories': ('GROUP_CONCAT(c.name)', 'categories'),
+    'example_count': ('COALESCE(example_stats.example_count, 0)', 'example_stats'),
+    'work_count': ('COALESCE(example_stats.work_count, 0)', 'example_stats'),
+}
+
+TROPE_JOINS = {
+    'categories': """
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk""",
+    'example_stats': """
+        LEFT JOIN (
+            SELECT
+                e.trope_pk,
+                COUNT(*) as example_count,
+                COUNT(DISTINCT e.work_pk) as work_count
+            FROM examples e
+            GROUP BY e.trope_pk
+        ) example_stats ON example_stats.trope_pk = t.pk""",
+}
+
+# Work type name from the lookup table, for a query over `works` or `works w`
+WORK_TYPE = '(SELECT wt.name FROM work_types wt WHERE wt.id = type_id)'
+
+WORK_FIELDS = {
+    name: (WORK_TYPE if name == 'type' else name, None)
+    for name in ('id', 'title', 'type', 'year', 'author', 'description', 'created_at', 'updated_at')
+}
+
+EXAMPLE_FIELDS = {
+    'id': ('e.id', None),
+    'trope_id': ('t.id', 'trope'),
+    'work_id': ('w.id', 'work'),
+    'description': ('e.description', None),
+    'page_reference': ('e.page_reference', None),
+    'created_at': ('e.created_at', None),
+    'updated_at': ('e.updated_at', None),
+    'trope_name': ('t.name', 'trope'),
+    'trope_description': ('t.description', 'trope'),
+    'work_title': ('w.title', 'work'),
+    'work_type': (WORK_TYPE, 'work'),
+    'work_year': ('w.year', 'work'),
+    'work_author': ('w.author', 'work'),
+}
+
+EXAMPLE_JOINS = {
+    'trope': "JOIN tropes t ON t.pk = e.trope_pk",
+    'work': "JOIN works w ON w.pk = e.work_pk",
+}
+
+TROPE_EXPANSIONS = ('categories', 'examples', 'works')
+WORK_EXPANSIONS = ('tropes', 'examples')
+EXAMPLE_EXPANSIONS = ('trope', 'work')
+
+# resource -> (field catalogue, allowed expansions)
+RESOURCES = {
+    'tropes': (TROPE_FIELDS, TROPE_EXPANSIONS),
+    'works': (WORK_FIELDS, WORK_EXPANSIONS),
+    'examples': (EXAMPLE_FIELDS, EXAMPLE_EXPANSIONS),
+}
+
+
+class FieldsetError(ValueError):
+    """Raised for unknown field or expansion names"""
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_fields(value, available):
+    """Requested field names in catalogue order; all fields when omitted.
+
+    `id` is always included so rows can be paginated and expanded.
+    """
+    if not value:
+        return list(available)
+    requested = set(_split(value))
+    unknown = requested - set(available)
+    if unknown:
+        raise FieldsetError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(available)}"
+        )
+    requested.add('id')
+    return [name for name in available if name in requested]
+
+
+def parse_expand(value, allowed):
+    """Requested expansions, validated against the resource's relationships"""
+    if not value:
+        return []
+    requested = _split(value)
+    unknown = set(requested) - set(allowed)
+    if unknown:
+        raise FieldsetError(
+            f"Cannot expand: {', '.join(sorted(unknown))}. Available: {', '.join(allowed)}"
+        )
+    return list(dict.fromkeys(requested))
+
+
+def parse(resource, fields_value, expand_value):
+    """(fields, expand) for one of RESOURCES"""
+    catalogue, expansions = RESOURCES[resource]
+    return parse_fields(fields_value, catalogue), parse_expand(expand_value, expansions)
+
+
+def select_list(fields, catalogue):
+    """SELECT list for the requested fields"""
+    return ',\n            '.join(f'{catalogue[name][0]} as {name}' for name in fields)
+
+
+def required_joins(fields, catalogue):
+    """Join names needed by the requested fields"""
+    return {catalogue[name][1] for name in fields if catalogue[name][1]}
+
+
+def example_projection(fields, expand):
+    """(fields, hidden) for examples, adding the foreign keys expansions need.
+
+    `hidden` lists the columns that were added only for expansion and should
+    be removed from the response afterwards.
+    """
+    hidden = [column for relation, column in (('trope', 'trope_id'), ('work', 'work_id'))
+              if relation in expand and column not in fields]
+    fields = [name for name in EXAMPLE_FIELDS if name in fields or name in hidden]
+    return fields, hidden
+
+
+def _chunks(ids):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _grouped(conn, query, ids, key):
+    """Run `query` (with an IN placeholder list) per chunk and group rows by `key`"""
+    grouped = {}
+    for chunk in _chunks(ids):
+        placeholders = ','.join('?' for _ in chunk)
+        for row in conn.execute(query.format(placeholders=placeholders), chunk):
+            item = {name: row[name] for name in row.keys()}
+            grouped.setdefault(item.pop(key), []).append(item)
+    return grouped
+
+
+def categories_for_tropes(conn, trope_ids, format_name=None):
+    """{trope_id: [{'id', 'name'}]}"""
+    grouped = _grouped(conn, """
+        SELECT t.id AS _key, c.id, c.name
+        FROM tropes t
+        JOIN trope_categories tc ON tc.trope_pk = t.pk
+        JOIN categories c ON c.pk = tc.category_pk
+        WHERE t.id IN ({placeholders})
+        ORDER BY c.name
+    """, trope_ids, '_key')
+    if format_name:
+        for categories in grouped.values():
+            for category in categories:
+                category['name'] = format_name(category['name'])
+    return grouped
+
+
+def examples_for(conn, owner_column, owner_ids):
+    """{owner_id: [example]} for owner_column 'trope_id' or 'work_id'"""
+    owner = {'trope_id': 't', 'work_id': 'w'}[owner_column]
+    return _grouped(conn, f"""
+        SELECT {owner}.id AS _key, e.id, t.id AS trope_id, w.id AS work_id,
+               e.description, e.page_reference, e.created_at
+        FROM examples e
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+        WHERE {owner}.id IN ({{placeholders}})
+        ORDER BY e.created_at
+    """, owner_ids, '_key')
+
+
+def works_for_tropes(conn, trope_ids):
+    """{trope_id: [work]} for works with an example of each trope"""
+    return _grouped(conn, """
+        SELECT t.id AS _key, w.id, w.title, wt.name AS type, w.year, w.author
+        FROM tropes t
+        JOIN examples e ON e.trope_pk = t.pk
+        JOIN works w ON w.pk = e.work_pk
+        JOIN work_types wt ON wt.id = w.type_id
+        WHERE t.id IN ({placeholders})
+        ORDER BY w.title
+    """, trope_ids, '_key')
+
+
+def tropes_for_works(conn, work_ids):
+    """{work_id: [trope]} for tropes with an example in each work"""
+    return _grouped(conn, """
+        SELECT w.id AS _key, t.id, t.name
+        FROM works w
+        JOIN examples e ON e.work_pk = w.pk
+        JOIN tropes t ON t.pk = e.trope_pk
+        WHERE w.id IN ({placeholders})
+        ORDER BY t.name
+    """, work_ids, '_key')
+
+
+def tropes_by_id(conn, trope_ids):
+    """{trope_id: trope}"""
+    grouped = _grouped(conn, """
+        SELECT id AS _key, id, name, description
+        FROM tropes WHERE id IN ({placeholders})
+    """, trope_ids, '_key')
+    return {key: rows[0] for key, rows in grouped.items()}
+
+
+def works_by_id(conn, work_ids):
+    """{work_id: work}"""
+    grouped = _grouped(conn, """
+        SELECT w.id AS _key, w.id, w.title, wt.name AS type, w.year, w.author
+        FROM works w
+        JOIN work_types wt ON wt.id = w.type_id
+        WHERE w.id IN ({placeholders})
+    """, work_ids, '_key')
+    return {key: rows[0] for key, rows in grouped.items()}
+
+
+def expand_tropes(conn, tropes, expand, format_name=None):
+    """Inline categories, examples and/or works into trope dicts"""
+    ids = [trope['id'] for trope in tropes]
+    if 'categories' in expand:
+        categories = categories_for_tropes(conn, ids, format_name)
+        for trope in tropes:
+            trope['categories'] = categories.get(trope['id'], [])
+    if 'examples' in expand:
+        examples = examples_for(conn, 'trope_id', ids)
+        for trope in tropes:
+            trope['examples'] = examples.get(trope['id'], [])
+    if 'works' in expand:
+        works = works_for_tropes(conn, ids)
+        for trope in tropes:
+            trope['works'] = works.get(trope['id'], [])
+
+
+def expand_works(conn, works, expand):
+    """Inline tropes and/or examples into work dicts"""
+    ids = [work['id'] for work in works]
+    if 'tropes' in expand:
+        tropes = tropes_for_works(conn, ids)
+        for work in works:
+            work['tropes'] = tropes.get(work['id'], [])
+    if 'examples' in expand:
+        examples = examples_for(conn, 'work_id', ids)
+        for work in works:
+            work['examples'] = examples.get(work['id'], [])
+
+
+def expand_examples(conn, examples, expand):
+    """Inline the trope and/or work objects into example dicts.
+
+    Needs `trope_id`/`work_id` on each example; callers add them to the
+    projection when an expansion is requested.
+    """
+    if 'trope' in expand:
+        tropes = tropes_by_id(conn, [example['trope_id'] for example in examples])
+        for example in examples:
+            example['trope'] = tropes.get(example['trope_id'])
+    if 'work' in expand:
+        works = works_by_id(conn, [example['work_id'] for example in examples])
+        for example in examples:
+            example['work'] = works.get(example['work_id'])
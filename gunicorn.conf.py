@@ -0,0 +1,11 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts from this directory.
+
+Background threads cannot survive a fork, so each worker starts its own job
+runner once it has loaded the app.
+"""
+
+
+def post_worker_init(worker):
+    import app
+    app.start_background_work()
@@ -0,0 +1,443 @@
+"""
+Background job runner for exports, index rebuilds and other heavy work.
+
+Jobs are persisted in the `jobs` table and executed by a small thread pool
+inside each server process, so a long export no longer ties up the request
+thread. Any process may pick up queued jobs: claiming is a single UPDATE, and
+per-type concurrency limits are enforced in that same statement by counting
+running jobs of the type across all workers.
+
+Running jobs refresh `heartbeat_at` while they work. A job whose heartbeat goes
+stale (its worker was killed or restarted) is put back in the queue by the next
+process that ticks, up to MAX_ATTEMPTS times.
+
+Scheduled job types are queued by the tick once their interval has passed since
+the last job of the type was created, and never while one is queued or running.
+The check and the insert are one statement inside the tick's write transaction,
+so several workers ticking at once still queue a single job.
+
+A runner is bound to one database file when it starts, and its threads only
+ever connect to that file. Servers start it once per process at startup
+(app.start_background_work); stop() ends the tick and waits for its thread.
+Before a start, lookups and submissions use the connect callable's default
+database and queued jobs wait for a started runner to claim them.
+
+The runner writes on its own connections rather than through the request
+writer (writer.py): handlers run far longer than a writer operation should,
+and heartbeats must not queue behind request writes.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+# Pool size per process and how often the background tick runs
+MAX_WORKERS = 2
+TICK_SECONDS = 5
+
+# A running job whose heartbeat is older than this is considered orphaned
+STALE_AFTER = timedelta(seconds=60)
+MAX_ATTEMPTS = 3
+
+# Progress writes are throttled to at most one per interval
+PROGRESS_INTERVAL = timedelta(seconds=0.5)
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_schema(conn):
+    """Create the jobs table if it does not exist"""
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        status TEXT NOT NULL CHECK(status IN ('queued', 'running', 'succeeded', 'failed')),
+        params TEXT NOT NULL DEFAULT '{}',
+        progress_done INTEGER NOT NULL DEFAULT 0,
+        progress_total INTEGER,
+        message TEXT,
+        result TEXT,
+        artifact_path TEXT,
+        artifact_name TEXT,
+        artifact_mimetype TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        heartbeat_at TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_jobs_status_type ON jobs (status, type, created_at);
+    CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+    """)
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+class JobError(Exception):
+    """Raised for invalid job submissions"""
+
+
+class JobContext:
+    """Handed to job handlers: parameters, a connection and progress reporting"""
+
+    def __init__(self, runner, job_id, params, conn):
+        self.runner = runner
+        self.database = runner.database
+        self.id = job_id
+        self.params = params
+        self.conn = conn
+        self.artifact = None
+        self._last_progress = None
+
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress; writes are throttled unless force is set"""
+        now = datetime.now()
+        if not force and self._last_progress and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.runner._update(self.id, progress_done=done, progress_total=total,
+                            message=message, heartbeat_at=now.isoformat())
+
+    def artifact_path(self, filename, mimetype='application/octet-stream'):
+        """Reserve a file path for the job's downloadable result"""
+        directory = self.runner.artifact_dir(self.database)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.id}-{filename}')
+        self.artifact = (path, filename, mimetype)
+        return path
+
+
+class JobRunner:
+    """Thread-pool job executor backed by the jobs table"""
+
+    def __init__(self, connect, artifact_dir, max_workers=MAX_WORKERS):
+        # connect(database) opens a connection, database None meaning the
+        # default; artifact_dir(database) is where job results are written
+        self.connect = connect
+        self.artifact_dir = artifact_dir
+        self.database = None
+        self.max_workers = max_workers
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.handlers = {}
+        self.limits = {}
+        self.schedules = {}
+        self._started_at = datetime.now()
+        self._executor = None
+        self._lock = threading.Lock()
+        # Held from a claim's commit until its id is in _running, so a tick
+        # never mistakes a job being started for one left by an earlier process
+        self._claim_lock = threading.Lock()
+        self._running = set()
+        self._ticker = None
+        self._stop = threading.Event()
+
+    def register(self, job_type, handler, concurrency=1):
+        """Register a handler(context) -> result dict for a job type"""
+        self.handlers[job_type] = handler
+        self.limits[job_type] = concurrency
+
+    def schedule(self, job_type, every, params=None):
+        """Queue a registered job type every `every` (a timedelta), starting one interval after start"""
+        self.schedules[job_type] = (every, params or {})
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, database):
+        """Start the pool and the background tick on database, recovering orphaned jobs"""
+        with self._lock:
+            if self._executor is not None and self.owner.endswith(f':{os.getpid()}'):
+                if database != self.database:
+                    raise RuntimeError(f'Job runner is already running on {self.database}')
+                return
+            # A forked worker must not reuse its parent's threads
+            self.database = database
+            self.owner = f'{socket.gethostname()}:{os.getpid()}'
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='job'
+            )
+            self._running = set()
+            self._started_at = datetime.now()
+            # Each start gets its own event, so a stopping ticker never sees a later start's
+            self._stop = threading.Event()
+            self._ticker = threading.Thread(target=self._tick_loop, args=(self._stop,),
+                                            name='job-ticker', daemon=True)
+            self._ticker.start()
+
+    def stop(self, wait=True):
+        """Stop the tick and pool; queued jobs stay queued for the next start"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            ticker, self._ticker = self._ticker, None
+        self._stop.set()
+        if executor:
+            executor.shutdown(wait=wait)
+        if wait and ticker is not None and ticker is not threading.current_thread():
+            ticker.join()
+
+    def _tick_loop(self, stop):
+        # The first tick runs straight away so orphaned jobs recover on startup
+        while not stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Job runner tick failed')
+            if stop.wait(TICK_SECONDS):
+                break
+
+    def tick(self):
+        """Heartbeat our jobs, requeue orphaned ones and claim queued work"""
+        with self._claim_lock:
+            conn = self.connect(self.database)
+            try:
+                now = datetime.now()
+                with self._lock:
+                    running = list(self._running)
+                if running:
+                    placeholders = ','.join('?' for _ in running)
+                    conn.execute(
+                        f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({placeholders})",
+                        [now.isoformat()] + running
+                    )
+
+                stale_before = (now - STALE_AFTER).isoformat()
+                conn.execute("""
+                    UPDATE jobs
+                    SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                        error = CASE WHEN attempts >= ? THEN 'Worker stopped while running job'
+                                     ELSE error END,
+                        finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END,
+                        owner = NULL
+                    WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+                """, (MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, now.isoformat(), stale_before))
+
+                # Jobs this exact process claimed before a restart reused its pid
+                if running:
+                    conn.execute(
+                        f"UPDATE jobs SET status = 'queued', owner = NULL "
+                        f"WHERE status = 'running' AND owner = ? AND id NOT IN ({placeholders})",
+                        [self.owner] + running
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', owner = NULL "
+                        "WHERE status = 'running' AND owner = ?",
+                        (self.owner,)
+                    )
+                self._queue_scheduled(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+        self._dispatch()
+
+    def _queue_scheduled(self, conn, now):
+        """Queue each scheduled type whose interval has passed since its last job"""
+        for job_type, (every, params) in self.schedules.items():
+            if now - self._started_at < every:
+                continue
+            conn.execute("""
+                INSERT INTO jobs (id, type, status, params, created_at)
+                SELECT ?, ?, 'queued', ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM jobs
+                    WHERE type = ? AND (status IN ('queued', 'running') OR created_at > ?)
+                )
+            """, (str(uuid.uuid4()), job_type, json.dumps(params), now.isoformat(),
+                  job_type, (now - every).isoformat()))
+
+    # ------------------------------------------------------------------
+    # Submission and lookup
+    # ------------------------------------------------------------------
+
+    def submit(self, job_type, params=None):
+        """Queue a job and try to start it immediately"""
+        if job_type not in self.handlers:
+            raise JobError(f"Unknown job type '{job_type}'. Available: {', '.join(sorted(self.handlers))}")
+        if params is not None and not isinstance(params, dict):
+            raise JobError("params must be an object")
+
+        job_id = str(uuid.uuid4())
+        conn = self.connect(self.database)
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, type, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, job_type, json.dumps(params or {}), _now())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._dispatch()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Job as a dict, or None"""
+        conn = self.connect(self.database)
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._serialize(row) if row else None
+
+    def last(self, job_type):
+        """Most recently created job of a type, or None"""
+        conn = self.connect(self.database)
+        try:
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE type = ? ORDER BY created_at DESC LIMIT 1', (job_type,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._serialize(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """Most recent jobs first"""
+        conn = self.connect(self.database)
+        try:
+            if status:
+                rows = conn.execute(
+                    'SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?',
+                    (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)
+                ).fetchall()
+        finally:
+            conn.close()
+        return [self._serialize(row) for row in rows]
+
+    def artifact(self, job_id):
+        """(path, filename, mimetype) of a finished job's artifact, or None"""
+        conn = self.connect(self.database)
+        try:
+            row = conn.execute(
+                "SELECT artifact_path, artifact_name, artifact_mimetype FROM jobs "
+                "WHERE id = ? AND status = 'succeeded'",
+                (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row or not row[0] or not os.path.exists(row[0]):
+            return None
+        return row[0], row[1], row[2]
+
+    @staticmethod
+    def _serialize(row):
+        job = {key: row[key] for key in row.keys()}
+        job['params'] = json.loads(job['params'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        total = job.pop('progress_total')
+        done = job.pop('progress_done')
+        job['progress'] = {
+            'done': done,
+            'total': total,
+            'percent': round(100.0 * done / total, 1) if total else None
+        }
+        job['has_artifact'] = bool(job.pop('artifact_path'))
+        job.pop('artifact_mimetype')
+        return job
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _claim(self, conn, job_type):
+        """Atomically move the oldest queued job of a type to running"""
+        rows = conn.execute("""
+            UPDATE jobs
+            SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ?,
+                attempts = attempts + 1, error = NULL
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status = 'queued' AND type = ?
+                ORDER BY created_at
+                LIMIT 1
+            )
+            AND (SELECT COUNT(*) FROM jobs WHERE status = 'running' AND type = ?) < ?
+            RETURNING id, params
+        """, (self.owner, _now(), _now(), job_type, job_type, self.limits[job_type])).fetchall()
+        return rows[0] if rows else None
+
+    def _dispatch(self):
+        """Start as many queued jobs as limits and free pool threads allow"""
+        with self._lock:
+            if self._executor is None:
+                return
+            free = self.max_workers - len(self._running)
+        if free <= 0:
+            return
+
+        with self._claim_lock:
+            conn = self.connect(self.database)
+            try:
+                claimed = []
+                for job_type in self.handlers:
+                    while len(claimed) < free:
+                        row = self._claim(conn, job_type)
+                        if not row:
+                            break
+                        claimed.append((row[0], job_type, json.loads(row[1] or '{}')))
+                conn.commit()
+            finally:
+                conn.close()
+            with self._lock:
+                self._running.update(job_id for job_id, _, _ in claimed)
+
+        for job_id, job_type, params in claimed:
+            with self._lock:
+                executor = self._executor
+            if executor is None:
+                self._update(job_id, status='queued', owner=None)
+                with self._lock:
+                    self._running.discard(job_id)
+                continue
+            executor.submit(self._run, job_id, job_type, params)
+
+    def _run(self, job_id, job_type, params):
+        conn = self.connect(self.database)
+        context = JobContext(self, job_id, params, conn)
+        try:
+            result = self.handlers[job_type](context) or {}
+            conn.commit()
+            fields = {
+                'status': 'succeeded',
+                'result': json.dumps(result),
+                'finished_at': _now(),
+                'message': None
+            }
+            if context.artifact:
+                fields['artifact_path'], fields['artifact_name'], fields['artifact_mimetype'] = context.artifact
+            self._update(job_id, **fields)
+        except Exception as e:
+            conn.rollback()
+            self._update(job_id, status='failed', error=str(e), finished_at=_now())
+        finally:
+            conn.close()
+            with self._lock:
+                self._running.discard(job_id)
+            self._dispatch()
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        conn = self.connect(self.database)
+        try:
+            conn.execute(
+                f'UPDATE jobs SET {assignments} WHERE id = ?',
+                list(fields.values()) + [job_id]
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,214 @@
+"""
+Routine database maintenance within time budgets.
+
+Connections run `PRAGMA optimize` when they close, which refreshes planner
+statistics for tables whose size has changed a lot. The rest runs as
+scheduled background jobs (see TASKS):
+
+* checkpoint          - PASSIVE WAL checkpoint, never waits on readers
+* analyze             - ANALYZE with a row sampling limit
+* incremental_vacuum  - returns free pages to the filesystem a few at a time,
+                        switching the database to auto_vacuum=INCREMENTAL first
+* quick_check         - PRAGMA quick_check
+
+Every task runs under a deadline and a short busy timeout, so it gives up
+(and reports `interrupted`) rather than holding the write lock or a worker
+thread while live requests wait. The deadline interrupts the connection from
+a timer, which also stops single-step work such as quick_check and VACUUM.
+Interrupted work is simply picked up by the next run.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+# Statement steps between deadline checks in PRAGMA optimize
+PROGRESS_STEPS = 1000
+
+# Milliseconds a maintenance write waits for the write lock before giving up
+BUSY_MS = 50
+
+# Rows ANALYZE samples per index; keeps it proportional to schema, not data
+ANALYSIS_LIMIT = 1000
+
+# Free pages released per incremental vacuum transaction, and the pause between
+VACUUM_STEP_PAGES = 64
+VACUUM_STEP_PAUSE = 0.01
+
+# Largest database switched to auto_vacuum=INCREMENTAL online (needs a VACUUM)
+ONLINE_VACUUM_MAX_BYTES = 32 * 1024 * 1024
+
+# Name -> (seconds between runs, time budget in seconds)
+TASKS = {
+    'checkpoint': (300, 1.0),
+    'analyze': (6 * 3600, 2.0),
+    'incremental_vacuum': (3600, 1.0),
+    'quick_check': (24 * 3600, 5.0),
+}
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class OptimizingConnection(sqlite3.Connection):
+    """Connection that runs PRAGMA optimize on close, within a small budget"""
+
+    def close(self):
+        try:
+            if not self.in_transaction:
+                optimize(self)
+        except sqlite3.Error:
+            pass
+        super().close()
+
+
+class _Budget:
+    """Interrupts the connection's statements once `seconds` have passed"""
+
+    def __init__(self, conn, seconds):
+        self.conn = conn
+        self.deadline = time.monotonic() + seconds
+        self.timer = threading.Timer(max(seconds, 0), conn.interrupt)
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def check(self):
+        """Raise before starting a statement the timer might already have missed"""
+        if self.expired:
+            raise sqlite3.OperationalError('interrupted')
+
+    def __enter__(self):
+        self.busy_ms = self.conn.execute('PRAGMA busy_timeout').fetchone()[0]
+        self.conn.execute(f'PRAGMA busy_timeout={BUSY_MS}')
+        self.timer.start()
+        return self
+
+    def __exit__(self, *exc):
+        # Make sure the interrupt cannot land on a later statement
+        self.timer.cancel()
+        self.timer.join()
+        self.conn.execute(f'PRAGMA busy_timeout={self.busy_ms}')
+        return False
+
+
+def _stopped(error):
+    """True for errors that mean the budget or the lock wait ran out"""
+    message = str(error)
+    return 'interrupted' in message or 'locked' in message or 'busy' in message
+
+
+def optimize(conn, seconds=0.05):
+    """PRAGMA optimize before closing, abandoned if it would wait or run long"""
+    deadline = time.monotonic() + seconds
+    conn.execute('PRAGMA busy_timeout=0')
+    conn.set_progress_handler(lambda: time.monotonic() >= deadline, PROGRESS_STEPS)
+    conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+    conn.execute('PRAGMA optimize')
+
+
+def checkpoint(conn, seconds):
+    """Copy WAL frames back into the database without blocking anyone"""
+    conn.commit()
+    busy, log, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    return {'interrupted': bool(busy), 'wal_frames': log, 'checkpointed_frames': checkpointed}
+
+
+def analyze(conn, seconds):
+    """Refresh sqlite_stat1 with sampled statistics"""
+    conn.commit()
+    with _Budget(conn, seconds):
+        conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+        try:
+            conn.execute('ANALYZE')
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            if not _stopped(e):
+                raise
+            conn.rollback()
+            return {'interrupted': True}
+    tables = conn.execute('SELECT COUNT(DISTINCT tbl) FROM sqlite_stat1').fetchone()[0]
+    return {'interrupted': False, 'tables': tables}
+
+
+def incremental_vacuum(conn, seconds, pages=VACUUM_STEP_PAGES, pause=VACUUM_STEP_PAUSE):
+    """Release free pages in short write transactions until none are left or time is up"""
+    conn.commit()
+    result = {'interrupted': False, 'released_pages': 0}
+    with _Budget(conn, seconds) as budget:
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                size = database_stats(conn)['database_bytes']
+                if size > ONLINE_VACUUM_MAX_BYTES:
+                    result['skipped'] = 'auto_vacuum is not incremental; run scripts/maintain_db.py vacuum offline'
+                    return result
+                # Changing auto_vacuum only takes effect through a full VACUUM
+                budget.check()
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+                result['enabled_incremental'] = True
+
+            while not budget.expired:
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if not free:
+                    break
+                # executescript steps the pragma to completion; execute frees one page
+                conn.executescript(f'BEGIN IMMEDIATE; PRAGMA incremental_vacuum({pages}); COMMIT;')
+                result['released_pages'] += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+                time.sleep(pause)
+        except sqlite3.OperationalError as e:
+            if not _stopped(e):
+                raise
+            conn.rollback()
+            result['interrupted'] = True
+    result['free_pages'] = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    result['interrupted'] = result['interrupted'] or bool(result['free_pages'])
+    return result
+
+
+def quick_check(conn, seconds):
+    """PRAGMA quick_check; `ok` is None when the check did not finish"""
+    conn.commit()
+    with _Budget(conn, seconds) as budget:
+        try:
+            budget.check()
+            problems = [row[0] for row in conn.execute('PRAGMA quick_check(100)').fetchall()]
+        except sqlite3.OperationalError as e:
+            if not _stopped(e):
+                raise
+            return {'interrupted': True, 'ok': None}
+    ok = problems == ['ok']
+    return {'interrupted': False, 'ok': ok, 'problems': [] if ok else problems}
+
+
+RUNNERS = {
+    'checkpoint': checkpoint,
+    'analyze': analyze,
+    'incremental_vacuum': incremental_vacuum,
+    'quick_check': quick_check,
+}
+
+
+def run_task(conn, name, seconds=None):
+    """Run one task within its budget; returns its result with the time taken"""
+    started = time.perf_counter()
+    result = RUNNERS[name](conn, TASKS[name][1] if seconds is None else seconds)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def database_stats(conn, path=None):
+    """Page counts, free pages, auto_vacuum mode and file sizes"""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    stats = {
+        'page_size': page_size,
+        'page_count': page_count,
+        'free_pages': conn.execute('PRAGMA freelist_count').fetchone()[0],
+        'database_bytes': page_size * page_count,
+        'auto_vacuum': AUTO_VACUUM_MODES[conn.execute('PRAGMA auto_vacuum').fetchone()[0]],
+    }
+    if path:
+        stats['file_bytes'] = os.path.getsize(path)
+        stats['wal_bytes'] = os.path.getsize(path + '-wal') if os.path.exists(path + '-wal') else 0
+    return stats
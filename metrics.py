@@ -0,0 +1,76 @@
+"""
+In-process metrics registry.
+
+Counters, gauges and summaries (count/sum/min/max plus fixed buckets) are kept
+per worker process and exposed as JSON by `/api/metrics`. Gauges may be given
+a callable so values such as queue depth are read when the snapshot is taken.
+"""
+import threading
+
+# Upper bounds for summary buckets; the last bucket catches everything above
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_summaries = {}
+
+
+def incr(name, value=1):
+    """Add to a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """Set a gauge to a value or to a zero-argument callable read on snapshot"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS):
+    """Record one observation in a summary"""
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = _summaries[name] = {
+                'count': 0, 'sum': 0, 'min': None, 'max': None,
+                'buckets': buckets, 'bucket_counts': [0] * (len(buckets) + 1)
+            }
+        summary['count'] += 1
+        summary['sum'] += value
+        summary['min'] = value if summary['min'] is None else min(summary['min'], value)
+        summary['max'] = value if summary['max'] is None else max(summary['max'], value)
+        for index, bound in enumerate(summary['buckets']):
+            if value <= bound:
+                summary['bucket_counts'][index] += 1
+                break
+        else:
+            summary['bucket_counts'][-1] += 1
+
+
+def snapshot():
+    """Current values of all metrics"""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        summaries = {name: dict(summary, bucket_counts=list(summary['bucket_counts']))
+                     for name, summary in _summaries.items()}
+
+    for name, value in gauges.items():
+        gauges[name] = value() if callable(value) else value
+
+    for summary in summaries.values():
+        summary['avg'] = round(summary['sum'] / summary['count'], 3) if summary['count'] else None
+        bounds = [f'le_{bound}' for bound in summary.pop('buckets')] + ['inf']
+        summary['buckets'] = dict(zip(bounds, summary.pop('bucket_counts')))
+
+    return {'counters': counters, 'gauges': gauges, 'summaries': summaries}
+
+
+def reset():
+    """Clear all metrics"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
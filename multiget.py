@@ -0,0 +1,54 @@
+"""
+Multi-get helpers: load many rows by id in one request.
+
+Ids are looked up with chunked `WHERE id IN (...)` queries that stay under
+SQLite's bound-variable limit, and results come back in the order the ids
+were requested, with the ids that matched nothing listed separately.
+"""
+import fieldsets
+
+# Most ids accepted in one request
+MAX_IDS = 1000
+
+
+class IdListError(ValueError):
+    """Raised for a missing, malformed or oversized id list"""
+
+
+def parse_ids(value):
+    """Unique ids in request order from a comma separated string or a list"""
+    if isinstance(value, str):
+        ids = [item.strip() for item in value.split(',')]
+    elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+        ids = [item.strip() for item in value]
+    else:
+        raise IdListError("ids must be a list of strings or a comma separated string")
+
+    ids = list(dict.fromkeys(item for item in ids if item))
+    if not ids:
+        raise IdListError("At least one id is required")
+    if len(ids) > MAX_IDS:
+        raise IdListError(f"At most {MAX_IDS} ids can be requested at once")
+    return ids
+
+
+def load_by_ids(conn, query, ids, suffix=''):
+    """{id: row dict} for `query` (ending in `... IN`) run over id chunks.
+
+    The query must select the row id as `id`; `suffix` is appended after the
+    IN list, e.g. a GROUP BY.
+    """
+    rows = {}
+    for start in range(0, len(ids), fieldsets.CHUNK_SIZE):
+        chunk = ids[start:start + fieldsets.CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        for row in conn.execute(f"{query} ({placeholders}) {suffix}", chunk):
+            rows[row['id']] = {key: row[key] for key in row.keys()}
+    return rows
+
+
+def in_request_order(ids, rows):
+    """(items, not_found) with items ordered like `ids`"""
+    items = [rows[item_id] for item_id in ids if item_id in rows]
+    not_found = [item_id for item_id in ids if item_id not in rows]
+    return items, not_found
@@ -0,0 +1,115 @@
+"""
+Keyset (cursor) pagination helpers for the list endpoints.
+
+Pages are ordered by a sort key plus the row id as a tie-breaker, and the next
+page starts strictly after the last (key, id) pair seen, using a range
+condition that SQLite can answer by seeking a composite index. The cursor handed to
+clients is that pair, together with the sort it belongs to, as URL-safe
+base64 JSON. Nullable sort columns are wrapped in COALESCE (with matching
+expression indexes) so every key is comparable.
+"""
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sort keys for /api/works: request value -> SQL expression over `works`.
+# work_types ids follow name order (schema.WORK_TYPES), so type_id sorts by name.
+WORK_SORT_KEYS = {
+    'title': 'title',
+    'year': 'COALESCE(year, -1)',
+    'author': "COALESCE(author, '')",
+    'type': 'type_id',
+    'created_at': 'created_at',
+}
+
+# Sort keys for /api/examples over `examples e JOIN tropes t JOIN works w`
+EXAMPLE_SORT_KEYS = {
+    'created_at': 'e.created_at',
+    'trope_name': 't.name',
+    'work_title': 'w.title',
+    'description': 'e.description',
+}
+
+
+def ensure_indexes(conn):
+    """Composite indexes backing every allowed sort order.
+
+    The (created_at, id) indexes are created by activity.ensure_schema. Single
+    column indexes that are a prefix of a composite one are dropped so the
+    planner does not pick them and sort the page in a temp b-tree.
+    """
+    conn.executescript("""
+    CREATE INDEX IF NOT EXISTS idx_works_title_id ON works (title, id);
+    CREATE INDEX IF NOT EXISTS idx_works_year_key ON works (COALESCE(year, -1), id);
+    CREATE INDEX IF NOT EXISTS idx_works_author_key ON works (COALESCE(author, ''), id);
+    CREATE INDEX IF NOT EXISTS idx_works_type_id_id ON works (type_id, id);
+
+    CREATE INDEX IF NOT EXISTS idx_examples_description_id ON examples (description, id);
+    CREATE INDEX IF NOT EXISTS idx_examples_work_pk ON examples (work_pk);
+    CREATE INDEX IF NOT EXISTS idx_tropes_name_id ON tropes (name, id);
+
+    DROP INDEX IF EXISTS idx_works_title;
+    DROP INDEX IF EXISTS idx_works_type;
+    DROP INDEX IF EXISTS idx_works_year;
+    DROP INDEX IF EXISTS idx_works_created_at;
+    DROP INDEX IF EXISTS idx_examples_created_at;
+    DROP INDEX IF EXISTS idx_examples_trope_id;
+    DROP INDEX IF EXISTS idx_examples_work_id;
+    DROP INDEX IF EXISTS idx_tropes_name;
+    """)
+
+
+class CursorError(ValueError):
+    """Raised for malformed or mismatched cursors"""
+
+
+def encode_cursor(sort, order, key, row_id):
+    """Opaque cursor for the row after which the next page starts"""
+    payload = json.dumps({'s': sort, 'o': order, 'k': key, 'id': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort, order):
+    """(key, id) from a cursor, checking it was issued for the same sort"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key, row_id = payload['k'], payload['id']
+        issued_for = (payload['s'], payload['o'])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise CursorError("Invalid cursor")
+    if issued_for != (sort, order):
+        raise CursorError("Cursor does not match the requested sort order")
+    return key, row_id
+
+
+def parse_page_size(value):
+    """Requested page size clamped to MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if size < 1:
+        raise ValueError("limit must be at least 1")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def keyset_clause(key_sql, id_sql, direction, key, row_id):
+    """(WHERE fragment, params) selecting rows after a (key, id) cursor.
+
+    Written as `key <= ? AND (key < ? OR id < ?)` rather than a row-value
+    comparison so SQLite can also seek on expression indexes.
+    """
+    operator = '<' if direction == 'DESC' else '>'
+    sql = (f" AND {key_sql} {operator}= ?"
+           f" AND ({key_sql} {operator} ? OR {id_sql} {operator} ?)")
+    return sql, [key, key, row_id]
+
+
+def order_clause(key_sql, id_sql, direction):
+    return f" ORDER BY {key_sql} {direction}, {id_sql} {direction}"
@@ -24,8 +24,8 @@ def export_csv():
             t.description,
             GROUP_CONCAT(c.name) as categories
         FROM tropes t
-        LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-        LEFT JOIN categories c ON tc.category_id = c.id
+        LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+        LEFT JOIN categories c ON c.pk = tc.category_pk
         GROUP BY t.id, t.name, t.description
         ORDER BY t.name
         """
@@ -85,9 +85,9 @@ def get_analytics():
         SELECT 
             c.name,
             c.id,
-            COUNT(tc.trope_id) as trope_count
+            COUNT(tc.trope_pk) as trope_count
         FROM categories c
-        LEFT JOIN trope_categories tc ON c.id = tc.category_id
+        LEFT JOIN trope_categories tc ON tc.category_pk = c.pk
         GROUP BY c.id, c.name
         ORDER BY trope_count DESC
         """).fetchall()
@@ -104,10 +104,10 @@ def get_analytics():
         avg_categories_per_trope = conn.execute("""
         SELECT AVG(category_count) as avg_count
         FROM (
-            SELECT COUNT(tc.category_id) as category_count
+            SELECT COUNT(tc.category_pk) as category_count
             FROM tropes t
-            LEFT JOIN trope_categories tc ON t.id = tc.trope_id
-            GROUP BY t.id
+            LEFT JOIN trope_categories tc ON tc.trope_pk = t.pk
+            GROUP BY t.pk
         )
         """).fetchone()['avg_count'] or 0
         
@@ -115,8 +115,8 @@ def get_analytics():
         unused_categories = conn.execute("""
         SELECT c.name
         FROM categories c
-        LEFT JOIN trope_categories tc ON c.id = tc.category_id
-        WHERE tc.category_id IS NULL
+        LEFT JOIN trope_categories tc ON tc.category_pk = c.pk
+        WHERE tc.category_pk IS NULL
         """).fetchall()
         
         conn.close()
@@ -0,0 +1,203 @@
+"""
+Read replicas served from published snapshots.
+
+The primary runs a Publisher that copies the database with backup.snapshot
+whenever it has changed and makes the copy current by atomically replacing
+MANIFEST.json in the replica directory. Published snapshot files are never
+written again, so replicas open them with `mode=ro&immutable=1`: no locks,
+no -wal or -shm files and nothing written to the replica directory.
+
+Every new connection resolves the snapshot named by the manifest, so a
+replica moves to a newer snapshot on its next request while requests that
+are already running finish on the file they opened. Superseded snapshots
+are deleted only after RETIRE_AFTER seconds.
+
+When nothing has changed the publisher still refreshes the manifest's
+checked_at, which bounds staleness: a replica whose manifest is more than
+MAX_LAG seconds old stops serving instead of returning arbitrarily old data.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+import backup
+
+MANIFEST = 'MANIFEST.json'
+
+# Seconds between publisher polls of the primary
+PUBLISH_INTERVAL = 2.0
+
+# Oldest manifest a replica will still serve reads from
+MAX_LAG = 30.0
+
+# Snapshots kept besides the current one, and how long a superseded snapshot
+# stays available for requests that are still reading it
+KEEP_SNAPSHOTS = 2
+RETIRE_AFTER = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaError(Exception):
+    """The replica has no snapshot it may serve"""
+
+
+def read_manifest(replica_dir):
+    """The current manifest dict, or None before the first publish"""
+    try:
+        with open(os.path.join(replica_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(replica_dir, manifest):
+    """Replace the manifest atomically so readers never see a partial file"""
+    path = os.path.join(replica_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _snapshot_name():
+    """Sortable file name for a new snapshot"""
+    now = time.time()
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f'.{int(now * 1e6) % 1_000_000:06d}Z.db'
+
+
+def publish(source, replica_dir):
+    """Snapshot `source` (a connection or path) into replica_dir and make it current"""
+    os.makedirs(replica_dir, exist_ok=True)
+    name = _snapshot_name()
+    path = os.path.join(replica_dir, name)
+    # The copy is the database as of the start of its read transaction
+    published_at = time.time()
+    info = backup.snapshot(source, path + '.tmp')
+    # Immutable readers must not find a WAL-mode header
+    conn = sqlite3.connect(path + '.tmp', isolation_level=None)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.close()
+    os.replace(path + '.tmp', path)
+
+    manifest = {
+        'snapshot': name,
+        'published_at': published_at,
+        'checked_at': published_at,
+        'bytes': info['bytes'],
+    }
+    _write_manifest(replica_dir, manifest)
+    retire(replica_dir)
+    return manifest
+
+
+def retire(replica_dir, keep=KEEP_SNAPSHOTS, after=RETIRE_AFTER):
+    """Delete old snapshots beyond the newest `keep` once superseded for `after` seconds"""
+    manifest = read_manifest(replica_dir) or {}
+    names = sorted(name for name in os.listdir(replica_dir)
+                   if name.endswith('.db') and name != manifest.get('snapshot'))
+    removed = []
+    now = time.time()
+    for i, name in enumerate(names[:max(len(names) - keep, 0)]):
+        # A snapshot was superseded when the next one was written
+        successor = names[i + 1] if i + 1 < len(names) else manifest.get('snapshot')
+        try:
+            superseded = os.path.getmtime(os.path.join(replica_dir, successor))
+        except (FileNotFoundError, TypeError):
+            continue
+        if now - superseded >= after:
+            os.remove(os.path.join(replica_dir, name))
+            removed.append(name)
+    return removed
+
+
+class Publisher:
+    """Publishes the primary database to a replica directory whenever it changes"""
+
+    def __init__(self, db_path, replica_dir, interval=PUBLISH_INTERVAL):
+        self.replica_dir = replica_dir
+        self.interval = interval
+        # data_version changes when any other connection commits
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._seen = None
+        self._stop = threading.Event()
+
+    def poll(self):
+        """Publish if the primary changed since the last snapshot, else refresh checked_at"""
+        checked_at = time.time()
+        version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        manifest = read_manifest(self.replica_dir)
+        if manifest is None or version != self._seen:
+            manifest = publish(self._conn, self.replica_dir)
+            self._seen = version
+            logger.info("Published %s (%d bytes)", manifest['snapshot'], manifest['bytes'])
+        else:
+            manifest['checked_at'] = checked_at
+            _write_manifest(self.replica_dir, manifest)
+        return manifest
+
+    def run(self):
+        """Poll until stop() is called"""
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Replica publish failed")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self._conn.close()
+
+
+class Replica:
+    """Opens read-only connections on the currently published snapshot"""
+
+    def __init__(self, directory, max_lag=MAX_LAG):
+        # Callable returning the replica directory, resolved on every use
+        self.directory = directory
+        self.max_lag = max_lag
+        self._key = None
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        """The current manifest, re-read only when the file has been replaced"""
+        path = os.path.join(self.directory(), MANIFEST)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ReplicaError("No snapshot has been published yet")
+        key = (path, stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if key != self._key:
+                with open(path) as f:
+                    self._manifest = json.load(f)
+                self._key = key
+            return self._manifest
+
+    def lag(self, manifest):
+        """Seconds since the snapshot was last known to match the primary"""
+        return max(time.time() - manifest['checked_at'], 0.0)
+
+    def check(self):
+        """The current manifest, or ReplicaError if it is too stale to serve"""
+        manifest = self.manifest()
+        lag = self.lag(manifest)
+        if lag > self.max_lag:
+            raise ReplicaError(f"Replica is {lag:.0f}s behind the primary")
+        return manifest
+
+    def connect(self, **kwargs):
+        """Read-only connection on the current snapshot"""
+        manifest = self.check()
+        path = os.path.join(self.directory(), manifest['snapshot'])
+        uri = f"file:{urllib.parse.quote(path)}?mode=ro&immutable=1"
+        return sqlite3.connect(uri, uri=True, **kwargs)
@@ -0,0 +1,281 @@
+"""
+Versioned migrations of the core tables.
+
+The database's `PRAGMA user_version` records which migrations have been
+applied. `migrate` runs the pending ones in order, each in its own
+`BEGIN IMMEDIATE` transaction that re-reads the version first, so several
+workers starting at once apply every step exactly once. Foreign key
+enforcement is off while a step rebuilds tables and the step is checked with
+`PRAGMA foreign_key_check` before it commits: it must not break any
+reference that was intact before it ran.
+
+Version 2 makes the trope/category link table `WITHOUT ROWID`: the links are
+stored in their primary key b-tree alone instead of a rowid table plus a copy
+of every key pair in the primary key index.
+
+Version 3 gives tropes, categories and works an `INTEGER PRIMARY KEY` named
+`pk`. Joins and link columns (`trope_pk`, `work_pk`, `category_pk`) use it;
+the TEXT UUID `id` stays the unique public identifier that the API speaks.
+`examples` becomes a `WITHOUT ROWID` table keyed by (trope_pk, work_pk) and
+`works.type` is interned into the `work_types` lookup table (`works.type_id`).
+Rows that had no UUID are given one. Examples and links whose trope, work or
+category no longer exists (foreign keys were not always enforced) cannot be
+given integer keys: each one is logged with its id and dropped. Any other
+difference between the old and new row counts aborts the migration.
+
+Derived tables and triggers belong to their own modules and are (re)created
+by their `ensure_schema` after migrating, since rebuilding a table drops the
+triggers attached to it.
+"""
+import logging
+import sqlite3
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+_V2 = (
+    """
+    CREATE TABLE trope_categories_v2 (
+        trope_id TEXT NOT NULL,
+        category_id TEXT NOT NULL,
+        FOREIGN KEY (trope_id) REFERENCES tropes (id),
+        FOREIGN KEY (category_id) REFERENCES categories (id),
+        PRIMARY KEY (trope_id, category_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    INSERT INTO trope_categories_v2 (trope_id, category_id)
+    SELECT trope_id, category_id FROM trope_categories
+    """,
+    "DROP TABLE trope_categories",
+    "ALTER TABLE trope_categories_v2 RENAME TO trope_categories",
+    # Lookups by trope use the primary key, so only the reverse direction needs an index
+    "CREATE INDEX idx_trope_categories_category_id ON trope_categories (category_id)",
+)
+
+# Seeded in name order, so the ids are stable across databases and sorting by
+# type_id sorts by name
+WORK_TYPES = ('Comic', 'Film', 'Game', 'Novel', 'Other', 'Short Story', 'TV Show')
+
+# A random version 4 UUID, for rows that were stored without one
+NEW_UUID = (
+    "lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || "
+    "substr(hex(randomblob(2)), 2) || '-' || "
+    "substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || "
+    "hex(randomblob(6)))"
+)
+
+_V3_TABLES = (
+    """
+    CREATE TABLE work_types (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE categories_v3 (
+        pk INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        name TEXT UNIQUE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE tropes_v3 (
+        pk INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        description TEXT,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE works_v3 (
+        pk INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL CHECK(length(title) >= 1 AND length(title) <= 200),
+        type_id INTEGER NOT NULL REFERENCES work_types (id),
+        year INTEGER CHECK(year >= 1000 AND year <= 2100),
+        author TEXT CHECK(length(author) <= 100),
+        description TEXT CHECK(length(description) <= 2000),
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE trope_categories_v3 (
+        trope_pk INTEGER NOT NULL REFERENCES tropes (pk),
+        category_pk INTEGER NOT NULL REFERENCES categories (pk),
+        PRIMARY KEY (trope_pk, category_pk)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE examples_v3 (
+        trope_pk INTEGER NOT NULL REFERENCES tropes (pk) ON DELETE CASCADE,
+        work_pk INTEGER NOT NULL REFERENCES works (pk) ON DELETE CASCADE,
+        id TEXT NOT NULL UNIQUE,
+        description TEXT NOT NULL CHECK(length(description) >= 5 AND length(description) <= 1000),
+        page_reference TEXT CHECK(length(page_reference) <= 50),
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (trope_pk, work_pk)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+# Rows of the link tables whose parent is missing, by old table: the id (or key
+# pair) to log for each
+_V3_ORPHANS = {
+    'trope_categories': """
+        SELECT tc.trope_id || '/' || tc.category_id
+        FROM trope_categories tc
+        WHERE NOT EXISTS (SELECT 1 FROM tropes_v3 t WHERE t.id = tc.trope_id)
+           OR NOT EXISTS (SELECT 1 FROM categories_v3 c WHERE c.id = tc.category_id)
+    """,
+    'examples': """
+        SELECT COALESCE(e.id, 'rowid ' || e.rowid)
+        FROM examples e
+        WHERE NOT EXISTS (SELECT 1 FROM tropes_v3 t WHERE t.id = e.trope_id)
+           OR NOT EXISTS (SELECT 1 FROM works_v3 w WHERE w.id = e.work_id)
+    """,
+}
+
+
+def _check_v3_copy(conn, table):
+    """Log the orphans dropped from `table` and make sure nothing else was"""
+    orphans = [row[0] for row in conn.execute(_V3_ORPHANS[table])] if table in _V3_ORPHANS else []
+    for orphan in orphans:
+        logger.warning('Dropping %s row %s: it refers to a missing parent', table, orphan)
+    old = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    new = conn.execute(f'SELECT COUNT(*) FROM {table}_v3').fetchone()[0]
+    if new != old - len(orphans):
+        raise sqlite3.IntegrityError(
+            f'Migration to version 3 would lose {old - len(orphans) - new} {table} rows'
+        )
+
+
+def _v3(conn):
+    # Triggers name the old key columns; their modules recreate them afterwards
+    triggers = conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for (name,) in triggers:
+        conn.execute(f'DROP TRIGGER "{name}"')
+    # Tables migrated before versioning.ensure_schema ran have no version yet
+    versioned = {table for table in ('tropes', 'works', 'examples') if 'version' in columns(conn, table)}
+
+    for statement in _V3_TABLES:
+        conn.execute(statement)
+    conn.executemany('INSERT INTO work_types (name) VALUES (?)', [(name,) for name in WORK_TYPES])
+
+    # Existing rowids become the surrogate keys
+    conn.execute(f"""
+        INSERT INTO categories_v3 (pk, id, name)
+        SELECT rowid, COALESCE(id, {NEW_UUID}), name FROM categories
+    """)
+    conn.execute(f"""
+        INSERT INTO tropes_v3 (pk, id, name, description, version)
+        SELECT rowid, COALESCE(id, {NEW_UUID}), name, description, {'version' if 'tropes' in versioned else 1} FROM tropes
+    """)
+    conn.execute(f"""
+        INSERT INTO works_v3 (pk, id, title, type_id, year, author, description,
+                              created_at, updated_at, version)
+        SELECT w.rowid, COALESCE(w.id, {NEW_UUID}), w.title, wt.id, w.year, w.author,
+               w.description, w.created_at, w.updated_at, {'w.version' if 'works' in versioned else 1}
+        FROM works w
+        JOIN work_types wt ON wt.name = w.type
+    """)
+    conn.execute("""
+        INSERT INTO trope_categories_v3 (trope_pk, category_pk)
+        SELECT t.pk, c.pk
+        FROM trope_categories tc
+        JOIN tropes_v3 t ON t.id = tc.trope_id
+        JOIN categories_v3 c ON c.id = tc.category_id
+    """)
+    conn.execute(f"""
+        INSERT INTO examples_v3 (trope_pk, work_pk, id, description, page_reference,
+                                 created_at, updated_at, version)
+        SELECT t.pk, w.pk, COALESCE(e.id, {NEW_UUID}), e.description, e.page_reference,
+               e.created_at, e.updated_at, {'e.version' if 'examples' in versioned else 1}
+        FROM examples e
+        JOIN tropes_v3 t ON t.id = e.trope_id
+        JOIN works_v3 w ON w.id = e.work_id
+    """)
+
+    for table in ('categories', 'tropes', 'works', 'trope_categories', 'examples'):
+        _check_v3_copy(conn, table)
+    for table in ('examples', 'trope_categories', 'works', 'tropes', 'categories'):
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_v3 RENAME TO {table}')
+    # Lookups by trope use the primary key, so only the reverse direction needs an index
+    conn.execute('CREATE INDEX idx_trope_categories_category_pk ON trope_categories (category_pk)')
+
+
+# Steps that take the schema from version n - 1 to version n: statements to
+# execute in order, or a function of the connection
+MIGRATIONS = {
+    2: _V2,
+    3: _v3,
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def user_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def columns(conn, table):
+    """Column names of a table; empty if it does not exist"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _broken_references(conn):
+    """Rows failing `PRAGMA foreign_key_check`, counted by (table, parent)"""
+    return Counter((row[0], row[2]) for row in conn.execute('PRAGMA foreign_key_check'))
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply pending migrations up to `target`; returns the resulting version"""
+    # Databases that predate versioning are version 1
+    if max(user_version(conn), 1) >= target:
+        return max(user_version(conn), 1)
+
+    # Dropping a rebuilt table must not cascade into the rows that point at
+    # it, and the pragma is ignored inside a transaction
+    conn.commit()
+    enforced = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        for version in sorted(MIGRATIONS):
+            if version > target:
+                break
+            conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if max(user_version(conn), 1) >= version:
+                    conn.rollback()
+                    continue
+                # References that were already broken are version 3's to drop;
+                # a step must not break new ones
+                broken_before = _broken_references(conn)
+                step = MIGRATIONS[version]
+                if callable(step):
+                    step(conn)
+                else:
+                    for statement in step:
+                        conn.execute(statement)
+                broken = _broken_references(conn) - broken_before
+                if broken:
+                    raise sqlite3.IntegrityError(
+                        f"Migration to version {version} left {sum(broken.values())} broken references"
+                    )
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logger.info("Migrated database schema to version %d", version)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={'ON' if enforced else 'OFF'}")
+    return max(user_version(conn), 1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Backup, WAL archiving and restore for the trope database.
+
+    python scripts/backup_db.py snapshot              # new generation (snapshot only)
+    python scripts/backup_db.py archive               # snapshot, then archive WAL continuously
+    python scripts/backup_db.py list
+    python scripts/backup_db.py prune --keep 7
+    python scripts/backup_db.py restore --until 2025-09-01T12:00:00 [--target path]
+    python scripts/backup_db.py verify [path]
+
+Run `archive` as one long-lived process next to the server (not per worker).
+Stop the server before restoring over the live database.
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup
+
+DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
+DEFAULT_DB = os.path.join(DB_DIR, 'genre_tropes.db')
+DEFAULT_BACKUP_DIR = os.path.join(DB_DIR, 'backups')
+
+
+def parse_time(value):
+    """Local ISO 8601 time (or epoch seconds) to epoch seconds"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the trope database")
+    parser.add_argument('--db', default=DEFAULT_DB, help='database file')
+    parser.add_argument('--dir', default=DEFAULT_BACKUP_DIR, help='backup directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('snapshot', help='take a paced online snapshot as a new generation')
+
+    archive = commands.add_parser('archive', help='archive WAL frames until interrupted')
+    archive.add_argument('--interval', type=float, default=backup.ARCHIVE_INTERVAL,
+                         help='seconds between WAL polls')
+    archive.add_argument('--generation-hours', type=float, default=24,
+                         help='start a fresh generation this often')
+    archive.add_argument('--keep', type=int, default=backup.KEEP_GENERATIONS)
+
+    commands.add_parser('list', help='list generations')
+
+    prune = commands.add_parser('prune', help='delete all but the newest generations')
+    prune.add_argument('--keep', type=int, default=backup.KEEP_GENERATIONS)
+
+    restore = commands.add_parser('restore', help='rebuild the database from a generation')
+    restore.add_argument('--until', type=parse_time, help='point in time (ISO 8601 local time or epoch seconds)')
+    restore.add_argument('--generation', help='generation id (default: newest covering --until)')
+    restore.add_argument('--target', help='file to write (default: the --db file)')
+
+    verify = commands.add_parser('verify', help='integrity and foreign key check')
+    verify.add_argument('path', nargs='?')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.command == 'snapshot':
+        path = backup.create_generation(args.db, args.dir)
+        print(f"Snapshot written to {path}")
+
+    elif args.command == 'archive':
+        archiver = backup.WalArchiver(args.db, args.dir)
+        try:
+            archiver.run(interval=args.interval, generation_every=args.generation_hours * 3600, keep=args.keep)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            archiver.close()
+
+    elif args.command == 'list':
+        for generation in backup.generations(args.dir):
+            created = datetime.fromtimestamp(generation['created_at']).isoformat(timespec='seconds')
+            until = datetime.fromtimestamp(generation['archived_until']).isoformat(timespec='seconds')
+            print(f"{generation['id']}  {generation['bytes'] / 1024:>10.1f} KiB  "
+                  f"{created} -> {until}  ({generation['segments']} WAL segments)")
+
+    elif args.command == 'prune':
+        for generation_id in backup.prune(args.dir, keep=args.keep):
+            print(f"Removed {generation_id}")
+
+    elif args.command == 'restore':
+        target = args.target or args.db
+        try:
+            info = backup.restore(args.dir, target, until=args.until, generation=args.generation)
+        except backup.BackupError as e:
+            print(f"Restore failed: {e}")
+            sys.exit(1)
+        print(f"Restored {target} from {info['generation']} ({info['segments']} WAL segments replayed); integrity ok")
+
+    elif args.command == 'verify':
+        problems = backup.verify(args.path or args.db)
+        for problem in problems:
+            print(problem)
+        print("ok" if not problems else f"{len(problems)} problem(s) found")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measure read scaling and staleness across replica processes.
+
+Copies the database to a scratch primary, runs a publisher and a writer that
+stamps the current time into one trope's description, then starts 1, 2, 4 ...
+replica processes that each serve a fixed mix of GET requests through the
+app (in-process test client, so HTTP parsing is left out). Reports total
+requests per second for each process count and the worst staleness seen:
+how old the writer's timestamp was when a replica read it.
+
+Reads never share a lock or a file descriptor across processes, so
+throughput should grow with the process count until the cores run out.
+
+Usage: python scripts/benchmark_replicas.py [--processes 4] [--seconds 5] [--interval 0.5]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import replica
+
+SOURCE_DB = os.path.join(ROOT, 'db', 'genre_tropes.db')
+
+
+def reader(replica_dir, probe_id, seconds, results):
+    """Replica process: serve GETs for `seconds`, report count and worst staleness"""
+    # The app reads its mode from the environment at import
+    os.environ['TROPES_REPLICA_DIR'] = replica_dir
+    import app
+
+    client = app.app.test_client()
+    paths = ['/api/tropes?limit=50', f'/api/tropes/{probe_id}', '/api/categories',
+             '/api/works', '/api/search?q=love']
+    requests, worst = 0, 0.0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        response = client.get(paths[requests % len(paths)])
+        assert response.status_code == 200, response.get_json()
+        if requests % len(paths) == 1:
+            worst = max(worst, time.time() - float(response.get_json()['description']))
+        requests += 1
+    results.put((requests, worst))
+
+
+def write_probe(db_path, probe_id, stop, every=0.05):
+    """Primary writer: keep the probe trope's description at the current time"""
+    conn = sqlite3.connect(db_path)
+    while not stop.is_set():
+        conn.execute('UPDATE tropes SET description = ? WHERE id = ?', (repr(time.time()), probe_id))
+        conn.commit()
+        stop.wait(every)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read replicas")
+    parser.add_argument('--processes', type=int, default=4, help='largest replica process count')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--interval', type=float, default=0.5, help='publisher poll interval')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='replica-bench-')
+    db_path = os.path.join(work_dir, 'primary.db')
+    replica_dir = os.path.join(work_dir, 'replica')
+    try:
+        source = sqlite3.connect(SOURCE_DB)
+        target = sqlite3.connect(db_path)
+        source.backup(target)
+        source.close()
+        # Replicas never migrate, so the primary must be current before publishing
+        import app
+        app.init_db(target)
+        probe_id = target.execute('SELECT id FROM tropes WHERE id IS NOT NULL LIMIT 1').fetchone()[0]
+        target.execute('UPDATE tropes SET description = ? WHERE id = ?', (repr(time.time()), probe_id))
+        target.commit()
+        target.close()
+
+        publisher = replica.Publisher(db_path, replica_dir, interval=args.interval)
+        publisher.poll()
+        stop = threading.Event()
+        threads = [threading.Thread(target=publisher.run, daemon=True),
+                   threading.Thread(target=write_probe, args=(db_path, probe_id, stop), daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        context = multiprocessing.get_context('spawn')
+        print(f"{'processes':>9}  {'req/s':>9}  {'scaling':>7}  {'worst staleness':>15}")
+        baseline = None
+        count = 1
+        while count <= args.processes:
+            results = context.Queue()
+            procs = [context.Process(target=reader, args=(replica_dir, probe_id, args.seconds, results))
+                     for _ in range(count)]
+            for proc in procs:
+                proc.start()
+            outcomes = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+            rate = sum(requests for requests, _ in outcomes) / args.seconds
+            baseline = baseline or rate
+            worst = max(staleness for _, staleness in outcomes)
+            print(f"{count:>9}  {rate:>9.0f}  {rate / baseline:>6.2f}x  {worst:>14.2f}s")
+            count *= 2
+
+        stop.set()
+        publisher.stop()
+        for thread in threads:
+            thread.join()
+        publisher.close()
+        print(f"\n{os.cpu_count()} CPU(s); staleness is bounded by the publish interval "
+              f"({args.interval}s) plus the snapshot time")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Compare storage layouts for the core tables on synthetic data.
+
+Builds the same catalogue in three layouts and reports file size, the pages
+each table and index occupies, how much of a join's working set fits in a
+fixed page cache, and join timings:
+
+* text     - schema version 1: TEXT UUID keys everywhere, rowid link table
+* v2       - schema version 2: as above with a WITHOUT ROWID link table
+* integer  - the current schema (version 3): INTEGER PRIMARY KEY surrogates
+             used by every join and link table, UUIDs as unique public ids,
+             examples as a WITHOUT ROWID link table, work types interned into
+             a lookup table
+
+Python's sqlite3 module does not expose the page cache hit counters, so the
+cache figure is the share of the pages a join reads that fit in the cache.
+
+Usage: python scripts/benchmark_schema.py [--examples 10000000] [--dir /tmp/bench]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+WORK_TYPES = ('Novel', 'Film', 'TV Show', 'Short Story', 'Comic', 'Game', 'Other')
+EXAMPLES_PER_WORK = 10
+CATEGORIES = 23
+CACHE_KIB = 2048
+
+TEXT_SCHEMA = """
+CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE tropes (id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT);
+CREATE TABLE trope_categories (
+    trope_id TEXT NOT NULL REFERENCES tropes (id),
+    category_id TEXT NOT NULL REFERENCES categories (id),
+    PRIMARY KEY (trope_id, category_id)
+){link_options};
+CREATE INDEX idx_trope_categories_category_id ON trope_categories (category_id);
+CREATE TABLE works (
+    id TEXT PRIMARY KEY, title TEXT NOT NULL, type TEXT NOT NULL, year INTEGER,
+    author TEXT, description TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+);
+CREATE TABLE examples (
+    id TEXT PRIMARY KEY,
+    trope_id TEXT NOT NULL REFERENCES tropes (id),
+    work_id TEXT NOT NULL REFERENCES works (id),
+    description TEXT NOT NULL, page_reference TEXT,
+    created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+    UNIQUE (trope_id, work_id)
+);
+CREATE INDEX idx_examples_work_id_id ON examples (work_id, id);
+"""
+
+INTEGER_SCHEMA = """
+CREATE TABLE categories (id INTEGER PRIMARY KEY, uuid TEXT UNIQUE NOT NULL, name TEXT UNIQUE NOT NULL);
+CREATE TABLE tropes (id INTEGER PRIMARY KEY, uuid TEXT UNIQUE NOT NULL, name TEXT NOT NULL, description TEXT);
+CREATE TABLE trope_categories (
+    trope_id INTEGER NOT NULL REFERENCES tropes (id),
+    category_id INTEGER NOT NULL REFERENCES categories (id),
+    PRIMARY KEY (trope_id, category_id)
+) WITHOUT ROWID;
+CREATE INDEX idx_trope_categories_category_id ON trope_categories (category_id);
+CREATE TABLE work_types (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE works (
+    id INTEGER PRIMARY KEY, uuid TEXT UNIQUE NOT NULL, title TEXT NOT NULL,
+    type_id INTEGER NOT NULL REFERENCES work_types (id), year INTEGER,
+    author TEXT, description TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+);
+CREATE TABLE examples (
+    trope_id INTEGER NOT NULL REFERENCES tropes (id),
+    work_id INTEGER NOT NULL REFERENCES works (id),
+    uuid TEXT UNIQUE NOT NULL,
+    description TEXT NOT NULL, page_reference TEXT,
+    created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+    PRIMARY KEY (trope_id, work_id)
+) WITHOUT ROWID;
+CREATE INDEX idx_examples_work_id ON examples (work_id);
+"""
+
+# name -> (SQL for the text layouts, SQL for the integer layout, tables and indexes it reads)
+QUERIES = {
+    'examples per work type': (
+        "SELECT w.type, COUNT(*) FROM examples e JOIN works w ON w.id = e.work_id GROUP BY w.type",
+        "SELECT wt.name, COUNT(*) FROM examples e JOIN works w ON w.id = e.work_id "
+        "JOIN work_types wt ON wt.id = w.type_id GROUP BY wt.name",
+        ('examples', 'works', 'work_types'),
+    ),
+    'works for one trope': (
+        "SELECT w.title FROM examples e JOIN works w ON w.id = e.work_id WHERE e.trope_id = ?",
+        "SELECT w.title FROM tropes t JOIN examples e ON e.trope_id = t.id "
+        "JOIN works w ON w.id = e.work_id WHERE t.uuid = ?",
+        ('tropes', 'examples', 'works', 'sqlite_autoindex_examples_2', 'sqlite_autoindex_tropes_1'),
+    ),
+    'categories per trope': (
+        "SELECT t.name, COUNT(*) FROM tropes t JOIN trope_categories tc ON tc.trope_id = t.id GROUP BY t.id",
+        "SELECT t.name, COUNT(*) FROM tropes t JOIN trope_categories tc ON tc.trope_id = t.id GROUP BY t.id",
+        ('tropes', 'trope_categories'),
+    ),
+}
+
+
+def shape(examples):
+    works = max(examples // EXAMPLES_PER_WORK, 1)
+    tropes = max(min(examples // 50, 20000), EXAMPLES_PER_WORK * 3)
+    return works, tropes
+
+
+def build(path, layout, examples, seed):
+    """Create one database; returns the public ids of the tropes"""
+    rng = random.Random(seed)
+    works, tropes = shape(examples)
+    integer = layout == 'integer'
+    now = '2025-01-01T00:00:00'
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    if integer:
+        conn.executescript(INTEGER_SCHEMA)
+    else:
+        conn.executescript(TEXT_SCHEMA.format(link_options=' WITHOUT ROWID' if layout == 'v2' else ''))
+
+    def uuids(count):
+        return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+
+    category_ids, trope_ids, work_ids = uuids(CATEGORIES), uuids(tropes), uuids(works)
+    key = (lambda public, index: index + 1) if integer else (lambda public, index: public)
+    columns = 'id, uuid, ' if integer else 'id, '
+
+    def rows(public_ids, *values):
+        for index, public in enumerate(public_ids):
+            yield ((index + 1, public) if integer else (public,)) + tuple(value(index) for value in values)
+
+    conn.executemany(f"INSERT INTO categories ({columns}name) VALUES ({'?, ' * (2 if integer else 1)}?)",
+                     rows(category_ids, lambda i: f'category_{i}'))
+    conn.executemany(f"INSERT INTO tropes ({columns}name, description) VALUES ({'?, ' * (2 if integer else 1)}?, ?)",
+                     rows(trope_ids, lambda i: f'Trope {i}', lambda i: f'Description of trope {i} ' * 3))
+    conn.executemany(
+        "INSERT INTO trope_categories (trope_id, category_id) VALUES (?, ?)",
+        ((key(trope_ids[t], t), key(category_ids[c], c))
+         for t in range(tropes) for c in sorted(rng.sample(range(CATEGORIES), 2)))
+    )
+
+    if integer:
+        conn.executemany("INSERT INTO work_types (id, name) VALUES (?, ?)",
+                         [(index + 1, name) for index, name in enumerate(WORK_TYPES)])
+        work_type = lambda i: (i % len(WORK_TYPES)) + 1
+        work_columns = 'id, uuid, title, type_id'
+    else:
+        work_type = lambda i: WORK_TYPES[i % len(WORK_TYPES)]
+        work_columns = 'id, title, type'
+    conn.executemany(
+        f"INSERT INTO works ({work_columns}, year, author, description, created_at, updated_at) "
+        f"VALUES ({'?, ' * (4 if integer else 3)}?, ?, ?, ?, ?)",
+        rows(work_ids, lambda i: f'Work {i}', work_type, lambda i: 1900 + i % 125,
+             lambda i: f'Author {i % 5000}', lambda i: None, lambda i: now, lambda i: now)
+    )
+
+    def example_rows():
+        count = 0
+        for w in range(works):
+            # Distinct tropes per work so (trope_id, work_id) stays unique
+            start = rng.randrange(tropes)
+            for k in range(EXAMPLES_PER_WORK):
+                if count == examples:
+                    return
+                t = (start + k * 7) % tropes
+                public = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                yield (public, key(trope_ids[t], t), key(work_ids[w], w),
+                             f'Example {count} of trope {t} in work {w}', f'p. {k + 1}', now, now)
+                count += 1
+
+    conn.executemany(
+        f"INSERT INTO examples ({'uuid' if integer else 'id'}, trope_id, work_id, description, "
+        "page_reference, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        example_rows()
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return trope_ids
+
+
+def object_pages(conn):
+    """{table or index name: pages} from the dbstat virtual table, if compiled in"""
+    try:
+        return dict(conn.execute('SELECT name, COUNT(*) FROM dbstat GROUP BY name'))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def best_of(runs, fn):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def measure(path, layout, trope_ids, seed):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    size = conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+    pages = object_pages(conn)
+    cache_pages = CACHE_KIB * 1024 // page_size
+    sample = random.Random(seed).sample(trope_ids, min(200, len(trope_ids)))
+    integer = layout == 'integer'
+
+    results = {'size': size, 'pages': pages, 'queries': {}}
+    for name, (text_sql, integer_sql, objects) in QUERIES.items():
+        sql = integer_sql if integer else text_sql
+        if '?' in sql:
+            run = lambda: [conn.execute(sql, (trope_id,)).fetchall() for trope_id in sample]
+        else:
+            run = lambda: conn.execute(sql).fetchall()
+        working_set = sum(pages.get(obj, 0) for obj in objects)
+        results['queries'][name] = {
+            'ms': best_of(3, run),
+            'cache_fit': min(1.0, cache_pages / working_set) if working_set else None,
+        }
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--examples', type=int, default=200000,
+                        help='examples to generate (the full benchmark uses 10000000)')
+    parser.add_argument('--dir', help='where to write the databases (default: a temporary directory)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='schema-bench-')
+    os.makedirs(directory, exist_ok=True)
+    works, tropes = shape(args.examples)
+    print(f"{args.examples:,} examples, {works:,} works, {tropes:,} tropes in {directory}\n")
+
+    results = {}
+    for layout in ('text', 'v2', 'integer'):
+        path = os.path.join(directory, f'{layout}.db')
+        if os.path.exists(path):
+            os.remove(path)
+        started = time.perf_counter()
+        trope_ids = build(path, layout, args.examples, args.seed)
+        print(f"built {layout:<8} in {time.perf_counter() - started:.1f}s")
+        results[layout] = measure(path, layout, trope_ids, args.seed)
+
+    print(f"\n{'layout':<10}{'size MiB':>10}{'link pages':>12}{'example pages':>15}")
+    for layout, result in results.items():
+        pages = result['pages']
+        link = sum(n for name, n in pages.items() if 'trope_categories' in name)
+        example = sum(n for name, n in pages.items() if 'examples' in name)
+        print(f"{layout:<10}{result['size'] / 2 ** 20:>10.1f}{link:>12,}{example:>15,}")
+
+    for name in QUERIES:
+        print(f"\n{name} (best of 3, {CACHE_KIB} KiB cache)")
+        for layout, result in results.items():
+            query = result['queries'][name]
+            fit = '' if query['cache_fit'] is None else f"  working set in cache {query['cache_fit']:.0%}"
+            print(f"  {layout:<10}{query['ms']:>10.1f} ms{fit}")
+
+
+if __name__ == '__main__':
+    main()
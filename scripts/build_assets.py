@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Build minified, content-hashed static assets.
+
+    python scripts/build_assets.py [--dir static]
+
+Writes static/dist/<name>.<hash>.<ext> for every static file, precompressed
+.gz/.br copies of them, and static/dist/manifest.json, which url_for uses to
+link the hashed names. Run it as part of every deploy.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assets
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build content-hashed static assets")
+    parser.add_argument('--dir', default=STATIC_DIR, help='static directory')
+    args = parser.parse_args()
+
+    manifest = assets.build(args.dir)
+    for logical, hashed in sorted(manifest.items()):
+        source = os.path.getsize(os.path.join(args.dir, logical))
+        built = os.path.getsize(os.path.join(args.dir, hashed))
+        print(f"{logical} -> {hashed} ({source} -> {built} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Precompress static assets for the server.
+
+    python scripts/compress_static.py [--dir static]
+
+Writes `.gz` (and `.br` when the brotli package is installed) next to every
+compressible file, skipping copies that are already up to date, and removes
+copies whose source is gone. Run it after changing anything under static/.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .gz/.br copies of static assets")
+    parser.add_argument('--dir', default=STATIC_DIR, help='static directory')
+    args = parser.parse_args()
+
+    if compression.brotli is None:
+        print("brotli is not installed; writing .gz copies only")
+    written, removed = compression.precompress(args.dir)
+    for path in written:
+        source = path.rsplit('.', 1)[0]
+        print(f"{os.path.relpath(path, args.dir)}: {os.path.getsize(source)} -> {os.path.getsize(path)} bytes")
+    for path in removed:
+        print(f"removed {os.path.relpath(path, args.dir)}")
+    if not written and not removed:
+        print("Static assets are up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Run database maintenance tasks by hand.
+
+The server schedules these itself; this is for running one now, with a
+different budget, or for the full VACUUM that switches a large database to
+auto_vacuum=INCREMENTAL (stop the server first, it rewrites the whole file).
+
+Usage:
+    python scripts/maintain_db.py status
+    python scripts/maintain_db.py run analyze quick_check [--budget 30]
+    python scripts/maintain_db.py vacuum
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import maintenance
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'genre_tropes.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument('--db', default=DEFAULT_DB, help='database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='page counts, free pages and file sizes')
+    run = commands.add_parser('run', help='run maintenance tasks now')
+    run.add_argument('tasks', nargs='+', choices=sorted(maintenance.TASKS))
+    run.add_argument('--budget', type=float, help='seconds per task (default: the scheduled budget)')
+    commands.add_parser('vacuum', help='full VACUUM, enabling incremental auto_vacuum')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database not found at {args.db}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    if args.command == 'run':
+        for task in args.tasks:
+            print(f"{task}: {json.dumps(maintenance.run_task(conn, task, args.budget))}")
+    elif args.command == 'vacuum':
+        before = maintenance.database_stats(conn)['database_bytes']
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        after = maintenance.database_stats(conn)['database_bytes']
+        print(f"Database size: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB (auto_vacuum=incremental)")
+    print(json.dumps(maintenance.database_stats(conn, args.db), indent=2))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Migrate a database to the current core schema version.
+
+The app migrates automatically on first connection; this runs the same
+migrations offline and reports the file size before and after. Triggers on
+rebuilt tables are recreated by the app the next time it starts.
+
+Usage: python scripts/migrate_schema.py [path/to/genre_tropes.db]
+"""
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'genre_tropes.db')
+
+
+def database_bytes(conn):
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    return conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB
+    if not os.path.exists(path):
+        print(f"Database not found at {path}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA foreign_keys=ON')
+    before_version, before_bytes = max(schema.user_version(conn), 1), database_bytes(conn)
+    after_version = schema.migrate(conn)
+    # Return the space freed by rebuilt tables to the filesystem
+    conn.execute('VACUUM')
+    after_bytes = database_bytes(conn)
+    conn.close()
+
+    print(f"Schema version: {before_version} -> {after_version}")
+    print(f"Database size: {before_bytes / 1024:.1f} KiB -> {after_bytes / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Publish snapshots of the primary database for read replicas.
+
+Run one of these next to the primary. It snapshots the database whenever it
+has changed and refreshes the manifest every interval otherwise. Replica
+instances point TROPES_REPLICA_DIR at the same directory (shared, or synced
+so that snapshot files arrive before MANIFEST.json does).
+
+Usage: python scripts/publish_replica.py --dir /srv/tropes-replica [--interval 2] [--once]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replica
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'genre_tropes.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish database snapshots for read replicas")
+    parser.add_argument('--db', default=DEFAULT_DB, help='primary database file')
+    parser.add_argument('--dir', required=True, help='replica directory')
+    parser.add_argument('--interval', type=float, default=replica.PUBLISH_INTERVAL,
+                        help='seconds between checks for changes')
+    parser.add_argument('--once', action='store_true', help='publish one snapshot and exit')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if not os.path.exists(args.db):
+        print(f"Database not found at {args.db}")
+        sys.exit(1)
+
+    publisher = replica.Publisher(args.db, args.dir, interval=args.interval)
+    try:
+        if args.once:
+            manifest = publisher.poll()
+            print(f"Published {manifest['snapshot']} ({manifest['bytes'] / 1024:.1f} KiB)")
+        else:
+            publisher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+
+if __name__ == '__main__':
+    main()
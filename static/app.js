@@ -1,5 +1,373 @@
 // Simple JavaScript for the trope database interface
 
+// Page size for works and examples loaded as their grids scroll
+const PAGE_SIZE = 100;
+
+// Quiet period after the last keystroke before a search runs
+const SEARCH_DEBOUNCE_MS = 150;
+
+// Client-side records indexed by id, with examples also indexed by work
+class DataStore {
+    constructor() {
+        this.byId = {
+            tropes: new Map(),
+            categories: new Map(),
+            works: new Map(),
+            examples: new Map()
+        };
+        this.examplesByWork = new Map();
+    }
+    
+    set(kind, items) {
+        this.byId[kind] = new Map();
+        if (kind === 'examples') {
+            this.examplesByWork = new Map();
+        }
+        this.add(kind, items);
+    }
+    
+    add(kind, items) {
+        const index = this.byId[kind];
+        for (const item of items) {
+            index.set(item.id, item);
+            if (kind === 'examples') {
+                const examples = this.examplesByWork.get(item.work_id);
+                if (examples) {
+                    examples.push(item);
+                } else {
+                    this.examplesByWork.set(item.work_id, [item]);
+                }
+            }
+        }
+    }
+    
+    get(kind, id) {
+        return this.byId[kind].get(id);
+    }
+    
+    list(kind, ids) {
+        // Records for ids, in order, skipping ids that are no longer loaded
+        const index = this.byId[kind];
+        const items = [];
+        for (const id of ids) {
+            const item = index.get(id);
+            if (item) items.push(item);
+        }
+        return items;
+    }
+    
+    examplesOfWork(workId) {
+        return this.examplesByWork.get(workId) || [];
+    }
+}
+
+// Body of the filter worker. It keeps its own copy of each list with a
+// prebuilt lowercase search text per record, and answers queries with the
+// matching ids in display order. It is a plain function so the same code can
+// run in a Worker built from its source or, as a fallback, on this thread.
+function filterWorkerMain(scope) {
+    const lists = { tropes: [], works: [], examples: [] };
+    const texts = { tropes: [], works: [], examples: [] };
+    
+    const searchFields = {
+        tropes: trope => [trope.name, trope.description, ...(trope.categories || [])],
+        works: work => [work.title, work.author, work.description, work.type],
+        examples: example => [example.description, example.page_reference, example.trope_name, example.work_title]
+    };
+    const normalize = text => text.toLowerCase().replace(/_/g, ' ');
+    const collator = new Intl.Collator(undefined, { sensitivity: 'base', numeric: true });
+    
+    scope.onmessage = event => {
+        const message = event.data;
+        const kind = message.kind;
+        
+        if (message.type === 'load') {
+            if (!message.append) {
+                lists[kind] = [];
+                texts[kind] = [];
+            }
+            for (const item of message.items) {
+                lists[kind].push(item);
+                texts[kind].push(normalize(searchFields[kind](item).filter(Boolean).join('\n')));
+            }
+            return;
+        }
+        
+        // Query: optional id restriction (server search results), text, category and sort
+        const needle = normalize(message.term || '');
+        const allowed = message.ids ? new Set(message.ids) : null;
+        const matches = [];
+        lists[kind].forEach((item, i) => {
+            if (allowed && !allowed.has(item.id)) return;
+            if (needle && !texts[kind][i].includes(needle)) return;
+            if (message.category && !(item.categories || []).includes(message.category)) return;
+            matches.push(item);
+        });
+        
+        if (message.sort) {
+            const direction = message.order === 'desc' ? -1 : 1;
+            const key = message.sort;
+            matches.sort((a, b) => direction * collator.compare(String(a[key] ?? ''), String(b[key] ?? '')));
+        }
+        scope.postMessage({ id: message.id, ids: matches.map(item => item.id) });
+    };
+}
+
+// Sends lists and queries to the filter worker and resolves queries with id lists
+class FilterWorker {
+    constructor() {
+        this.pending = new Map();
+        this.nextId = 1;
+        const receive = event => {
+            const query = this.pending.get(event.data.id);
+            if (query) {
+                this.pending.delete(event.data.id);
+                query.resolve(event.data.ids);
+            }
+        };
+        
+        try {
+            const source = `(${filterWorkerMain.toString()})(self);`;
+            this.worker = new Worker(URL.createObjectURL(new Blob([source], { type: 'text/javascript' })));
+            this.worker.onmessage = receive;
+            this.worker.onerror = error => {
+                console.error('Filter worker error:', error);
+                for (const query of this.pending.values()) {
+                    query.reject(new Error('Filter worker failed'));
+                }
+                this.pending.clear();
+            };
+        } catch (error) {
+            // No workers here: the same code answers asynchronously on this thread
+            console.warn('Filtering on the main thread:', error);
+            const scope = { postMessage: data => setTimeout(() => receive({ data })) };
+            filterWorkerMain(scope);
+            this.worker = { postMessage: data => setTimeout(() => scope.onmessage({ data })) };
+        }
+    }
+    
+    load(kind, items, append = false) {
+        this.worker.postMessage({ type: 'load', kind: kind, items: items, append: append });
+    }
+    
+    query(kind, options = {}) {
+        return new Promise((resolve, reject) => {
+            const id = this.nextId++;
+            this.pending.set(id, { resolve, reject });
+            this.worker.postMessage({ type: 'query', id: id, kind: kind, ...options });
+        });
+    }
+}
+
+// Windowed card grid: only the rows near the viewport are in the DOM.
+// Rendered rows are measured (cards vary in height) and rows not seen yet are
+// estimated from the average, so the spacers above and below keep the
+// scrollbar and scroll position right. Rows leaving the window are kept in a
+// pool and reused for rows entering it.
+class VirtualGrid {
+    constructor(container, renderItem, options = {}) {
+        this.container = container;
+        this.renderItem = renderItem;
+        this.minColumnWidth = options.minColumnWidth || 320;
+        this.estimatedRowHeight = options.estimatedRowHeight || 240;
+        this.overscan = options.overscan || 3;
+        this.onNearEnd = options.onNearEnd || null;
+        
+        this.items = [];
+        this.columns = 0;
+        this.heights = [];
+        this.offsets = null;
+        this.rows = new Map();
+        this.pool = [];
+        this.frame = null;
+        
+        this.root = document.createElement('div');
+        this.root.className = 'virtual-grid';
+        this.topSpacer = document.createElement('div');
+        this.body = document.createElement('div');
+        this.body.className = 'virtual-rows';
+        this.bottomSpacer = document.createElement('div');
+        this.root.append(this.topSpacer, this.body, this.bottomSpacer);
+        container.replaceChildren(this.root);
+        
+        this.schedule = this.schedule.bind(this);
+        window.addEventListener('scroll', this.schedule, { passive: true });
+        window.addEventListener('resize', this.schedule);
+    }
+    
+    isAttached() {
+        return this.container.contains(this.root);
+    }
+    
+    destroy() {
+        window.removeEventListener('scroll', this.schedule);
+        window.removeEventListener('resize', this.schedule);
+        if (this.frame !== null) {
+            cancelAnimationFrame(this.frame);
+            this.frame = null;
+        }
+    }
+    
+    setItems(items, { append = false } = {}) {
+        if (append && this.columns) {
+            // Only the old last row can change when items are added at the end
+            const lastRow = Math.ceil(this.items.length / this.columns) - 1;
+            this.recycleRow(lastRow);
+            delete this.heights[lastRow];
+        } else {
+            this.recycleAll();
+            this.heights = [];
+        }
+        this.items = items;
+        this.offsets = null;
+        this.schedule();
+    }
+    
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.update();
+            });
+        }
+    }
+    
+    columnCount(width) {
+        if (window.matchMedia('(max-width: 768px)').matches) {
+            return 1;
+        }
+        const gap = parseFloat(getComputedStyle(this.body).columnGap) || 0;
+        return Math.max(1, Math.floor((width + gap) / (this.minColumnWidth + gap)));
+    }
+    
+    rowOffsets(rowCount) {
+        // offsets[i] is the top of row i; offsets[rowCount] the total height
+        if (this.offsets && this.offsets.length === rowCount + 1) {
+            return this.offsets;
+        }
+        
+        let measured = 0;
+        let total = 0;
+        this.heights.forEach(height => {
+            measured++;
+            total += height;
+        });
+        const estimate = measured ? total / measured : this.estimatedRowHeight;
+        
+        const offsets = new Float64Array(rowCount + 1);
+        for (let i = 0; i < rowCount; i++) {
+            offsets[i + 1] = offsets[i] + (this.heights[i] || estimate);
+        }
+        this.offsets = offsets;
+        return offsets;
+    }
+    
+    rowAt(offsets, y) {
+        // Last row starting at or above y
+        let low = 0;
+        let high = offsets.length - 2;
+        while (low < high) {
+            const mid = (low + high + 1) >> 1;
+            if (offsets[mid] <= y) {
+                low = mid;
+            } else {
+                high = mid - 1;
+            }
+        }
+        return low;
+    }
+    
+    recycleRow(index) {
+        const row = this.rows.get(index);
+        if (row) {
+            row.remove();
+            this.rows.delete(index);
+            this.pool.push(row);
+        }
+    }
+    
+    recycleAll() {
+        for (const index of [...this.rows.keys()]) {
+            this.recycleRow(index);
+        }
+    }
+    
+    update() {
+        // Hidden sections have no width; they are laid out once shown
+        const rect = this.root.getBoundingClientRect();
+        if (rect.width === 0 || !this.isAttached()) {
+            return;
+        }
+        
+        const columns = this.columnCount(rect.width);
+        if (columns !== this.columns) {
+            this.columns = columns;
+            this.heights = [];
+            this.offsets = null;
+            this.recycleAll();
+        }
+        
+        const rowCount = Math.ceil(this.items.length / columns);
+        if (rowCount === 0) {
+            this.recycleAll();
+            this.topSpacer.style.height = '0px';
+            this.bottomSpacer.style.height = '0px';
+            return;
+        }
+        
+        let offsets = this.rowOffsets(rowCount);
+        const top = -rect.top;
+        const first = Math.max(0, this.rowAt(offsets, top) - this.overscan);
+        const last = Math.min(rowCount - 1, this.rowAt(offsets, top + window.innerHeight) + this.overscan);
+        
+        for (const index of [...this.rows.keys()]) {
+            if (index < first || index > last) {
+                this.recycleRow(index);
+            }
+        }
+        
+        // Rows already in the DOM are contiguous; new ones go before or after them
+        const firstRendered = this.rows.size ? Math.min(...this.rows.keys()) : Infinity;
+        const before = [];
+        const after = [];
+        for (let index = first; index <= last; index++) {
+            if (this.rows.has(index)) {
+                continue;
+            }
+            const row = this.pool.pop() || document.createElement('div');
+            row.className = 'items-grid virtual-row';
+            row.style.gridTemplateColumns = `repeat(${columns}, minmax(0, 1fr))`;
+            row.innerHTML = this.items
+                .slice(index * columns, (index + 1) * columns)
+                .map(item => this.renderItem(item))
+                .join('');
+            this.rows.set(index, row);
+            (index < firstRendered ? before : after).push(row);
+        }
+        this.body.prepend(...before);
+        this.body.append(...after);
+        
+        let changed = false;
+        for (const [index, row] of this.rows) {
+            const height = row.offsetHeight;
+            if (height && this.heights[index] !== height) {
+                this.heights[index] = height;
+                changed = true;
+            }
+        }
+        if (changed) {
+            this.offsets = null;
+            offsets = this.rowOffsets(rowCount);
+        }
+        this.topSpacer.style.height = `${offsets[first]}px`;
+        this.bottomSpacer.style.height = `${offsets[rowCount] - offsets[last + 1]}px`;
+        
+        if (this.onNearEnd && last >= rowCount - 1 - this.overscan) {
+            this.onNearEnd();
+        }
+    }
+}
+
 class TropeApp {
     constructor() {
         this.currentView = 'tropes';
@@ -20,6 +388,20 @@ class TropeApp {
         this.statusCheckTime = null;
         this.statusTimer = null;
         
+        // Windowed grids by section, and the loading state of paged lists
+        this.grids = {};
+        this.pages = {
+            works: this.pageState(),
+            examples: this.pageState()
+        };
+        
+        // Indexed records, the worker that filters and sorts them, and the
+        // pending search (debounce timer, and the controller of its requests)
+        this.store = new DataStore();
+        this.filter = new FilterWorker();
+        this.searchTimer = null;
+        this.searchController = null;
+        
         this.init();
     }
     
@@ -44,7 +426,7 @@ class TropeApp {
         const searchInput = document.getElementById('searchInput');
         if (searchInput) {
             searchInput.addEventListener('input', (e) => {
-                this.handleSearch(e.target.value);
+                this.scheduleSearch(e.target.value);
             });
         }
         
@@ -239,45 +621,48 @@ class TropeApp {
     // End Status Monitoring System
     // ================================
     
-    async loadData(sortBy = 'name', sortOrder = 'asc', filterCategory = '') {
+    async loadData() {
+        // The first load uses the tropes and categories embedded in the page
+        const bootstrap = this.takeBootstrapData();
+        if (bootstrap) {
+            this.setItems('tropes', bootstrap.tropes.tropes || []);
+            this.setItems('categories', bootstrap.categories.categories || []);
+            this.filteredData.tropes = [...this.data.tropes];
+            this.filteredData.categories = [...this.data.categories];
+            this.updateResultsCount();
+            
+            // Works and examples are not needed for the first paint
+            this.loadRelatedData();
+            return;
+        }
+        
         this.showLoading();
         
         try {
-            // Build API URL with sorting and filtering parameters
-            let tropeUrl = '/api/tropes';
-            const params = new URLSearchParams();
-            
-            if (sortBy) params.append('sort', sortBy);
-            if (sortOrder) params.append('order', sortOrder);
-            if (filterCategory) params.append('filter_category', filterCategory);
-            
-            if (params.toString()) {
-                tropeUrl += '?' + params.toString();
-            }
-            
             // Load tropes, categories, works, and examples
-            const [tropesResponse, categoriesResponse, worksResponse, examplesResponse] = await Promise.all([
-                fetch(tropeUrl),
+            const [tropesResponse, categoriesResponse, works, examples] = await Promise.all([
+                fetch('/api/tropes'),
                 fetch('/api/categories'),
-                fetch('/api/works'),
-                fetch('/api/examples')
+                this.fetchAllPages('/api/works', 'works'),
+                this.fetchAllPages('/api/examples', 'examples')
             ]);
             
-            if (!tropesResponse.ok || !categoriesResponse.ok || !worksResponse.ok || !examplesResponse.ok) {
+            if (!tropesResponse.ok || !categoriesResponse.ok) {
                 throw new Error('Failed to load data from API');
             }
             
             const tropesData = await tropesResponse.json();
             const categoriesData = await categoriesResponse.json();
-            const worksData = await worksResponse.json();
-            const examplesData = await examplesResponse.json();
             
-            this.data.tropes = tropesData.tropes || [];
-            this.data.categories = categoriesData.categories || [];
-            this.data.works = worksData.works || [];
-            this.data.examples = examplesData.examples || [];
+            this.setItems('tropes', tropesData.tropes || []);
+            this.setItems('categories', categoriesData.categories || []);
+            this.setItems('works', works);
+            this.setItems('examples', examples);
+            this.pages.works = this.pageState(true);
+            this.pages.examples = this.pageState(true);
             
-            this.filteredData.tropes = [...this.data.tropes];
+            // Keep the sort order and category chosen in the controls
+            this.filteredData.tropes = await this.queryTropes();
             this.filteredData.categories = [...this.data.categories];
             this.filteredData.works = [...this.data.works];
             this.filteredData.examples = [...this.data.examples];
@@ -291,6 +676,149 @@ class TropeApp {
         }
     }
     
+    setItems(kind, items) {
+        // Replace a list everywhere it is kept: the array, its indexes and the filter worker
+        this.data[kind] = items;
+        this.store.set(kind, items);
+        if (kind !== 'categories') {
+            this.filter.load(kind, items);
+        }
+    }
+    
+    appendItems(kind, items) {
+        this.data[kind].push(...items);
+        this.store.add(kind, items);
+        this.filter.load(kind, items, true);
+    }
+    
+    takeBootstrapData() {
+        // Rendered into index.html by home(); only valid for the first load
+        const element = document.getElementById('bootstrapData');
+        if (!element) {
+            return null;
+        }
+        element.remove();
+        
+        try {
+            return JSON.parse(element.textContent);
+        } catch (error) {
+            console.error('Ignoring unreadable bootstrap data:', error);
+            return null;
+        }
+    }
+    
+    async loadRelatedData() {
+        // The first page of each; the rest follows as their grids scroll
+        try {
+            await Promise.all([this.loadNextPage('works'), this.loadNextPage('examples')]);
+        } catch (error) {
+            console.error('Error loading works and examples:', error);
+        }
+    }
+    
+    pageState(done = false) {
+        return { cursor: null, done: done, loading: null, failed: false };
+    }
+    
+    loadNextPage(kind, { fromScroll = false } = {}) {
+        const page = this.pages[kind];
+        if (page.done || (fromScroll && page.failed)) {
+            return Promise.resolve();
+        }
+        if (page.loading) {
+            return page.loading;
+        }
+        
+        page.loading = (async () => {
+            try {
+                const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+                if (page.cursor) params.append('cursor', page.cursor);
+                
+                const response = await fetch(`/api/${kind}?${params.toString()}`);
+                if (!response.ok) {
+                    throw new Error(`Failed to load ${kind} from API`);
+                }
+                const body = await response.json();
+                
+                // A full reload may have replaced the list while this page was in flight
+                if (this.pages[kind] !== page) {
+                    return;
+                }
+                this.appendItems(kind, body[kind] || []);
+                page.cursor = body.next_cursor;
+                page.done = !page.cursor;
+                page.failed = false;
+                
+                // Searches load every page first, so new rows only extend an unfiltered list
+                const searchInput = document.getElementById('searchInput');
+                if (!searchInput || searchInput.value.trim() === '' || this.currentView !== kind) {
+                    this.filteredData[kind] = [...this.data[kind]];
+                    if (this.currentView === 'works' && kind === 'works') {
+                        this.renderWorks({ append: true });
+                    } else if (this.currentView === 'examples' && kind === 'examples') {
+                        this.renderExamples({ append: true });
+                    }
+                }
+            } catch (error) {
+                page.failed = true;
+                throw error;
+            } finally {
+                page.loading = null;
+            }
+        })();
+        return page.loading;
+    }
+    
+    async loadAllPages(kind) {
+        // For searches, exports and forms that need the whole list
+        while (!this.pages[kind].done) {
+            await this.loadNextPage(kind);
+        }
+    }
+    
+    renderGrid(kind, container, items, renderItem, { append = false, onNearEnd = null } = {}) {
+        // Reuse the section's grid while it is still on the page
+        let grid = this.grids[kind];
+        if (!grid || !grid.isAttached()) {
+            if (grid) grid.destroy();
+            grid = this.grids[kind] = new VirtualGrid(container, renderItem, { onNearEnd });
+            append = false;
+        }
+        grid.renderItem = renderItem;
+        grid.onNearEnd = onNearEnd;
+        grid.setItems(items, { append });
+    }
+    
+    nextPageLoader(kind) {
+        return () => {
+            this.loadNextPage(kind, { fromScroll: true }).catch(error => {
+                console.error(`Error loading more ${kind}:`, error);
+            });
+        };
+    }
+    
+    async fetchAllPages(url, key) {
+        // Follow next_cursor until the paginated endpoint is exhausted
+        const items = [];
+        let cursor = null;
+        
+        do {
+            const params = new URLSearchParams({ limit: '500' });
+            if (cursor) params.append('cursor', cursor);
+            
+            const response = await fetch(`${url}?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error(`Failed to load ${key} from API`);
+            }
+            
+            const page = await response.json();
+            items.push(...(page[key] || []));
+            cursor = page.next_cursor;
+        } while (cursor);
+        
+        return items;
+    }
+    
     updateResultsCount() {
         const countElement = document.getElementById('resultsCount');
         if (countElement) {
@@ -333,21 +861,35 @@ class TropeApp {
     }
     
     async handleControlChange() {
+        // Sorting and filtering run in the filter worker over the loaded tropes
+        await this.applyFilters();
+    }
+    
+    applyFilters() {
+        const searchInput = document.getElementById('searchInput');
+        return this.handleSearch(searchInput ? searchInput.value : '');
+    }
+    
+    filterOptions() {
         const sortSelect = document.getElementById('sortSelect');
         const orderSelect = document.getElementById('orderSelect');
         const categoryFilter = document.getElementById('categoryFilter');
         
-        const sortBy = sortSelect ? sortSelect.value : 'name';
-        const sortOrder = orderSelect ? orderSelect.value : 'asc';
-        const filterCategory = categoryFilter ? categoryFilter.value : '';
-        
-        // Reload data with new parameters
-        await this.loadData(sortBy, sortOrder, filterCategory);
-        
-        // Re-render tropes if we're on the tropes section
-        if (document.getElementById('tropesSection').style.display !== 'none') {
-            this.renderTropes();
-        }
+        // Tropes list their categories by display name, which is the option text
+        const category = categoryFilter && categoryFilter.value
+            ? categoryFilter.options[categoryFilter.selectedIndex].textContent
+            : '';
+        return {
+            sort: sortSelect ? sortSelect.value : 'name',
+            order: orderSelect ? orderSelect.value : 'asc',
+            category: category
+        };
+    }
+    
+    async queryTropes(ids = null, term = '') {
+        // Tropes matching the controls, restricted to ids and term when given
+        const matches = await this.filter.query('tropes', { ids: ids, term: term, ...this.filterOptions() });
+        return this.store.list('tropes', matches);
     }
     
     showSection(section) {
@@ -463,40 +1005,38 @@ class TropeApp {
             return;
         }
         
-        const html = `
-            <div class="items-grid">
-                ${this.filteredData.tropes.map(trope => `
-                    <div class="item-card">
-                        <div class="item-content" onclick="app.showTropeDetail('${trope.id}')">
-                            <div class="item-title">${this.escapeHtml(trope.name)}</div>
-                            <div class="item-description">
-                                ${this.escapeHtml(trope.description || '').substring(0, 150)}${trope.description && trope.description.length > 150 ? '...' : ''}
-                            </div>
-                            <div class="item-meta">
-                                <div class="category-tags">
-                                    ${trope.categories.map(cat => `<span class="tag category clickable" onclick="app.filterByCategory('${this.escapeHtml(cat)}'); event.stopPropagation();" title="Filter by ${this.escapeHtml(cat)}">${this.escapeHtml(cat)}</span>`).join('')}
-                                </div>
-                                <div class="relationship-stats">
-                                    ${trope.work_count > 0 ? `<span class="stat-item" title="Appears in ${trope.work_count} work${trope.work_count !== 1 ? 's' : ''}">📚 ${trope.work_count} work${trope.work_count !== 1 ? 's' : ''}</span>` : ''}
-                                    ${trope.example_count > 0 ? `<span class="stat-item" title="${trope.example_count} example${trope.example_count !== 1 ? 's' : ''} recorded">🔗 ${trope.example_count} example${trope.example_count !== 1 ? 's' : ''}</span>` : ''}
-                                </div>
-                            </div>
+        this.renderGrid('tropes', container, this.filteredData.tropes, trope => this.tropeCardHtml(trope));
+    }
+    
+    tropeCardHtml(trope) {
+        return `
+            <div class="item-card">
+                <div class="item-content" onclick="app.showTropeDetail('${trope.id}')">
+                    <div class="item-title">${this.escapeHtml(trope.name)}</div>
+                    <div class="item-description">
+                        ${this.escapeHtml(trope.description || '').substring(0, 150)}${trope.description && trope.description.length > 150 ? '...' : ''}
+                    </div>
+                    <div class="item-meta">
+                        <div class="category-tags">
+                            ${trope.categories.map(cat => `<span class="tag category clickable" onclick="app.filterByCategory('${this.escapeHtml(cat)}'); event.stopPropagation();" title="Filter by ${this.escapeHtml(cat)}">${this.escapeHtml(cat)}</span>`).join('')}
                         </div>
-                        <div class="item-actions">
-                            ${trope.work_count > 0 ? `<button class="action-btn action-view" onclick="app.viewTropeWorks('${trope.id}'); event.stopPropagation();" aria-label="View works using this trope" title="View works">📚</button>` : ''}
-                            <button class="action-btn action-edit" onclick="app.editTrope('${trope.id}'); event.stopPropagation();" aria-label="Edit trope">
-                                ✏️
-                            </button>
-                            <button class="action-btn action-delete" onclick="app.deleteTrope('${trope.id}'); event.stopPropagation();" aria-label="Delete trope">
-                                🗑️
-                            </button>
+                        <div class="relationship-stats">
+                            ${trope.work_count > 0 ? `<span class="stat-item" title="Appears in ${trope.work_count} work${trope.work_count !== 1 ? 's' : ''}">📚 ${trope.work_count} work${trope.work_count !== 1 ? 's' : ''}</span>` : ''}
+                            ${trope.example_count > 0 ? `<span class="stat-item" title="${trope.example_count} example${trope.example_count !== 1 ? 's' : ''} recorded">🔗 ${trope.example_count} example${trope.example_count !== 1 ? 's' : ''}</span>` : ''}
                         </div>
                     </div>
-                `).join('')}
+                </div>
+                <div class="item-actions">
+                    ${trope.work_count > 0 ? `<button class="action-btn action-view" onclick="app.viewTropeWorks('${trope.id}'); event.stopPropagation();" aria-label="View works using this trope" title="View works">📚</button>` : ''}
+                    <button class="action-btn action-edit" onclick="app.editTrope('${trope.id}'); event.stopPropagation();" aria-label="Edit trope">
+                        ✏️
+                    </button>
+                    <button class="action-btn action-delete" onclick="app.deleteTrope('${trope.id}'); event.stopPropagation();" aria-label="Delete trope">
+                        🗑️
+                    </button>
+                </div>
             </div>
         `;
-        
-        container.innerHTML = html;
     }
     
     renderCategories() {
@@ -711,12 +1251,28 @@ class TropeApp {
         }
     }
     
+    scheduleSearch(query) {
+        // Each keystroke restarts the timer; the search runs once typing pauses
+        clearTimeout(this.searchTimer);
+        this.searchTimer = setTimeout(() => this.handleSearch(query), SEARCH_DEBOUNCE_MS);
+    }
+    
     async handleSearch(query) {
         const searchTerm = query.trim();
         
+        // A newer search supersedes this one, including its request to the server
+        clearTimeout(this.searchTimer);
+        if (this.searchController) {
+            this.searchController.abort();
+        }
+        const controller = this.searchController = new AbortController();
+        const signal = controller.signal;
+        
         if (searchTerm === '') {
             // Reset to original data
-            this.filteredData.tropes = [...this.data.tropes];
+            const tropes = await this.queryTropes();
+            if (signal.aborted) return;
+            this.filteredData.tropes = tropes;
             this.filteredData.categories = [...this.data.categories];
             this.filteredData.works = [...this.data.works];
             this.filteredData.examples = [...this.data.examples];
@@ -726,41 +1282,32 @@ class TropeApp {
             if (this.currentView === 'tropes' || this.currentView === 'categories') {
                 // Use the API search for tropes/categories
                 try {
-                    const response = await fetch(`/api/search?q=${encodeURIComponent(searchTerm)}`);
+                    const response = await fetch(`/api/search?q=${encodeURIComponent(searchTerm)}`, { signal });
                     if (!response.ok) {
                         throw new Error('Search failed');
                     }
                     
                     const searchResults = await response.json();
-                    this.filteredData.tropes = searchResults.tropes;
+                    const tropes = await this.queryTropes(searchResults.tropes.map(trope => trope.id));
+                    if (signal.aborted) return;
+                    this.filteredData.tropes = tropes;
                     this.filteredData.categories = searchResults.categories;
-                    this.updateSearchResults(searchTerm, searchResults.total_results);
+                    this.updateSearchResults(searchTerm, tropes.length + searchResults.categories.length);
                 } catch (error) {
+                    if (error.name === 'AbortError') return;
                     console.error('Search error:', error);
                     // Fallback to client-side search
-                    this.clientSideSearch(searchTerm);
+                    await this.clientSideSearch(searchTerm);
+                    if (signal.aborted) return;
                 }
-            } else if (this.currentView === 'works') {
-                // Client-side search for works
-                this.filteredData.works = this.data.works.filter(work => 
-                    work.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                    (work.author && work.author.toLowerCase().includes(searchTerm.toLowerCase())) ||
-                    (work.description && work.description.toLowerCase().includes(searchTerm.toLowerCase())) ||
-                    work.type.toLowerCase().includes(searchTerm.toLowerCase())
-                );
-                this.updateSearchResults(searchTerm, this.filteredData.works.length);
-            } else if (this.currentView === 'examples') {
-                // Client-side search for examples
-                this.filteredData.examples = this.data.examples.filter(example => {
-                    const trope = this.data.tropes.find(t => t.id === example.trope_id);
-                    const work = this.data.works.find(w => w.id === example.work_id);
-                    
-                    return example.description.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                           (example.page_reference && example.page_reference.toLowerCase().includes(searchTerm.toLowerCase())) ||
-                           (trope && trope.name.toLowerCase().includes(searchTerm.toLowerCase())) ||
-                           (work && work.title.toLowerCase().includes(searchTerm.toLowerCase()));
-                });
-                this.updateSearchResults(searchTerm, this.filteredData.examples.length);
+            } else if (this.currentView === 'works' || this.currentView === 'examples') {
+                // Client-side search over every page; examples carry their trope and work names
+                const kind = this.currentView;
+                await this.loadAllPages(kind);
+                const matches = await this.filter.query(kind, { term: searchTerm });
+                if (signal.aborted) return;
+                this.filteredData[kind] = this.store.list(kind, matches);
+                this.updateSearchResults(searchTerm, matches.length);
             }
         }
         
@@ -774,12 +1321,24 @@ class TropeApp {
         } else if (this.currentView === 'examples') {
             this.renderExamples();
         }
+        this.updateResultsCount();
     }
 
     // Export data functionality
-    exportData(type) {
+    async exportData(type) {
         let data, filename, headers;
         
+        // Works and examples may still be partly loaded; example rows name their work
+        if (type === 'works' || type === 'examples') {
+            try {
+                await Promise.all(type === 'works' ? [this.loadAllPages('works')] : [this.loadAllPages('examples'), this.loadAllPages('works')]);
+            } catch (error) {
+                console.error('Export error:', error);
+                alert(`Failed to load ${type} for export. Please try again.`);
+                return;
+            }
+        }
+        
         const currentDate = new Date().toISOString().slice(0, 10);
         
         switch (type) {
@@ -868,8 +1427,8 @@ class TropeApp {
                     break;
                 case 'examples':
                     // Find trope and work names for examples
-                    const trope = this.data.tropes.find(t => t.id === item.trope_id);
-                    const work = this.data.works.find(w => w.id === item.work_id);
+                    const trope = this.store.get('tropes', item.trope_id);
+                    const work = this.store.get('works', item.work_id);
                     
                     row = [
                         this.escapeCSV(item.id || ''),
@@ -926,17 +1485,11 @@ class TropeApp {
         }
     }
     
-    clientSideSearch(searchTerm) {
-        // Fallback client-side search (original functionality)
+    async clientSideSearch(searchTerm) {
+        // Fallback when the search API fails; tropes are matched in the filter worker
         const normalizedSearch = searchTerm.toLowerCase().replace(/_/g, ' ');
         
-        this.filteredData.tropes = this.data.tropes.filter(trope => 
-            trope.name.toLowerCase().includes(normalizedSearch) ||
-            (trope.description && trope.description.toLowerCase().includes(normalizedSearch)) ||
-            trope.categories.some(cat => 
-                cat.toLowerCase().replace(/_/g, ' ').includes(normalizedSearch)
-            )
-        );
+        this.filteredData.tropes = await this.queryTropes(null, searchTerm);
         
         this.filteredData.categories = this.data.categories.filter(category => {
             const displayName = category.display_name || category.name || '';
@@ -1304,14 +1857,15 @@ class TropeApp {
     }
 
     // Render Works section
-    renderWorks() {
+    renderWorks({ append = false } = {}) {
         const worksContainer = document.getElementById('worksContent');
         const worksCount = document.getElementById('worksResultsCount');
         
         if (!worksContainer) return;
 
         if (worksCount) {
-            worksCount.textContent = `${this.filteredData.works.length} work${this.filteredData.works.length === 1 ? '' : 's'}`;
+            const more = this.pages.works.done ? '' : '+';
+            worksCount.textContent = `${this.filteredData.works.length}${more} work${this.filteredData.works.length === 1 ? '' : 's'}`;
         }
 
         if (this.filteredData.works.length === 0) {
@@ -1319,45 +1873,58 @@ class TropeApp {
             return;
         }
 
-        worksContainer.innerHTML = `
-            <div class="items-grid">
-                ${this.filteredData.works.map(work => `
-                    <div class="item-card">
-                        <div class="item-content">
-                            <div class="item-title">${this.escapeHtml(work.title)}</div>
-                            <div class="item-description">
-                                ${this.escapeHtml(work.description || 'No description provided.')}
-                            </div>
-                            <div class="item-meta">
-                                <span class="tag">${this.escapeHtml(work.type)}</span>
-                                ${work.author ? `<span class="tag">${this.escapeHtml(work.author)}</span>` : ''}
-                                ${work.year ? `<span class="tag">${work.year}</span>` : ''}
-                                <span class="tag">${this.data.examples.filter(ex => ex.work_id === work.id).length} examples</span>
-                            </div>
-                        </div>
-                        <div class="item-actions">
-                            <button class="action-btn action-edit" onclick="app.editWork('${work.id}'); event.stopPropagation();" aria-label="Edit work">
-                                ✏️
-                            </button>
-                            <button class="action-btn action-delete" onclick="app.deleteWork('${work.id}'); event.stopPropagation();" aria-label="Delete work">
-                                🗑️
-                            </button>
-                        </div>
+        // Example counts need every example; show them once all have loaded
+        if (!this.pages.examples.done && !append) {
+            this.loadAllPages('examples')
+                .then(() => {
+                    if (this.currentView === 'works') this.renderWorks();
+                })
+                .catch(error => console.error('Error loading examples:', error));
+        }
+
+        this.renderGrid('works', worksContainer, this.filteredData.works, work => this.workCardHtml(work), {
+            append: append,
+            onNearEnd: this.nextPageLoader('works')
+        });
+    }
+
+    workCardHtml(work) {
+        return `
+            <div class="item-card">
+                <div class="item-content">
+                    <div class="item-title">${this.escapeHtml(work.title)}</div>
+                    <div class="item-description">
+                        ${this.escapeHtml(work.description || 'No description provided.')}
                     </div>
-                `).join('')}
+                    <div class="item-meta">
+                        <span class="tag">${this.escapeHtml(work.type)}</span>
+                        ${work.author ? `<span class="tag">${this.escapeHtml(work.author)}</span>` : ''}
+                        ${work.year ? `<span class="tag">${work.year}</span>` : ''}
+                        ${this.pages.examples.done ? `<span class="tag">${this.store.examplesOfWork(work.id).length} examples</span>` : ''}
+                    </div>
+                </div>
+                <div class="item-actions">
+                    <button class="action-btn action-edit" onclick="app.editWork('${work.id}'); event.stopPropagation();" aria-label="Edit work">
+                        ✏️
+                    </button>
+                    <button class="action-btn action-delete" onclick="app.deleteWork('${work.id}'); event.stopPropagation();" aria-label="Delete work">
+                        🗑️
+                    </button>
+                </div>
             </div>
         `;
     }
 
     // Render Examples section
-    renderExamples() {
+    renderExamples({ append = false } = {}) {
         const examplesContainer = document.getElementById('examplesContent');
         const examplesCount = document.getElementById('examplesResultsCount');
         
         if (!examplesContainer) return;
 
         if (examplesCount) {
-            examplesCount.textContent = `${this.filteredData.examples.length} example${this.filteredData.examples.length === 1 ? '' : 's'}`;
+            const more = this.pages.examples.done ? '' : '+';
+            examplesCount.textContent = `${this.filteredData.examples.length}${more} example${this.filteredData.examples.length === 1 ? '' : 's'}`;
         }
 
         if (this.filteredData.examples.length === 0) {
@@ -1365,38 +1932,40 @@ class TropeApp {
             return;
         }
 
-        examplesContainer.innerHTML = `
-            <div class="items-grid">
-                ${this.filteredData.examples.map(example => {
-                    const trope = this.data.tropes.find(t => t.id === example.trope_id);
-                    const work = this.data.works.find(w => w.id === example.work_id);
-                    
-                    return `
-                        <div class="item-card">
-                            <div class="item-content">
-                                <div class="item-title">
-                                    <span class="trope-name">${this.escapeHtml(trope ? trope.name : 'Unknown Trope')}</span>
-                                    <span class="connection-arrow"> → </span>
-                                    <span class="work-name">${this.escapeHtml(work ? work.title : 'Unknown Work')}</span>
-                                </div>
-                                <div class="item-description">
-                                    ${this.escapeHtml(example.description || 'No description provided.')}
-                                </div>
-                                ${example.page_reference ? `<div class="item-meta">
-                                    <span class="tag">Page: ${this.escapeHtml(example.page_reference)}</span>
-                                </div>` : ''}
-                            </div>
-                            <div class="item-actions">
-                                <button class="action-btn action-edit" onclick="app.editExample('${example.id}'); event.stopPropagation();" aria-label="Edit example">
-                                    ✏️
-                                </button>
-                                <button class="action-btn action-delete" onclick="app.deleteExample('${example.id}'); event.stopPropagation();" aria-label="Delete example">
-                                    🗑️
-                                </button>
-                            </div>
-                        </div>
-                    `;
-                }).join('')}
+        this.renderGrid('examples', examplesContainer, this.filteredData.examples, example => this.exampleCardHtml(example), {
+            append: append,
+            onNearEnd: this.nextPageLoader('examples')
+        });
+    }
+
+    exampleCardHtml(example) {
+        // Works load a page at a time; the API also sends both names with each example
+        const trope = this.store.get('tropes', example.trope_id);
+        const work = this.store.get('works', example.work_id);
+
+        return `
+            <div class="item-card">
+                <div class="item-content">
+                    <div class="item-title">
+                        <span class="trope-name">${this.escapeHtml(trope ? trope.name : (example.trope_name || 'Unknown Trope'))}</span>
+                        <span class="connection-arrow"> → </span>
+                        <span class="work-name">${this.escapeHtml(work ? work.title : (example.work_title || 'Unknown Work'))}</span>
+                    </div>
+                    <div class="item-description">
+                        ${this.escapeHtml(example.description || 'No description provided.')}
+                    </div>
+                    ${example.page_reference ? `<div class="item-meta">
+                        <span class="tag">Page: ${this.escapeHtml(example.page_reference)}</span>
+                    </div>` : ''}
+                </div>
+                <div class="item-actions">
+                    <button class="action-btn action-edit" onclick="app.editExample('${example.id}'); event.stopPropagation();" aria-label="Edit example">
+                        ✏️
+                    </button>
+                    <button class="action-btn action-delete" onclick="app.deleteExample('${example.id}'); event.stopPropagation();" aria-label="Delete example">
+                        🗑️
+                    </button>
+                </div>
             </div>
         `;
     }
@@ -1415,7 +1984,7 @@ class TropeApp {
     }
 
     // Render Create Example Form
-    renderCreateExampleForm() {
+    async renderCreateExampleForm() {
         // Populate the trope dropdown
         const tropeSelect = document.getElementById('exampleTrope');
         if (tropeSelect) {
@@ -1425,9 +1994,10 @@ class TropeApp {
                 ).join('');
         }
         
-        // Populate the work dropdown
+        // Populate the work dropdown once every work has loaded
         const workSelect = document.getElementById('exampleWork');
         if (workSelect) {
+            await this.loadAllPages('works').catch(error => console.error('Error loading works:', error));
             workSelect.innerHTML = '<option value="">Select work...</option>' + 
                 this.data.works.map(work => 
                     `<option value="${work.id}">${this.escapeHtml(work.title)}</option>`
@@ -1546,7 +2116,7 @@ class TropeApp {
         this.currentEditWorkId = workId;
         
         // Find the work to edit
-        const work = this.data.works.find(w => w.id === workId);
+        const work = this.store.get('works', workId);
         if (!work) {
             alert('Work not found!');
             return;
@@ -1559,7 +2129,7 @@ class TropeApp {
     renderEditWorkForm() {
         if (!this.currentEditWorkId) return;
         
-        const work = this.data.works.find(w => w.id === this.currentEditWorkId);
+        const work = this.store.get('works', this.currentEditWorkId);
         if (!work) return;
         
         // Populate form fields
@@ -1632,7 +2202,7 @@ class TropeApp {
     }
 
     async deleteWork(workId) {
-        const work = this.data.works.find(w => w.id === workId);
+        const work = this.store.get('works', workId);
         if (!work) return;
 
         if (!confirm(`Are you sure you want to delete the work "${work.title}"?\n\nThis will also delete all examples associated with this work.`)) {
@@ -1666,7 +2236,7 @@ class TropeApp {
         this.currentEditExampleId = exampleId;
         
         // Find the example to edit
-        const example = this.data.examples.find(e => e.id === exampleId);
+        const example = this.store.get('examples', exampleId);
         if (!example) {
             alert('Example not found!');
             return;
@@ -1676,10 +2246,10 @@ class TropeApp {
         this.showSection('editExample');
     }
 
-    renderEditExampleForm() {
+    async renderEditExampleForm() {
         if (!this.currentEditExampleId) return;
         
-        const example = this.data.examples.find(e => e.id === this.currentEditExampleId);
+        const example = this.store.get('examples', this.currentEditExampleId);
         if (!example) return;
         
         // Populate the trope dropdown
@@ -1691,9 +2261,10 @@ class TropeApp {
                 ).join('');
         }
         
-        // Populate the work dropdown
+        // Populate the work dropdown once every work has loaded
         const workSelect = document.getElementById('editExampleWork');
         if (workSelect) {
+            await this.loadAllPages('works').catch(error => console.error('Error loading works:', error));
             workSelect.innerHTML = '<option value="">Select work...</option>' + 
                 this.data.works.map(work => 
                     `<option value="${work.id}" ${work.id === example.work_id ? 'selected' : ''}>${this.escapeHtml(work.title)}</option>`
@@ -1761,13 +2332,13 @@ class TropeApp {
     }
 
     async deleteExample(exampleId) {
-        const example = this.data.examples.find(e => e.id === exampleId);
+        const example = this.store.get('examples', exampleId);
         if (!example) return;
 
-        const trope = this.data.tropes.find(t => t.id === example.trope_id);
-        const work = this.data.works.find(w => w.id === example.work_id);
+        const trope = this.store.get('tropes', example.trope_id);
+        const work = this.store.get('works', example.work_id);
 
-        if (!confirm(`Are you sure you want to delete this example?\n\nTrope: ${trope?.name || 'Unknown'}\nWork: ${work?.title || 'Unknown'}`)) {
+        if (!confirm(`Are you sure you want to delete this example?\n\nTrope: ${trope?.name || example.trope_name || 'Unknown'}\nWork: ${work?.title || example.work_title || 'Unknown'}`)) {
             return;
         }
 
@@ -1881,11 +2452,9 @@ TropeApp.prototype.filterByCategory = function(categoryName) {
         }
     }
     
-    // Apply the filter
-    this.applyFilters();
-    
-    // Show tropes section if not already showing
+    // Show tropes section if not already showing, then narrow it to the category
     this.showSection('tropes');
+    this.applyFilters();
 };
 
 // View works that use a specific trope
@@ -0,0 +1,65 @@
+"""
+Shared fixtures: every test gets its own copy of the bundled database
+"""
+import os
+import sqlite3
+
+import pytest
+
+import app as app_module
+
+SOURCE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'genre_tropes.db')
+
+
+def _copy_database(source_path, target_path):
+    # The backup API also picks up pages still in the source's WAL file
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    source.backup(target)
+    source.close()
+    target.close()
+
+
+@pytest.fixture(scope='session')
+def migrated_db(tmp_path_factory):
+    """The bundled database, copied and migrated once per session; the bundled file is never opened by the app"""
+    path = str(tmp_path_factory.mktemp('template') / 'genre_tropes.db')
+    _copy_database(SOURCE_DB, path)
+    app_module.open_db_connection(path).close()
+    return path
+
+
+@pytest.fixture
+def unmigrated_db(tmp_path):
+    """A throwaway copy of the bundled database exactly as shipped, before any migration"""
+    path = str(tmp_path / 'unmigrated.db')
+    _copy_database(SOURCE_DB, path)
+    return path
+
+
+@pytest.fixture
+def db_path(migrated_db, tmp_path, monkeypatch):
+    """Point the app at a throwaway copy of the database"""
+    path = str(tmp_path / 'genre_tropes.db')
+    _copy_database(migrated_db, path)
+    monkeypatch.setattr(app_module, 'DB_PATH', path)
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    """Flask test client bound to the temporary database"""
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def job_runner(db_path):
+    """The app's job runner, started on the temporary database as a server would start it"""
+    app_module.start_background_work()
+    try:
+        yield app_module.job_runner
+    finally:
+        # Nothing may keep running against this database once the test ends
+        app_module.job_runner.stop()
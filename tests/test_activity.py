@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for time-bucketed activity analytics
+"""
+import sqlite3
+from datetime import date
+
+import activity
+
+
+def test_writes_roll_up_into_today(client):
+    today = date.today().isoformat()
+    url = f'/api/analytics/activity?bucket=day&from={today}&to={today}'
+    before = client.get(url).get_json()
+
+    trope_id = client.get('/api/tropes').get_json()['tropes'][20]['id']
+    work = client.post('/api/works', json={'title': 'Activity Probe', 'type': 'Novel'}).get_json()['work']
+    client.put(f"/api/works/{work['id']}", json={'year': 2001})
+    client.post('/api/examples', json={
+        'trope_id': trope_id, 'work_id': work['id'], 'description': 'Touches the trope today.'
+    })
+
+    after = client.get(url).get_json()
+    assert after['buckets'] == [today]
+    for entity, action, delta in [('works', 'created', 1), ('works', 'updated', 1), ('examples', 'created', 1)]:
+        assert after['series'][entity][action][0] == before['series'][entity][action][0] + delta
+    assert after['growth']['works'][0] == before['growth']['works'][0] + 1
+    assert after['recently_touched_tropes'][0]['id'] == trope_id
+
+
+def test_week_and_month_labels():
+    start, end = date(2025, 8, 25), date(2025, 9, 8)
+    assert activity.bucket_labels(start, end, 'week') == ['2025-W35', '2025-W36', '2025-W37']
+    assert activity.bucket_labels(start, end, 'month') == ['2025-08', '2025-09']
+
+
+def test_week_spanning_new_year_is_one_bucket(client, db_path):
+    client.get('/api/analytics/activity')
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO activity_rollups (entity, action, day, count) VALUES ('works', 'created', ?, ?)",
+        [('2025-12-28', 1), ('2025-12-29', 2), ('2026-01-02', 3), ('2026-01-05', 4)]
+    )
+    conn.commit()
+    conn.close()
+
+    report = client.get('/api/analytics/activity?bucket=week&from=2025-12-22&to=2026-01-11').get_json()
+    assert report['buckets'] == ['2025-W52', '2026-W01', '2026-W02']
+    assert report['series']['works']['created'] == [1, 5, 4]
+    assert 'tropes' in report['growth_notes'] and 'works' not in report['growth_notes']
+
+
+def test_invalid_parameters_are_rejected(client):
+    assert client.get('/api/analytics/activity?bucket=year').status_code == 400
+    assert client.get('/api/analytics/activity?from=yesterday').status_code == 400
+    assert client.get('/api/analytics/activity?from=2025-02-01&to=2025-01-01').status_code == 400
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for admission control and load shedding
+"""
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import admission
+import app as app_module
+
+TIGHT = {'heavy': admission.Limit(concurrency=1, queue=1, wait=0.05, retry_after=3)}
+
+
+def test_requests_are_classified_by_endpoint():
+    assert admission.classify('health', 'GET') is None
+    assert admission.classify('get_categories', 'GET') == 'cheap'
+    assert admission.classify('search', 'GET') == 'heavy'
+    assert admission.classify('run_batch', 'POST') == 'heavy'
+    assert admission.classify('update_trope', 'PATCH') == 'write'
+    assert admission.classify('export_csv', 'GET') == 'export'
+    now = 1_700_000_002.0
+    assert admission.request_age('t=1700000000.5', now=now) == 1.5
+    assert admission.request_age('t=1700000000500', now=now) == 1.5
+    assert admission.request_age('1700000000500000', now=now) == 1.5
+    assert admission.request_age('t=garbage') is None
+
+
+def test_full_class_queues_briefly_then_sheds(tmp_path):
+    controller = admission.Controller(lambda: str(tmp_path), classes=TIGHT)
+    held = controller.admit('heavy')
+
+    started = time.perf_counter()
+    with pytest.raises(admission.Shed) as shed:
+        controller.admit('heavy')
+    assert 0.04 < time.perf_counter() - started < 1
+    assert shed.value.retry_after == 3
+
+    # A release in this process wakes a waiter straight away
+    slow = admission.Controller(lambda: str(tmp_path), classes={
+        'heavy': admission.Limit(concurrency=1, queue=1, wait=5, retry_after=3)
+    })
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(slow.admit('heavy')))
+    waiter.start()
+    time.sleep(0.05)
+    # The queue of one is taken by the waiter
+    with pytest.raises(admission.Shed, match='waiting'):
+        slow.admit('heavy')
+    held.release()
+    waiter.join(2)
+    assert admitted and admitted[0].fd is not None
+    admitted[0].release()
+
+
+def test_slots_are_shared_across_processes(tmp_path):
+    holder = subprocess.Popen([sys.executable, '-c', (
+        "import fcntl, os, sys, time\n"
+        f"fd = os.open({str(tmp_path / 'heavy.0.lock')!r}, os.O_RDWR | os.O_CREAT)\n"
+        "fcntl.flock(fd, fcntl.LOCK_EX)\n"
+        "print('held', flush=True)\n"
+        "time.sleep(30)\n"
+    )], stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'held'
+        controller = admission.Controller(lambda: str(tmp_path), classes=TIGHT)
+        with pytest.raises(admission.Shed):
+            controller.admit('heavy')
+    finally:
+        holder.kill()
+        holder.wait()
+    # The kernel released the dead worker's slot
+    controller.admit('heavy').release()
+
+
+def test_app_sheds_busy_classes_but_not_health(client, monkeypatch):
+    monkeypatch.setitem(admission.CLASSES, 'heavy', TIGHT['heavy'])
+    held = app_module.admission_controller.admit('heavy')
+    try:
+        response = client.get('/api/search?q=love')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert response.get_json()['class'] == 'heavy'
+
+        assert client.get('/api/health').status_code == 200
+        assert client.get('/api/categories').status_code == 200
+    finally:
+        held.release()
+    assert client.get('/api/search?q=love').status_code == 200
+
+    stale = client.get('/api/categories', headers={'X-Request-Start': f't={time.time() - 30:.3f}'})
+    assert stale.status_code == 503
+
+
+def test_request_age_parses_prefixed_and_bare_timestamps():
+    now = 1700000010.0
+    assert admission.request_age('t=1700000000.5', now) == pytest.approx(9.5)
+    assert admission.request_age(' 1700000000.5 ', now) == pytest.approx(9.5)
+    assert admission.request_age('t=1700000000500', now) == pytest.approx(9.5)
+    assert admission.request_age('1700000000500000', now) == pytest.approx(9.5)
+    assert admission.request_age('t=soon', now) is None
+    assert admission.request_age('', now) is None
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained analytics aggregates
+"""
+import sqlite3
+
+import analytics
+
+
+def _drift(db_path):
+    conn = sqlite3.connect(db_path)
+    mismatches = analytics.verify(conn)
+    conn.close()
+    return mismatches
+
+
+def test_counters_survive_mixed_writes(client, db_path):
+    categories = client.get('/api/categories').get_json()['categories']
+    created = client.post('/api/tropes', json={
+        'name': 'Analytics Probe Trope',
+        'description': 'Exists only to exercise the analytics triggers.',
+        'category_ids': [categories[0]['id'], categories[1]['id']]
+    }).get_json()['trope']
+    client.put(f"/api/tropes/{created['id']}", json={
+        'name': 'Analytics Probe Trope',
+        'description': 'Exists only to exercise the analytics triggers.',
+        'category_ids': [categories[2]['id']]
+    })
+
+    work = client.post('/api/works', json={
+        'title': 'Analytics Probe Work', 'type': 'Comic', 'year': 1987
+    }).get_json()['work']
+    example = client.post('/api/examples', json={
+        'trope_id': created['id'], 'work_id': work['id'], 'description': 'Used on page one.'
+    }).get_json()['example']
+    client.put(f"/api/works/{work['id']}", json={'type': 'Game', 'year': 2004})
+    assert _drift(db_path) == []
+
+    client.delete(f"/api/examples/{example['id']}")
+    client.delete(f"/api/works/{work['id']}")
+    client.delete(f"/api/tropes/{created['id']}")
+    assert _drift(db_path) == []
+
+
+def test_analytics_endpoint_reads_counters(client):
+    before = client.get('/api/analytics').get_json()
+    client.post('/api/works', json={'title': 'Decade Probe', 'type': 'Film', 'year': 1972})
+    after = client.get('/api/analytics').get_json()
+
+    assert after['summary']['total_works'] == before['summary']['total_works'] + 1
+    decades = {entry['decade']: entry['count'] for entry in after['works_by_decade']}
+    assert decades['1970'] >= 1
+    assert sum(entry['tropes'] for entry in after['categories_per_trope']) == after['summary']['total_tropes']
+
+
+def test_rebuild_restores_drifted_counters(db_path, client):
+    client.get('/api/analytics')
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE analytics_counters SET value = value + 5 WHERE metric = 'totals'")
+    assert analytics.verify(conn)
+    analytics.rebuild(conn)
+    assert analytics.verify(conn) == []
+    conn.close()
+
+
+def test_cascading_work_delete_keeps_counters(db_path, client):
+    client.get('/api/analytics')
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    work_pk = conn.execute(
+        'SELECT work_pk FROM examples GROUP BY work_pk ORDER BY COUNT(*) DESC LIMIT 1'
+    ).fetchone()[0]
+    conn.execute('DELETE FROM works WHERE pk = ?', (work_pk,))
+    assert analytics.verify(conn) == []
+    conn.close()
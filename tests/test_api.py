@@ -4,6 +4,7 @@ Simple test script to verify our Flask API endpoints work
 """
 import sqlite3
 import os
+import tempfile
 
 # Test database connection directly
 db_path = os.path.join('db', 'genre_tropes.db')
@@ -55,8 +56,19 @@ print("\n" + "="*50)
 print("Testing Flask API endpoints...")
 
 try:
+    import app as app_module
     from app import app
     
+    # The first request migrates the database, so point the app at a copy
+    scratch = tempfile.TemporaryDirectory()
+    copy = sqlite3.connect(os.path.join(scratch.name, 'genre_tropes.db'))
+    source = sqlite3.connect(db_path)
+    source.backup(copy)
+    source.close()
+    copy.close()
+    bundled_db_path = app_module.DB_PATH
+    app_module.DB_PATH = os.path.join(scratch.name, 'genre_tropes.db')
+    
     with app.test_client() as client:
         # Test home endpoint
         response = client.get('/')
@@ -86,6 +98,7 @@ try:
         else:
             print(f"❌ Tropes endpoint failed: {response.status_code}")
     
+    app_module.DB_PATH = bundled_db_path
     print("✅ All Flask endpoint tests passed!")
     print("\nYour API is ready! Start the server with:")
     print("  ./start_server.sh")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-hashed static asset pipeline
+"""
+import os
+import re
+
+import app as app_module
+import assets
+
+
+def test_minifiers_keep_strings_templates_and_regexes():
+    css = '/* theme */\n.card :hover ,\na > b {\n    content: "a , b: c" ;\n    color : red;\n}\n'
+    assert assets.minify_css(css) == '.card :hover,a>b{content:"a , b: c";color :red}'
+
+    js = (
+        "// comment\n"
+        "const half = 4 / 2;  /* inline */ const re = /[/]\\//g;\n"
+        "function f(x) {\n"
+        "    return /a  b/.test(`  ${ {a: 1}.a }  // kept `); // dropped\n"
+        "}\n"
+        "\n"
+        "const s = '// not a comment';\n"
+    )
+    assert assets.minify_js(js) == (
+        "const half = 4 / 2; const re = /[/]\\//g;\n"
+        "function f(x) {\n"
+        "return /a  b/.test(`  ${ {a: 1}.a }  // kept `);\n"
+        "}\n"
+        "const s = '// not a comment';\n"
+    )
+
+
+def test_built_assets_are_linked_by_hash_and_cached_forever(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.app, 'static_folder', str(tmp_path))
+    (tmp_path / 'app.js').write_text('// app\nconsole.log("v1");\n')
+    (tmp_path / 'style.css').write_text('body {\n    color: red;\n}\n')
+
+    # Before a build, pages link the sources
+    assert '/static/app.js' in client.get('/').get_data(as_text=True)
+
+    first = assets.build(str(tmp_path))
+    assert re.fullmatch(r'dist/app\.[0-9a-f]{12}\.js', first['app.js'])
+    assert (tmp_path / first['app.js']).read_text() == 'console.log("v1");\n'
+    page = client.get('/').get_data(as_text=True)
+    assert f"/static/{first['app.js']}" in page and f"/static/{first['style.css']}" in page
+
+    response = client.get(f"/static/{first['app.js']}")
+    assert response.status_code == 200
+    assert response.cache_control.immutable and response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    assert not client.get('/static/app.js').cache_control.immutable
+
+    # A source edited after the build is linked directly until the next one
+    manifest = tmp_path / assets.BUILD_DIR / assets.MANIFEST
+    os.utime(manifest, (os.path.getmtime(manifest) - 10,) * 2)
+    (tmp_path / 'app.js').write_text('console.log("v2");\n')
+    assert '/static/app.js' in client.get('/').get_data(as_text=True)
+
+    second = assets.build(str(tmp_path))
+    assert second['app.js'] != first['app.js'] and second['style.css'] == first['style.css']
+    assert f"/static/{second['app.js']}" in client.get('/').get_data(as_text=True)
+    # The previous build stays for pages rendered before the deploy
+    assert client.get(f"/static/{first['app.js']}").status_code == 200
+
+    (tmp_path / 'app.js').write_text('console.log("v3");\n')
+    assets.build(str(tmp_path))
+    assert not (tmp_path / first['app.js']).exists()
+    assert (tmp_path / second['app.js']).exists()
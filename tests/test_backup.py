@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for online backups, WAL archiving and restore
+"""
+import os
+import sqlite3
+import time
+
+import backup
+
+
+def _source(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA wal_autocheckpoint=50')
+    conn.execute('CREATE TABLE IF NOT EXISTS items (n INTEGER PRIMARY KEY, pad BLOB)')
+    return conn
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_snapshot_is_consistent_while_writers_continue(tmp_path):
+    path = str(tmp_path / 'live.db')
+    conn = _source(path)
+    conn.executemany('INSERT INTO items (pad) VALUES (randomblob(2000))', [()] * 200)
+    writer = sqlite3.connect(path, isolation_level=None)
+
+    steps = []
+    def write_between_steps(done, total):
+        steps.append(done)
+        writer.execute('INSERT INTO items (pad) VALUES (randomblob(2000))')
+
+    info = backup.snapshot(path, str(tmp_path / 'copy.db'), pages=10, pause=0, progress=write_between_steps)
+    assert len(steps) > 5
+    assert info['pages'] > 100
+    assert _count(str(tmp_path / 'copy.db')) == 200
+    assert _count(path) == 200 + len(steps)
+    assert backup.verify(str(tmp_path / 'copy.db')) == []
+
+
+def test_archived_wal_restores_to_latest_and_to_a_point_in_time(tmp_path):
+    path, backups = str(tmp_path / 'live.db'), str(tmp_path / 'backups')
+    conn = _source(path)
+    archiver = backup.WalArchiver(path, backups, rotate_bytes=100_000)
+
+    marks = []
+    for _ in range(12):
+        conn.executemany('INSERT INTO items (pad) VALUES (randomblob(3000))', [()] * 10)
+        archiver.poll()
+        marks.append((time.time(), _count(path)))
+        time.sleep(0.002)
+    archiver.close()
+
+    generation = backup.generations(backups)[0]
+    cycles = {name.split('-')[0] for name in os.listdir(os.path.join(generation['path'], 'wal'))}
+    assert len(cycles) > 1
+
+    target = str(tmp_path / 'restored.db')
+    backup.restore(backups, target)
+    assert _count(target) == 120
+
+    until, expected = marks[4]
+    backup.restore(backups, target, until=until)
+    assert _count(target) == expected
+
+
+def test_restore_refuses_a_database_that_fails_verification(tmp_path):
+    path, backups = str(tmp_path / 'live.db'), str(tmp_path / 'backups')
+    conn = _source(path)
+    conn.executescript("""
+    CREATE TABLE parents (id INTEGER PRIMARY KEY);
+    CREATE TABLE children (parent_id INTEGER REFERENCES parents (id));
+    INSERT INTO children VALUES (42);
+    """)
+    backup.create_generation(path, backups)
+
+    target = str(tmp_path / 'restored.db')
+    with open(target, 'w') as f:
+        f.write('untouched')
+    try:
+        backup.restore(backups, target)
+    except backup.BackupError as e:
+        assert 'foreign key' in str(e)
+    else:
+        raise AssertionError("restore should have failed")
+    with open(target) as f:
+        assert f.read() == 'untouched'
+
+
+def test_prune_keeps_newest_generations(tmp_path):
+    path, backups = str(tmp_path / 'live.db'), str(tmp_path / 'backups')
+    _source(path)
+    created = [os.path.basename(backup.create_generation(path, backups)) for _ in range(4)]
+
+    assert backup.prune(backups, keep=2) == created[:2]
+    assert [g['id'] for g in backup.generations(backups)] == created[2:]
+
+
+def test_backup_job(client, db_path, job_runner):
+    response = client.post('/api/jobs', json={'type': 'backup', 'params': {'keep': 1}})
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('succeeded', 'failed'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'succeeded', job
+    backups = os.path.join(os.path.dirname(db_path), 'backups')
+    assert [g['id'] for g in backup.generations(backups)] == [job['result']['generation']]
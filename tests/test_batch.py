@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the /api/batch endpoint
+"""
+import batch
+import metrics
+
+
+def test_mixed_batch_returns_ordered_responses(client):
+    trope_id = client.get('/api/tropes?fields=name').get_json()['tropes'][0]['id']
+    data = client.post('/api/batch', json={'requests': [
+        {'method': 'GET', 'path': f'/api/tropes/{trope_id}'},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Batched Work', 'type': 'Film'}},
+        {'method': 'GET', 'path': '/api/works?search=Batched'},
+        {'method': 'GET', 'path': '/api/tropes/missing'},
+    ]}).get_json()
+
+    statuses = [item['status'] for item in data['responses']]
+    assert statuses == [200, 201, 200, 404]
+    assert data['responses'][0]['body']['id'] == trope_id
+    assert data['responses'][2]['body']['works'][0]['title'] == 'Batched Work'
+    assert all(item['duration_ms'] >= 0 for item in data['responses'])
+    assert data['committed'] is True
+
+
+def test_atomic_batch_rolls_back_on_failure(client):
+    before = client.get('/api/works').get_json()['total']
+    data = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Atomic One', 'type': 'Novel'}},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': '', 'type': 'Novel'}},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Atomic Three', 'type': 'Novel'}},
+    ]}).get_json()
+
+    assert [item['status'] for item in data['responses']] == [201, 400, None]
+    assert data['responses'][2]['skipped'] is True
+    assert data['committed'] is False
+    assert client.get('/api/works').get_json()['total'] == before
+
+
+def test_atomic_batch_commits_together(client):
+    data = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Atomic Pair A', 'type': 'Novel'}},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Atomic Pair B', 'type': 'Novel'}},
+    ]}).get_json()
+    assert data['committed'] is True
+    assert client.get('/api/works?search=Atomic Pair').get_json()['total'] == 2
+
+
+def test_write_batch_is_one_writer_operation(client):
+    before = metrics.snapshot()['counters'].get('writer.operations', 0)
+    data = client.post('/api/batch', json={'requests': [
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Writer Batch A', 'type': 'Novel'}},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': '', 'type': 'Novel'}},
+        {'method': 'POST', 'path': '/api/works', 'body': {'title': 'Writer Batch B', 'type': 'Novel'}},
+    ]}).get_json()
+
+    assert [item['status'] for item in data['responses']] == [201, 400, 201]
+    assert metrics.snapshot()['counters']['writer.operations'] - before == 1
+    assert client.get('/api/works?search=Writer Batch').get_json()['total'] == 2
+
+
+def test_read_only_batch_skips_the_writer(client):
+    before = metrics.snapshot()['counters'].get('writer.operations', 0)
+    data = client.post('/api/batch', json={'requests': [{'path': '/api/categories'}] * 3}).get_json()
+    assert [item['status'] for item in data['responses']] == [200, 200, 200]
+    assert metrics.snapshot()['counters'].get('writer.operations', 0) == before
+
+
+def test_batch_limits(client):
+    assert client.post('/api/batch', json={'requests': []}).status_code == 400
+    too_many = [{'path': '/api/categories'}] * (batch.MAX_ITEMS + 1)
+    assert client.post('/api/batch', json={'requests': too_many}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/api/batch'}]}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/etc/passwd'}]}).status_code == 400
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests for the data island rendered into the home page
+"""
+import json
+import re
+
+import app as app_module
+
+ISLAND = re.compile(r'<script type="application/json" id="bootstrapData">(.*?)</script>', re.S)
+
+
+def island(client):
+    match = ISLAND.search(client.get('/').get_data(as_text=True))
+    return match.group(1)
+
+
+def test_home_page_embeds_the_api_responses(client):
+    # The first request initializes the database, which moves the data version
+    client.get('/api/categories')
+    data = json.loads(island(client))
+    assert data['tropes'] == client.get('/api/tropes').get_json()
+    assert data['categories'] == client.get('/api/categories').get_json()
+
+    # Unchanged data is served from the cached fragment
+    hits = app_module.bootstrap_cache.stats()['hits']
+    island(client)
+    assert app_module.bootstrap_cache.stats()['hits'] == hits + 1
+
+
+def test_island_follows_writes_and_cannot_close_its_script(client):
+    trope = json.loads(island(client))['tropes']['tropes'][0]
+    name = 'Rename </script><script>alert(1)</script>'
+    assert client.patch(f"/api/tropes/{trope['id']}", json={'name': name}).status_code == 200
+
+    text = island(client)
+    assert '</script>' not in text and '<script>' not in text
+    renamed = next(t for t in json.loads(text)['tropes']['tropes'] if t['id'] == trope['id'])
+    assert renamed['name'] == name
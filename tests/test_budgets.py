@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request query time budgets
+"""
+import sqlite3
+import time
+
+import pytest
+
+import budgets
+import metrics
+
+ENDLESS = """
+WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c)
+SELECT COUNT(*) FROM (SELECT x FROM c LIMIT 1000000000)
+"""
+
+
+def test_budget_interrupts_a_runaway_statement(monkeypatch):
+    monkeypatch.setitem(budgets.ROUTE_BUDGETS, 'search', 0.05)
+    conn = budgets.install(sqlite3.connect(':memory:'))
+
+    budget = budgets.start('search')
+    started = time.perf_counter()
+    with pytest.raises(sqlite3.OperationalError, match='interrupted'):
+        conn.execute(ENDLESS).fetchone()
+    assert time.perf_counter() - started < 1
+    assert budgets.finish() is budget and budget['aborted']
+
+    # Outside a request there is no deadline
+    assert conn.execute('SELECT COUNT(*) FROM (SELECT 1 UNION ALL SELECT 2)').fetchone()[0] == 2
+    conn.close()
+
+
+def test_nested_budget_never_outlives_its_parent(monkeypatch):
+    monkeypatch.setitem(budgets.ROUTE_BUDGETS, 'run_batch', 0.01)
+    outer = budgets.start('run_batch')
+    inner = budgets.start('export_csv')
+    assert inner['deadline'] == outer['deadline']
+    budgets.finish()
+    budgets.finish()
+    assert budgets.current() is None
+
+
+def test_aborted_request_returns_503_and_is_counted(client, monkeypatch):
+    monkeypatch.setitem(budgets.ROUTE_BUDGETS, 'search', 0)
+    monkeypatch.setattr(budgets, 'PROGRESS_STEPS', 100)
+    metrics.reset()
+
+    response = client.get('/api/search?q=%25')
+    assert response.status_code == 503
+    assert response.get_json()['budget_ms'] == 0
+
+    assert client.get('/api/categories').status_code == 200
+    counters = client.get('/api/metrics').get_json()['counters']
+    assert counters['query_budget.aborts'] == 1
+    assert counters['query_budget.aborts.search'] == 1
+
+
+def test_batch_sub_requests_share_the_batch_deadline(client, monkeypatch):
+    monkeypatch.setitem(budgets.ROUTE_BUDGETS, 'run_batch', 0)
+    monkeypatch.setattr(budgets, 'PROGRESS_STEPS', 100)
+
+    response = client.post('/api/batch', json={'requests': [
+        {'method': 'GET', 'path': '/api/search?q=love'},
+    ]})
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['responses']] == [503]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight coalescing of identical GETs
+"""
+import threading
+import time
+
+import coalesce
+import metrics
+
+
+def test_concurrent_identical_requests_share_one_computation():
+    coalescer = coalesce.Coalescer()
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return (200, (), b'{"tropes": []}')
+
+    results = []
+    def request():
+        results.append(coalescer.run('key', compute))
+
+    threads = [threading.Thread(target=request)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=request) for _ in range(7)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert {result for result, _ in results} == {(200, (), b'{"tropes": []}')}
+    assert sorted(how for _, how in results) == ['computed'] + ['joined'] * 7
+
+
+def test_failures_are_not_shared_and_entries_expire():
+    metrics.reset()
+    coalescer = coalesce.Coalescer(ttl=0.05)
+    responses = iter([(500, [], b'error'), (200, [], b'first'), (200, [], b'second')])
+    ok = lambda result: result[0] == 200
+
+    assert coalescer.run('key', lambda: next(responses), ok) == ((500, [], b'error'), 'computed')
+    assert coalescer.run('key', lambda: next(responses), ok) == ((200, [], b'first'), 'computed')
+    assert coalescer.run('key', lambda: next(responses), ok) == ((200, [], b'first'), 'cached')
+    time.sleep(0.06)
+    assert coalescer.run('key', lambda: next(responses), ok) == ((200, [], b'second'), 'computed')
+    assert metrics.snapshot()['counters']['coalesce.cached'] == 1
+
+
+def test_commits_change_the_key(client):
+    # The first request initializes the database and is never shared
+    client.get('/api/categories')
+    first = client.get('/api/tropes?fields=name')
+    assert 'X-Coalesced' not in first.headers
+    again = client.get('/api/tropes?fields=name')
+    assert again.headers['X-Coalesced'] == 'cached'
+    assert again.data == first.data
+
+    trope_id = first.get_json()['tropes'][0]['id']
+    assert client.patch(f'/api/tropes/{trope_id}', json={'name': 'Coalesced Rename'}).status_code == 200
+    after = client.get('/api/tropes?fields=name')
+    assert 'X-Coalesced' not in after.headers
+    assert 'Coalesced Rename' in after.get_data(as_text=True)
+
+    # A different query string is a different request
+    assert 'X-Coalesced' not in client.get('/api/tropes?fields=name&limit=5').headers
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for response compression and precompressed static files
+"""
+import gzip
+import os
+import zlib
+
+from flask import Flask
+
+import app as app_module
+import compression
+
+
+def test_json_responses_are_compressed_when_accepted(client):
+    plain = client.get('/api/tropes')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = client.get('/api/tropes', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert int(compressed.headers['Content-Length']) == len(compressed.data)
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) * 3 < len(plain.data)
+
+    # Refused encodings and small bodies go out as they are
+    assert 'Content-Encoding' not in client.get('/api/tropes', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+    small = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.get_json()['status'] == 'ok'
+
+
+def test_generator_responses_are_compressed_chunk_by_chunk():
+    streaming = Flask(__name__)
+
+    @streaming.route('/rows')
+    def rows():
+        return (f"{i},row {i}\n" * 50 for i in range(20)), {'Content-Type': 'text/csv'}
+
+    streaming.wsgi_app = compression.Middleware(streaming.wsgi_app)
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/rows', 'SERVER_NAME': 'test', 'SERVER_PORT': '80',
+               'wsgi.url_scheme': 'http', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+    started = []
+    body = streaming(environ, lambda status, headers, exc_info=None: started.append(dict(headers)))
+    assert started[0]['Content-Encoding'] == 'gzip' and 'Content-Length' not in started[0]
+
+    # Every chunk can be decoded as soon as it arrives
+    decoder = zlib.decompressobj(31)
+    decoded = []
+    for chunk in body:
+        decoded.append(decoder.decompress(chunk))
+    body.close()
+    assert all(decoded[:20])
+    assert b''.join(decoded) == ''.join(f"{i},row {i}\n" * 50 for i in range(20)).encode()
+
+
+def test_static_files_are_served_from_precompressed_copies(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.app, 'static_folder', str(tmp_path))
+    source = tmp_path / 'site.css'
+    source.write_text('.trope { color: #333; }\n' * 200)
+
+    # Without a build the middleware still compresses the file per request
+    assert client.get('/static/site.css', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+
+    written, _ = compression.precompress(str(tmp_path))
+    assert str(source) + '.gz' in written
+    assert compression.precompress(str(tmp_path)) == ([], [])
+
+    response = client.get('/static/site.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Type'].startswith('text/css')
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.data == (tmp_path / 'site.css.gz').read_bytes()
+    assert client.get('/static/site.css').data == source.read_bytes()
+
+    # A copy older than its source is ignored until the next build
+    os.utime(source, (os.path.getmtime(source) + 10,) * 2)
+    stale = client.get('/static/site.css', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(stale.data) == source.read_bytes()
+    assert stale.data != (tmp_path / 'site.css.gz').read_bytes()
+
+    source.unlink()
+    assert compression.precompress(str(tmp_path)) == ([], [str(tmp_path / 'site.css.gz')])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for constraint-backed writes
+"""
+import sqlite3
+
+import pytest
+
+import app as app_module
+import constraints
+
+
+def _new_work(client, title):
+    response = client.post('/api/works', json={'title': title, 'type': 'Novel'})
+    assert response.status_code == 201
+    return response.get_json()['work']
+
+
+def test_duplicate_names_and_titles_are_rejected(client):
+    trope = client.get('/api/tropes?fields=name').get_json()['tropes'][0]
+    response = client.post('/api/tropes', json={
+        'name': trope['name'].upper(), 'description': 'Same name in a different case.'
+    })
+    assert response.status_code == 409
+
+    work = _new_work(client, 'Unique Title Test')
+    assert client.post('/api/works', json={'title': 'Unique Title Test', 'type': 'Film'}).status_code == 400
+    other = _new_work(client, 'Another Title Test')
+    response = client.put(f"/api/works/{other['id']}", json={'title': work['title']})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "A work with this title already exists"
+
+
+def test_partial_work_update_keeps_other_fields(client):
+    work = client.post('/api/works', json={
+        'title': 'Partial Update Test', 'type': 'Film', 'year': 1999, 'author': 'Someone'
+    }).get_json()['work']
+
+    updated = client.put(f"/api/works/{work['id']}", json={'year': 2001}).get_json()['work']
+    assert (updated['title'], updated['type'], updated['year'], updated['author']) == \
+        ('Partial Update Test', 'Film', 2001, 'Someone')
+    assert client.put('/api/works/missing', json={'year': 2001}).status_code == 404
+
+
+def test_example_foreign_keys_map_to_not_found(client):
+    trope_id = client.get('/api/tropes?fields=name').get_json()['tropes'][0]['id']
+    work = _new_work(client, 'Foreign Key Test')
+    base = {'trope_id': trope_id, 'work_id': work['id'], 'description': 'A fine example.'}
+
+    response = client.post('/api/examples', json=dict(base, trope_id='missing'))
+    assert (response.status_code, response.get_json()['error']) == (400, "Trope not found")
+    response = client.post('/api/examples', json=dict(base, work_id='missing'))
+    assert (response.status_code, response.get_json()['error']) == (400, "Work not found")
+
+    example = client.post('/api/examples', json=base).get_json()['example']
+    assert client.post('/api/examples', json=base).status_code == 400
+    response = client.put(f"/api/examples/{example['id']}", json={'work_id': 'missing'})
+    assert response.get_json()['error'] == "Work not found"
+    assert client.put('/api/examples/missing', json={'description': 'Nothing here.'}).status_code == 404
+
+
+def test_deletes_cascade_through_foreign_keys(client, db_path):
+    trope_id = client.get('/api/tropes?fields=name').get_json()['tropes'][0]['id']
+    work = _new_work(client, 'Cascade Test')
+    client.post('/api/examples', json={
+        'trope_id': trope_id, 'work_id': work['id'], 'description': 'Cascades away.'
+    })
+
+    response = client.delete(f"/api/works/{work['id']}")
+    assert response.get_json()['deleted_examples'] == 1
+    assert client.delete(f"/api/works/{work['id']}").status_code == 404
+
+    client.post('/api/examples', json={
+        'trope_id': trope_id, 'work_id': _new_work(client, 'Cascade Test 2')['id'],
+        'description': 'Goes with the trope.'
+    })
+    assert client.delete(f'/api/tropes/{trope_id}').status_code == 200
+    assert client.delete(f'/api/tropes/{trope_id}').status_code == 404
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM examples WHERE trope_pk NOT IN (SELECT pk FROM tropes)').fetchone()[0] == 0
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    conn.close()
+
+
+def test_connections_enforce_foreign_keys(db_path):
+    conn = app_module.open_db_connection()
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    conn.close()
+
+
+def test_duplicate_rows_stop_startup_and_keep_the_lookup_index(db_path):
+    conn = sqlite3.connect(db_path)
+    name = conn.execute('SELECT name FROM tropes ORDER BY name LIMIT 1').fetchone()[0]
+    conn.executescript("""
+    DROP INDEX idx_tropes_name_unique;
+    CREATE INDEX idx_tropes_name_lower ON tropes (LOWER(name));
+    """)
+    conn.execute("INSERT INTO tropes (id, name) VALUES ('dup', ?)", (name.upper(),))
+    conn.commit()
+
+    with pytest.raises(constraints.DuplicateRowsError, match='idx_tropes_name_unique'):
+        constraints.ensure_schema(conn)
+    assert constraints.duplicates(conn, 'tropes', 'LOWER(name)') == [(name.lower(), 2)]
+    # Case-insensitive lookups keep their index until the unique one replaces it
+    assert constraints.index_exists(conn, 'idx_tropes_name_lower')
+
+    conn.execute("DELETE FROM tropes WHERE id = 'dup'")
+    constraints.ensure_schema(conn)
+    assert constraints.index_exists(conn, 'idx_tropes_name_unique')
+    assert not constraints.index_exists(conn, 'idx_tropes_name_lower')
+    conn.close()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the trope co-occurrence graph
+"""
+import sqlite3
+
+import cooccurrence
+
+
+def _matrix(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        'SELECT trope_pk, other_trope_pk, count FROM trope_cooccurrence'
+    ).fetchall()
+    conn.close()
+    return sorted(rows)
+
+
+def _rebuilt_matrix(db_path):
+    conn = sqlite3.connect(db_path)
+    cooccurrence.rebuild(conn)
+    conn.commit()
+    conn.close()
+    return _matrix(db_path)
+
+
+def _trope_ids(client, count):
+    # Skip the first tropes, which the bundled examples already link together
+    tropes = client.get('/api/tropes').get_json()['tropes']
+    return [trope['id'] for trope in tropes if trope['example_count'] == 0][:count]
+
+
+def test_matrix_tracks_example_writes(client, db_path):
+    first, second, third = _trope_ids(client, 3)
+    work = client.post('/api/works', json={'title': 'Graph Test Novel', 'type': 'Novel'}).get_json()['work']
+
+    created = []
+    for trope_id in (first, second, third):
+        response = client.post('/api/examples', json={
+            'trope_id': trope_id, 'work_id': work['id'], 'description': 'Shows up in chapter one.'
+        })
+        created.append(response.get_json()['example'])
+    assert _matrix(db_path) == _rebuilt_matrix(db_path)
+
+    related = client.get(f'/api/tropes/{first}/cooccurring').get_json()['cooccurring']
+    assert {trope['id'] for trope in related} == {second, third}
+
+    other_trope = _trope_ids(client, 4)[3]
+    client.put(f"/api/examples/{created[1]['id']}", json={'trope_id': other_trope})
+    assert _matrix(db_path) == _rebuilt_matrix(db_path)
+
+    client.delete(f"/api/examples/{created[0]['id']}")
+    assert _matrix(db_path) == _rebuilt_matrix(db_path)
+    assert client.get(f'/api/tropes/{first}/cooccurring').get_json()['cooccurring'] == []
+
+
+def test_neighborhood_is_bounded(client):
+    trope_ids = _trope_ids(client, 6)
+    for index in range(3):
+        work = client.post('/api/works', json={'title': f'Chain Work {index}', 'type': 'Film'}).get_json()['work']
+        for trope_id in trope_ids[index:index + 2]:
+            client.post('/api/examples', json={
+                'trope_id': trope_id, 'work_id': work['id'], 'description': 'Linked for the chain.'
+            })
+
+    graph = client.get(f'/api/tropes/{trope_ids[0]}/neighborhood?depth=2').get_json()
+    assert {node['id']: node['depth'] for node in graph['nodes']} == {
+        trope_ids[0]: 0, trope_ids[1]: 1, trope_ids[2]: 2
+    }
+
+    limited = client.get(f'/api/tropes/{trope_ids[0]}/neighborhood?depth=3&limit=2').get_json()
+    assert len(limited['nodes']) == 2
+    assert limited['truncated'] is True
+
+
+def test_unknown_trope_returns_404(client):
+    assert client.get('/api/tropes/missing/cooccurring').status_code == 404
+    assert client.get('/api/tropes/missing/neighborhood').status_code == 404
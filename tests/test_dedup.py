@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for near-duplicate trope detection
+"""
+import sqlite3
+
+import dedup
+
+
+def test_normalized_names_share_signature():
+    first = dedup.minhash(dedup.name_shingles("Enemies to Lovers"))
+    second = dedup.minhash(dedup.name_shingles("Enemies-to-Lovers"))
+    assert dedup.estimate_similarity(first, second) == 1.0
+
+
+def test_create_reports_possible_duplicates(client):
+    response = client.post('/api/tropes', json={
+        'name': 'Enemies-To-Lovers',
+        'description': 'Rivals slowly realise they have fallen for each other.'
+    })
+    assert response.status_code == 201
+    names = [trope['name'] for trope in response.get_json()['possible_duplicates']]
+    assert 'Enemies to Lovers' in names
+
+
+def test_index_follows_update_and_delete(client, db_path):
+    created = client.post('/api/tropes', json={
+        'name': 'Completely Unique Premise',
+        'description': 'A description that matches nothing else in the catalogue.'
+    }).get_json()['trope']
+
+    client.put(f"/api/tropes/{created['id']}", json={
+        'name': 'Zephyr Quill Paradox',
+        'description': 'A description that matches nothing else in the catalogue.'
+    })
+    conn = sqlite3.connect(db_path)
+    matches = dedup.find_similar(conn, 'Zephyr-Quill Paradox', '', threshold=0.9)
+    assert [match['id'] for match in matches] == [created['id']]
+
+    client.delete(f"/api/tropes/{created['id']}")
+    remaining = conn.execute(
+        'SELECT COUNT(*) FROM trope_lsh_buckets WHERE trope_id = ?', (created['id'],)
+    ).fetchone()[0]
+    conn.close()
+    assert remaining == 0
+
+
+def test_duplicates_report_clusters_catalogue(client):
+    client.post('/api/tropes', json={
+        'name': 'Fake-Relationship',
+        'description': 'Two people pretend to be a couple and catch real feelings.'
+    })
+    report = client.get('/api/tropes/duplicates').get_json()
+    clusters = [sorted(t['name'] for t in c['tropes']) for c in report['clusters']]
+    assert any('Fake-Relationship' in names and len(names) >= 2 for names in clusters)
+
+
+def test_duplicates_report_rejects_bad_threshold(client):
+    assert client.get('/api/tropes/duplicates?threshold=2').status_code == 400
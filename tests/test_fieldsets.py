@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for sparse fieldsets and relationship expansion
+"""
+
+
+def test_trope_fields_are_projected(client):
+    full = client.get('/api/tropes').get_json()['tropes']
+    sparse = client.get('/api/tropes?fields=name,example_count').get_json()['tropes']
+
+    assert set(sparse[0]) == {'id', 'name', 'example_count'}
+    assert [(t['id'], t['example_count']) for t in sparse] == [(t['id'], t['example_count']) for t in full]
+
+
+def test_trope_expansions_are_batched_per_relationship(client):
+    tropes = client.get('/api/tropes?fields=name&expand=categories,examples,works').get_json()['tropes']
+    full = {t['id']: t for t in client.get('/api/tropes').get_json()['tropes']}
+
+    for trope in tropes:
+        if trope['id'] is None:
+            continue
+        expected = full[trope['id']]
+        assert sorted(c['name'] for c in trope['categories']) == sorted(expected['categories'])
+        assert len(trope['examples']) == expected['example_count']
+        assert len({w['id'] for w in trope['works']}) == expected['work_count']
+
+
+def test_example_fields_and_expansion(client):
+    full = client.get('/api/examples').get_json()['examples']
+    sparse = client.get('/api/examples?fields=description&expand=trope,work').get_json()['examples']
+
+    assert set(sparse[0]) == {'id', 'description', 'trope', 'work'}
+    by_id = {e['id']: e for e in full}
+    for example in sparse:
+        assert example['trope']['name'] == by_id[example['id']]['trope_name']
+        assert example['work']['title'] == by_id[example['id']]['work_title']
+
+
+def test_work_fields_expansion_and_errors(client):
+    works = client.get('/api/works?fields=title&expand=tropes').get_json()['works']
+    assert set(works[0]) == {'id', 'title', 'tropes'}
+
+    assert client.get('/api/tropes?fields=name,secret').status_code == 400
+    assert client.get('/api/works?expand=categories').status_code == 400
+    assert client.get('/api/examples?fields=trope_name&sort=work_title&search=a').status_code == 200
+
+
+def test_detail_endpoints_accept_fields_and_expand(client):
+    trope = client.get('/api/tropes').get_json()['tropes'][0]
+    detail = client.get(f"/api/tropes/{trope['id']}?fields=name&expand=categories")
+
+    assert detail.status_code == 200
+    assert detail.headers.get('ETag')
+    assert set(detail.get_json()) == {'id', 'name', 'categories'}
+    assert client.get(f"/api/tropes/{trope['id']}").get_json()['name'] == trope['name']
+
+    work = client.get('/api/works').get_json()['works'][0]
+    body = client.get(f"/api/works/{work['id']}?fields=title&expand=tropes").get_json()
+    assert body['title'] == work['title']
+    linked = client.get(f"/api/works/{work['id']}/tropes").get_json()['tropes']
+    assert sorted(t['id'] for t in body['tropes']) == sorted(t['id'] for t in linked)
+
+    assert client.get('/api/works/missing?fields=title').status_code == 404
+    assert client.get(f"/api/tropes/{trope['id']}?fields=nope").status_code == 400
+
+
+def test_sub_collections_accept_fields_and_expand(client):
+    trope = next(t for t in client.get('/api/tropes').get_json()['tropes'] if t['work_count'])
+    plain = client.get(f"/api/tropes/{trope['id']}/works").get_json()
+    sparse = client.get(f"/api/tropes/{trope['id']}/works?fields=title").get_json()
+
+    assert [w['id'] for w in sparse['works']] == [w['id'] for w in plain['works']]
+    assert set(sparse['works'][0]) == {'id', 'title'}
+    assert sparse['work_count'] == plain['work_count']
+
+    work_id = sparse['works'][0]['id']
+    plain = client.get(f"/api/works/{work_id}/tropes").get_json()
+    sparse = client.get(f"/api/works/{work_id}/tropes?fields=name&expand=categories").get_json()
+    assert [t['id'] for t in sparse['tropes']] == [t['id'] for t in plain['tropes']]
+    assert set(sparse['tropes'][0]) == {'id', 'name', 'categories'}
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job runner
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import app as app_module
+import jobs
+
+
+def _wait_for(client, job_id, status='succeeded', timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] == status:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not reach {status}: {job}')
+
+
+def test_export_job_produces_downloadable_csv(client, job_runner):
+    response = client.post('/api/jobs', json={'type': 'export_csv'})
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+
+    job = _wait_for(client, job_id)
+    assert job['artifact_url'] == f'/api/jobs/{job_id}/artifact'
+    assert job['result']['rows'] == job['progress']['total']
+
+    artifact = client.get(job['artifact_url'])
+    assert artifact.status_code == 200
+    lines = artifact.data.decode('utf-8').strip().splitlines()
+    assert lines[0] == 'id,name,description,categories'
+    assert len(lines) == job['result']['rows'] + 1
+
+
+def test_invalid_jobs_are_rejected(client):
+    assert client.post('/api/jobs', json={}).status_code == 400
+    assert client.post('/api/jobs', json={'type': 'reticulate_splines'}).status_code == 400
+    assert client.post('/api/jobs', json={'type': 'export_csv', 'params': [1]}).status_code == 400
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.get('/api/jobs?status=paused').status_code == 400
+
+
+def test_orphaned_running_job_is_recovered(client, db_path, job_runner):
+    client.get('/api/jobs')
+    stale = (datetime.now() - jobs.STALE_AFTER - timedelta(seconds=5)).isoformat()
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO jobs (id, type, status, params, attempts, owner, created_at, started_at, heartbeat_at)
+        VALUES ('orphan', 'rebuild_cooccurrence', 'running', '{}', 1, 'gone:1', ?, ?, ?)
+    """, (stale, stale, stale))
+    conn.commit()
+    conn.close()
+
+    job_runner.tick()
+
+    job = _wait_for(client, 'orphan')
+    assert job['attempts'] == 2
+    assert job['result']['pairs'] >= 0
+
+
+def test_concurrency_limit_per_type(db_path):
+    release = threading.Event()
+    runner = jobs.JobRunner(
+        connect=app_module.open_db_connection,
+        artifact_dir=lambda database: database + '.jobs',
+        max_workers=3
+    )
+    runner.register('slow', lambda job: release.wait(10) and {}, concurrency=1)
+    runner.start(db_path)
+    try:
+        first = runner.submit('slow')
+        second = runner.submit('slow')
+        assert runner.get(first['id'])['status'] == 'running'
+        assert runner.get(second['id'])['status'] == 'queued'
+
+        release.set()
+        deadline = time.time() + 10
+        while time.time() < deadline and runner.get(second['id'])['status'] != 'succeeded':
+            time.sleep(0.05)
+        assert runner.get(second['id'])['status'] == 'succeeded'
+    finally:
+        release.set()
+        runner.stop()
+
+
+def test_runner_stays_on_the_database_it_was_started_with(db_path, tmp_path, monkeypatch):
+    runner = jobs.JobRunner(connect=app_module.open_db_connection, artifact_dir=lambda database: None)
+    runner.register('noop', lambda job: {})
+    runner.start(db_path)
+    ticker = runner._ticker
+    try:
+        elsewhere = tmp_path / 'elsewhere.db'
+        monkeypatch.setattr(app_module, 'DB_PATH', str(elsewhere))
+        job = runner.submit('noop')
+        runner.tick()
+        assert not elsewhere.exists()
+        assert runner.get(job['id'])['type'] == 'noop'
+    finally:
+        runner.stop()
+    assert not ticker.is_alive()
+
+
+def test_ticks_during_dispatch_do_not_rerun_jobs(db_path):
+    runs = []
+    runner = jobs.JobRunner(connect=app_module.open_db_connection, artifact_dir=lambda database: None)
+    runner.register('count', lambda job: runs.append(job.id) or {}, concurrency=4)
+    runner.start(db_path)
+    stop = threading.Event()
+
+    def keep_ticking():
+        while not stop.is_set():
+            runner.tick()
+
+    ticker = threading.Thread(target=keep_ticking)
+    ticker.start()
+    try:
+        ids = [runner.submit('count')['id'] for _ in range(20)]
+        deadline = time.time() + 10
+        while time.time() < deadline and any(runner.get(i)['status'] != 'succeeded' for i in ids):
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        ticker.join()
+        runner.stop()
+    assert sorted(runs) == sorted(ids)
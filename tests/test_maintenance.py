@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for scheduled database maintenance
+"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import app as app_module
+import jobs
+import maintenance
+
+
+def _bloated(path, rows=2000, keep=100):
+    """A database with auto_vacuum off and most of its pages on the freelist"""
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (n INTEGER PRIMARY KEY, pad BLOB)')
+    conn.executemany('INSERT INTO items (pad) VALUES (randomblob(1000))', [()] * rows)
+    conn.commit()
+    conn.execute('DELETE FROM items WHERE n > ?', (keep,))
+    conn.commit()
+    return conn
+
+
+def test_incremental_vacuum_switches_mode_and_releases_pages(tmp_path):
+    conn = _bloated(str(tmp_path / 'bloated.db'))
+    assert maintenance.database_stats(conn)['auto_vacuum'] == 'none'
+
+    result = maintenance.run_task(conn, 'incremental_vacuum')
+    assert result['enabled_incremental'] and not result['interrupted']
+    assert maintenance.database_stats(conn)['auto_vacuum'] == 'incremental'
+
+    conn.executemany('INSERT INTO items (pad) VALUES (randomblob(1000))', [()] * 1000)
+    conn.execute('DELETE FROM items')
+    conn.commit()
+    free = maintenance.database_stats(conn)['free_pages']
+    assert free > 200
+
+    # No time left: nothing released, reported as interrupted
+    assert maintenance.run_task(conn, 'incremental_vacuum', seconds=0)['interrupted']
+    result = maintenance.incremental_vacuum(conn, 5, pages=16, pause=0)
+    assert result['released_pages'] == free
+    assert result['free_pages'] == 0 and not result['interrupted']
+    conn.close()
+
+
+def test_tasks_give_up_when_out_of_time_or_locked_out(tmp_path):
+    path = str(tmp_path / 'bloated.db')
+    conn = _bloated(path, rows=20000, keep=20000)
+
+    assert maintenance.quick_check(conn, 0) == {'interrupted': True, 'ok': None}
+    # The check is a single step; the timer interrupts it part way
+    assert maintenance.quick_check(conn, 0.001) == {'interrupted': True, 'ok': None}
+    assert maintenance.quick_check(conn, 5) == {'interrupted': False, 'ok': True, 'problems': []}
+
+    # Another connection holds the write lock: ANALYZE waits BUSY_MS, then stops
+    holder = sqlite3.connect(path)
+    holder.execute('BEGIN IMMEDIATE')
+    started = time.perf_counter()
+    assert maintenance.analyze(conn, 5) == {'interrupted': True}
+    assert time.perf_counter() - started < 1
+    holder.rollback()
+    assert maintenance.analyze(conn, 5) == {'interrupted': False, 'tables': 1}
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    holder.close()
+    conn.close()
+
+
+def test_scheduled_jobs_are_queued_once_per_interval(db_path):
+    conn = app_module.open_db_connection()
+    conn.close()
+    runner = jobs.JobRunner(connect=app_module.open_db_connection, artifact_dir=lambda database: None)
+    runner.register('noop', lambda job: {})
+    runner.schedule('noop', timedelta(hours=1))
+
+    def queued():
+        conn = app_module.open_db_connection()
+        count = conn.execute("SELECT COUNT(*) FROM jobs WHERE type = 'noop'").fetchone()[0]
+        conn.close()
+        return count
+
+    runner.tick()
+    assert queued() == 0  # not due until one interval after start
+
+    runner._started_at = datetime.now() - timedelta(hours=2)
+    runner.tick()
+    runner.tick()
+    assert queued() == 1
+    assert runner.last('noop')['status'] == 'queued'
+
+
+def test_maintenance_endpoint_reports_sizes_and_last_runs(client, db_path, job_runner):
+    response = client.post('/api/jobs', json={'type': 'maintenance_quick_check'})
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('succeeded', 'failed'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'succeeded', job
+
+    body = client.get('/api/maintenance').get_json()
+    assert body['database']['file_bytes'] > 0
+    assert body['database']['wal_bytes'] >= 0
+    assert set(body['tasks']) == set(maintenance.TASKS)
+    last = body['tasks']['quick_check']['last_run']
+    assert last['id'] == job_id and last['result']['ok'] is True
+    assert body['tasks']['analyze']['last_run'] is None
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-get by id
+"""
+import multiget
+
+
+def test_ids_are_returned_in_request_order_with_misses(client):
+    tropes = client.get('/api/tropes?fields=name').get_json()['tropes']
+    wanted = [tropes[7]['id'], 'missing-1', tropes[2]['id'], tropes[7]['id']]
+
+    data = client.get('/api/tropes?ids=' + ','.join(wanted)).get_json()
+    assert [t['id'] for t in data['tropes']] == [tropes[7]['id'], tropes[2]['id']]
+    assert data['not_found'] == ['missing-1']
+    assert 'categories' in data['tropes'][0]
+
+
+def test_post_lookup_chunks_long_lists(client, monkeypatch):
+    monkeypatch.setattr(multiget.fieldsets, 'CHUNK_SIZE', 2)
+    works = client.get('/api/works?fields=title').get_json()['works']
+    ids = [w['id'] for w in reversed(works)]
+
+    data = client.post('/api/works/lookup', json={'ids': ids, 'fields': ['title']}).get_json()
+    assert [w['id'] for w in data['works']] == ids
+    assert set(data['works'][0]) == {'id', 'title'}
+
+
+def test_examples_lookup_with_expansion(client):
+    examples = client.get('/api/examples').get_json()['examples']
+    data = client.post('/api/examples/lookup', json={
+        'ids': [e['id'] for e in examples], 'fields': 'description', 'expand': 'work'
+    }).get_json()
+    assert [e['work']['title'] for e in data['examples']] == [e['work_title'] for e in examples]
+    assert 'work_id' not in data['examples'][0]
+
+
+def test_invalid_id_lists(client):
+    assert client.get('/api/tropes?ids=').status_code == 400
+    assert client.post('/api/works/lookup', json={'ids': [1, 2]}).status_code == 400
+    assert client.post('/api/works/lookup', json={}).status_code == 400
+    too_many = ','.join(str(i) for i in range(multiget.MAX_IDS + 1))
+    assert client.get(f'/api/examples?ids={too_many}').status_code == 400
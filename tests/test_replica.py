@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for read replicas served from published snapshots
+"""
+import json
+import os
+import sqlite3
+
+import app as app_module
+import replica
+
+
+def _primary_trope_name(db_path, trope_id):
+    conn = sqlite3.connect(db_path)
+    name = conn.execute('SELECT name FROM tropes WHERE id = ?', (trope_id,)).fetchone()[0]
+    conn.close()
+    return name
+
+
+def _as_replica(client, db_path, tmp_path, monkeypatch):
+    """Publish the (migrated) primary and switch the app to replica mode"""
+    client.get('/api/tropes?limit=1')
+    replica_dir = str(tmp_path / 'replica')
+    publisher = replica.Publisher(db_path, replica_dir, interval=0.01)
+    publisher.poll()
+    monkeypatch.setattr(app_module, 'REPLICA_DIR', replica_dir)
+    return publisher, replica_dir
+
+
+def test_replica_serves_reads_and_refuses_writes(client, db_path, tmp_path, monkeypatch):
+    publisher, replica_dir = _as_replica(client, db_path, tmp_path, monkeypatch)
+
+    response = client.get('/api/tropes?fields=name')
+    assert response.status_code == 200
+    assert response.headers['X-Replica-Snapshot'] == replica.read_manifest(replica_dir)['snapshot']
+    assert float(response.headers['X-Replica-Lag']) < 5
+    trope_id = response.get_json()['tropes'][0]['id']
+
+    lookup = client.post('/api/tropes/lookup', json={'ids': [trope_id]})
+    assert lookup.status_code == 200
+
+    refused = client.patch(f'/api/tropes/{trope_id}', json={'description': 'changed'})
+    assert refused.status_code == 403
+    batch = client.post('/api/batch', json={'requests': [
+        {'method': 'GET', 'path': f'/api/tropes/{trope_id}'},
+        {'method': 'DELETE', 'path': f'/api/tropes/{trope_id}'},
+    ]})
+    assert [r['status'] for r in batch.get_json()['responses']] == [200, 403]
+
+    monkeypatch.setattr(app_module, 'PRIMARY_URL', 'http://primary:8000/')
+    forwarded = client.post('/api/works?notify=1', json={'title': 'New'})
+    assert forwarded.status_code == 307
+    assert forwarded.headers['Location'] == 'http://primary:8000/api/works?notify=1'
+
+    # Nothing was written next to the snapshot
+    assert sorted(os.listdir(replica_dir)) == sorted([replica.MANIFEST, replica.read_manifest(replica_dir)['snapshot']])
+    publisher.close()
+
+
+def test_new_snapshot_is_picked_up_without_breaking_open_connections(client, db_path, tmp_path, monkeypatch):
+    publisher, replica_dir = _as_replica(client, db_path, tmp_path, monkeypatch)
+    trope_id = client.get('/api/tropes?fields=name').get_json()['tropes'][0]['id']
+    old_name = _primary_trope_name(db_path, trope_id)
+    first = publisher.poll()['snapshot']
+
+    # A request still running on the first snapshot
+    in_flight = app_module.open_db_connection()
+
+    primary = sqlite3.connect(db_path)
+    primary.execute("UPDATE tropes SET name = 'Renamed On Primary' WHERE id = ?", (trope_id,))
+    primary.commit()
+    primary.close()
+    second = publisher.poll()['snapshot']
+    assert second != first
+    # Unchanged primary: same snapshot, fresher checked_at
+    assert publisher.poll()['snapshot'] == second
+    replica.retire(replica_dir, keep=0, after=0)
+    assert not os.path.exists(os.path.join(replica_dir, first))
+
+    detail = client.get(f'/api/tropes/{trope_id}')
+    assert detail.headers['X-Replica-Snapshot'] == second
+    assert detail.get_json()['name'] == 'Renamed On Primary'
+    row = in_flight.execute('SELECT name FROM tropes WHERE id = ?', (trope_id,)).fetchone()
+    assert row['name'] == old_name
+    in_flight.close()
+    publisher.close()
+
+
+def test_stale_replica_stops_serving(client, db_path, tmp_path, monkeypatch):
+    publisher, replica_dir = _as_replica(client, db_path, tmp_path, monkeypatch)
+    manifest = replica.read_manifest(replica_dir)
+    manifest['checked_at'] -= replica.MAX_LAG + 1
+    with open(os.path.join(replica_dir, replica.MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+    response = client.get('/api/tropes')
+    assert response.status_code == 503
+    assert 'behind the primary' in response.get_json()['error']
+    assert response.headers['Retry-After']
+
+    publisher.poll()
+    assert client.get('/api/tropes').status_code == 200
+    publisher.close()
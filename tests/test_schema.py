@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for core schema migrations
+"""
+import sqlite3
+
+import pytest
+
+import app as app_module
+import schema
+
+
+def _table_sql(conn, name):
+    return conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()[0]
+
+
+def test_migration_moves_to_integer_keys(unmigrated_db):
+    conn = sqlite3.connect(unmigrated_db)
+    assert schema.user_version(conn) == 0
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('tropes', 'categories', 'works', 'examples', 'trope_categories')}
+    links = sorted(conn.execute('SELECT trope_id, category_id FROM trope_categories'))
+    examples = sorted(conn.execute('SELECT id, trope_id, work_id FROM examples'))
+    work_types = sorted(conn.execute('SELECT id, type FROM works'))
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION == 3
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+
+    assert counts == {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in counts}
+    assert sorted(conn.execute("""
+        SELECT t.id, c.id FROM trope_categories tc
+        JOIN tropes t ON t.pk = tc.trope_pk
+        JOIN categories c ON c.pk = tc.category_pk
+    """)) == links
+    assert sorted(conn.execute("""
+        SELECT e.id, t.id, w.id FROM examples e
+        JOIN tropes t ON t.pk = e.trope_pk
+        JOIN works w ON w.pk = e.work_pk
+    """)) == examples
+    assert sorted(conn.execute(
+        'SELECT w.id, wt.name FROM works w JOIN work_types wt ON wt.id = w.type_id'
+    )) == work_types
+
+    # Public ids are kept, and rows stored without one are given one
+    for table in ('tropes', 'categories', 'works', 'examples'):
+        assert conn.execute(f'SELECT COUNT(*) FROM {table} WHERE id IS NULL').fetchone()[0] == 0
+    assert [name for _, name in conn.execute('SELECT id, name FROM work_types ORDER BY id')] == sorted(schema.WORK_TYPES)
+
+    for table in ('trope_categories', 'examples'):
+        assert 'WITHOUT ROWID' in _table_sql(conn, table)
+    for table in ('tropes', 'categories', 'works'):
+        assert 'pk INTEGER PRIMARY KEY' in _table_sql(conn, table)
+    indexes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'trope_categories'"
+    )}
+    assert indexes == {'idx_trope_categories_category_pk'}
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    conn.close()
+
+
+def test_migration_logs_and_drops_orphans(unmigrated_db, caplog):
+    conn = sqlite3.connect(unmigrated_db)
+    work_id = conn.execute('SELECT id FROM works LIMIT 1').fetchone()[0]
+    category_id = conn.execute('SELECT id FROM categories LIMIT 1').fetchone()[0]
+    conn.execute(
+        "INSERT INTO examples (id, trope_id, work_id, description, created_at, updated_at) "
+        "VALUES ('orphan-example', 'deleted-trope', ?, 'An example of nothing', 'now', 'now')",
+        (work_id,)
+    )
+    conn.execute("INSERT INTO trope_categories (trope_id, category_id) VALUES ('deleted-trope', ?)", (category_id,))
+    conn.commit()
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('tropes', 'categories', 'works', 'examples', 'trope_categories')}
+
+    with caplog.at_level('WARNING', logger='schema'):
+        assert schema.migrate(conn) == schema.SCHEMA_VERSION
+
+    dropped = [record.getMessage() for record in caplog.records]
+    assert dropped == [
+        f'Dropping trope_categories row deleted-trope/{category_id}: it refers to a missing parent',
+        'Dropping examples row orphan-example: it refers to a missing parent',
+    ]
+    counts['examples'] -= 1
+    counts['trope_categories'] -= 1
+    assert counts == {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in counts}
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    conn.close()
+
+
+def test_migration_aborts_on_unexplained_row_loss(unmigrated_db):
+    conn = sqlite3.connect(unmigrated_db)
+    # A work type outside the lookup table has no type_id to migrate to
+    conn.execute('PRAGMA ignore_check_constraints=ON')
+    conn.execute("UPDATE works SET type = 'Poem' WHERE rowid = (SELECT MIN(rowid) FROM works)")
+    conn.commit()
+    conn.execute('PRAGMA ignore_check_constraints=OFF')
+    works = conn.execute('SELECT COUNT(*) FROM works').fetchone()[0]
+
+    with pytest.raises(sqlite3.IntegrityError, match='would lose 1 works rows'):
+        schema.migrate(conn)
+
+    # Version 2 was committed; the version 3 step left the old tables alone
+    assert schema.user_version(conn) == 2
+    assert 'type' in schema.columns(conn, 'works')
+    assert conn.execute('SELECT COUNT(*) FROM works').fetchone()[0] == works
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'works_v3'").fetchone() is None
+    conn.close()
+
+
+def test_app_migrates_and_keeps_link_triggers(client, db_path):
+    trope_id = client.get('/api/tropes?fields=name').get_json()['tropes'][0]['id']
+    category_id = client.get('/api/categories').get_json()['categories'][0]['id']
+    before = client.get(f'/api/tropes/{trope_id}').get_json()
+
+    response = client.patch(f'/api/tropes/{trope_id}', json={'category_ids': [category_id]})
+    assert response.status_code == 200
+
+    detail = client.get(f'/api/tropes/{trope_id}')
+    assert detail.headers['X-Cache'] == 'MISS'
+    assert [c['id'] for c in detail.get_json()['categories']] == [category_id]
+    assert detail.get_json()['version'] == before['version'] + 1
+
+    conn = app_module.open_db_connection()
+    assert schema.user_version(conn) == schema.SCHEMA_VERSION
+    conn.close()
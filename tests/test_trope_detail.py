@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-query trope detail payloads and their cache
+"""
+import app as app_module
+
+
+def _trope_with_examples(client):
+    tropes = client.get('/api/tropes').get_json()['tropes']
+    return next(t for t in tropes if t['example_count'] > 0)
+
+
+def test_detail_payload_shape(client):
+    trope = _trope_with_examples(client)
+    detail = client.get(f"/api/tropes/{trope['id']}").get_json()
+
+    assert detail['id'] == trope['id']
+    assert detail['stats']['example_count'] == len(detail['examples']) == trope['example_count']
+    assert detail['stats']['work_count'] == len(detail['related_works'])
+    assert {w['id'] for w in detail['related_works']} == {e['work']['id'] for e in detail['examples']}
+    assert all(c['name'] == c['name'].replace('_', ' ').title() for c in detail['categories'])
+
+    works = client.get(f"/api/tropes/{trope['id']}/works").get_json()
+    assert works['trope_name'] == detail['name']
+    assert sum(len(w['examples']) for w in works['works']) == len(detail['examples'])
+
+
+def test_cache_hits_until_related_rows_change(client, monkeypatch):
+    # Repeat GETs must reach the view rather than the coalescer's finished responses
+    monkeypatch.setattr(app_module.request_coalescer, 'ttl', 0)
+    trope = _trope_with_examples(client)
+    url = f"/api/tropes/{trope['id']}"
+
+    client.get(url)
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+
+    # Editing a work used by one of the trope's examples invalidates it
+    work_id = client.get(url).get_json()['related_works'][0]['id']
+    client.put(f'/api/works/{work_id}', json={'title': 'Renamed For Cache Test'})
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'Renamed For Cache Test' in {w['title'] for w in response.get_json()['related_works']}
+
+    # So does a new example
+    work = client.post('/api/works', json={'title': 'Cache Probe', 'type': 'Novel'}).get_json()['work']
+    client.post('/api/examples', json={'trope_id': trope['id'], 'work_id': work['id'], 'description': 'A fresh example.'})
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['stats']['example_count'] == trope['example_count'] + 1
+    assert client.get(f"{url}/works").get_json()['work_count'] == response.get_json()['stats']['work_count']
+
+
+def test_deleted_trope_is_not_served_from_cache(client):
+    trope = client.get('/api/tropes').get_json()['tropes'][5]
+    url = f"/api/tropes/{trope['id']}"
+    client.get(url)
+    client.delete(url)
+    assert client.get(url).status_code == 404
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for row versions, If-Match and PATCH
+"""
+import sqlite3
+
+
+def _trope(client):
+    return client.get('/api/tropes?fields=name').get_json()['tropes'][0]
+
+
+def test_if_match_rejects_stale_versions(client):
+    trope_id = _trope(client)['id']
+    response = client.get(f'/api/tropes/{trope_id}')
+    etag = response.headers['ETag']
+    assert etag == f'"{response.get_json()["version"]}"'
+
+    first = client.patch(f'/api/tropes/{trope_id}', json={'description': 'First concurrent edit wins.'},
+                         headers={'If-Match': etag})
+    assert first.status_code == 200
+    assert first.headers['ETag'] != etag
+
+    second = client.patch(f'/api/tropes/{trope_id}', json={'description': 'Second edit is stale now.'},
+                          headers={'If-Match': etag})
+    assert second.status_code == 412
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert client.get(f'/api/tropes/{trope_id}').get_json()['description'] == 'First concurrent edit wins.'
+
+    assert client.patch('/api/tropes/missing', json={'description': 'Nobody home here.'},
+                        headers={'If-Match': etag}).status_code == 404
+    assert client.patch(f'/api/tropes/{trope_id}', json={'description': 'Any version will do.'},
+                        headers={'If-Match': '*'}).status_code == 200
+
+
+def test_patch_changes_only_supplied_fields(client):
+    trope = client.get(f"/api/tropes/{_trope(client)['id']}").get_json()
+    response = client.patch(f"/api/tropes/{trope['id']}", json={'description': 'Only the description changes.'})
+    updated = response.get_json()['trope']
+    assert updated['name'] == trope['name']
+    assert sorted(updated['category_ids']) == sorted(c['id'] for c in trope['categories'])
+    assert updated['version'] == trope['version'] + 1
+
+    # PUT still requires the full representation
+    assert client.put(f"/api/tropes/{trope['id']}", json={'description': 'No name given.'}).status_code == 400
+
+
+def test_category_diff_only_touches_changed_links(client, db_path):
+    categories = client.get('/api/categories').get_json()['categories']
+    trope_id = _trope(client)['id']
+    keep, drop, add = (c['id'] for c in categories[:3])
+    client.patch(f'/api/tropes/{trope_id}', json={'category_ids': [keep, drop]})
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+    CREATE TABLE link_log (op TEXT, category_id TEXT);
+    CREATE TRIGGER log_link_insert AFTER INSERT ON trope_categories
+    BEGIN INSERT INTO link_log SELECT 'insert', id FROM categories WHERE pk = NEW.category_pk; END;
+    CREATE TRIGGER log_link_delete AFTER DELETE ON trope_categories
+    BEGIN INSERT INTO link_log SELECT 'delete', id FROM categories WHERE pk = OLD.category_pk; END;
+    """)
+    conn.close()
+
+    response = client.patch(f'/api/tropes/{trope_id}', json={'category_ids': [keep, add, add]})
+    assert sorted(response.get_json()['trope']['category_ids']) == sorted([keep, add])
+
+    conn = sqlite3.connect(db_path)
+    assert sorted(conn.execute('SELECT op, category_id FROM link_log')) == [('delete', drop), ('insert', add)]
+    conn.close()
+
+    assert client.patch(f'/api/tropes/{trope_id}', json={'category_ids': ['missing']}).status_code == 400
+
+
+def test_works_and_examples_support_if_match(client):
+    work = client.post('/api/works', json={'title': 'Versioned Work', 'type': 'Novel'})
+    etag = work.headers['ETag']
+    work_id = work.get_json()['work']['id']
+    assert client.get(f'/api/works/{work_id}').headers['ETag'] == etag
+
+    assert client.patch(f'/api/works/{work_id}', json={'year': 2001}, headers={'If-Match': etag}).status_code == 200
+    assert client.put(f'/api/works/{work_id}', json={'year': 2002}, headers={'If-Match': etag}).status_code == 412
+
+    example = client.post('/api/examples', json={
+        'trope_id': _trope(client)['id'], 'work_id': work_id, 'description': 'A versioned example.'
+    })
+    example_id = example.get_json()['example']['id']
+    response = client.patch(f'/api/examples/{example_id}', json={'page_reference': 'p. 1'},
+                            headers={'If-Match': '"999"'})
+    assert response.status_code == 412
+    assert response.get_json()['version'] == 1
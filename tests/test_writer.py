@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-writer commit queue
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import app as app_module
+import metrics
+import writer
+
+
+def _coordinator(db_path):
+    def connect():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return writer.WriteCoordinator(connect=connect, database_key=lambda: db_path)
+
+
+def _insert_work(title):
+    def op():
+        writer.current_connection().execute(
+            "INSERT INTO works (id, title, type_id, created_at, updated_at) VALUES (?, ?, 1, 'now', 'now')",
+            (title, title)
+        )
+        return title
+    return op
+
+
+def test_concurrent_writes_are_group_committed(db_path, monkeypatch):
+    monkeypatch.setattr(writer, 'GROUP_WINDOW', 0.2)
+    coordinator = _coordinator(db_path)
+    before = metrics.snapshot()['counters'].get('writer.commits', 0)
+
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(coordinator.submit(_insert_work(f'Grouped {i}'))))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(f'Grouped {i}' for i in range(8))
+    assert metrics.snapshot()['counters']['writer.commits'] - before < 8
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM works WHERE title LIKE 'Grouped %'").fetchone()[0] == 8
+    conn.close()
+
+
+def test_failed_operation_only_rolls_back_itself(db_path, monkeypatch):
+    monkeypatch.setattr(writer, 'GROUP_WINDOW', 0.2)
+    coordinator = _coordinator(db_path)
+
+    def failing():
+        _insert_work('Doomed')()
+        raise RuntimeError('boom')
+
+    errors = []
+    kept = threading.Thread(target=lambda: coordinator.submit(_insert_work('Kept')))
+    kept.start()
+    try:
+        coordinator.submit(failing)
+    except RuntimeError as e:
+        errors.append(e)
+    kept.join()
+
+    assert len(errors) == 1
+    conn = sqlite3.connect(db_path)
+    titles = {row[0] for row in conn.execute("SELECT title FROM works WHERE title IN ('Kept', 'Doomed')")}
+    conn.close()
+    assert titles == {'Kept'}
+
+
+def test_busy_errors_are_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError('database is locked')
+        return 'done'
+
+    assert writer.with_busy_retry(flaky, backoff=0.001) == 'done'
+    with pytest.raises(sqlite3.OperationalError):
+        writer.with_busy_retry(lambda: (_ for _ in ()).throw(sqlite3.OperationalError('no such table: x')))
+
+
+def test_api_writes_report_metrics(client, db_path):
+    response = client.post('/api/works', json={'title': 'Metered', 'type': 'Novel'})
+    assert response.status_code == 201
+    assert client.post('/api/works', json={'title': '', 'type': 'Novel'}).status_code == 400
+
+    data = client.get('/api/metrics').get_json()
+    assert data['summaries']['writer.group_size']['count'] >= 1
+    assert 'writer.queue_depth' in data['gauges']
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+    assert app_module.write_coordinator.database_key() == db_path
+
+
+def test_timed_out_writes_are_cancelled_unless_started(db_path, monkeypatch):
+    monkeypatch.setattr(writer, 'WRITE_TIMEOUT', 0.1)
+    coordinator = _coordinator(db_path)
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return _insert_work('Slow')()
+
+    results = []
+    running = threading.Thread(target=lambda: results.append(coordinator.submit(slow)))
+    running.start()
+    time.sleep(0.05)
+    with pytest.raises(writer.WriteTimeout):
+        coordinator.submit(_insert_work('Queued'))
+    release.set()
+    running.join()
+
+    # The started write outlived the timeout and was still waited for
+    assert results == ['Slow']
+    assert coordinator.submit(_insert_work('After')) == 'After'
+    conn = sqlite3.connect(db_path)
+    titles = {row[0] for row in conn.execute("SELECT title FROM works WHERE title IN ('Slow', 'Queued', 'After')")}
+    conn.close()
+    assert titles == {'Slow', 'After'}
+
+
+def test_only_unapplied_writes_get_503(client, monkeypatch):
+    def busy(fn):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(app_module.write_coordinator, 'submit', busy)
+    response = client.post('/api/works', json={'title': 'Busy', 'type': 'Novel'})
+    assert response.status_code == 503
+    assert 'not applied' in response.get_json()['error']
+
+    def broken(fn):
+        raise RuntimeError('writer bug')
+    monkeypatch.setattr(app_module.write_coordinator, 'submit', broken)
+    with pytest.raises(RuntimeError, match='writer bug'):
+        client.post('/api/works', json={'title': 'Broken', 'type': 'Novel'})
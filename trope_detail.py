@@ -0,0 +1,255 @@
+"""
+Single-query trope detail payloads with a version-checked read-through cache.
+
+The detail and trope-works endpoints each load everything they need in one
+statement, nesting categories, examples and works with SQLite's JSON1
+aggregates instead of grouping rows in Python.
+
+`trope_versions` holds a counter per trope that triggers bump whenever the
+trope, its category links, a category it belongs to, any of its examples or a
+work one of those examples points at changes. Cached payloads remember the
+version they were built from, so a cache hit costs a single primary key lookup
+and a write from any worker invalidates exactly the affected tropes.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+import schema
+
+# Serialized payloads kept per worker process
+CACHE_SIZE = 512
+
+_BUMP = "ON CONFLICT (trope_pk) DO UPDATE SET version = version + 1"
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_tropes_update
+AFTER UPDATE ON tropes
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (NEW.pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_tropes_delete
+AFTER DELETE ON tropes
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (OLD.pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_trope_categories_insert
+AFTER INSERT ON trope_categories
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (NEW.trope_pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_trope_categories_delete
+AFTER DELETE ON trope_categories
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (OLD.trope_pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_categories_update
+AFTER UPDATE OF name ON categories
+WHEN NEW.name IS NOT OLD.name
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version)
+    SELECT trope_pk, 1 FROM trope_categories WHERE category_pk = NEW.pk {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_examples_insert
+AFTER INSERT ON examples
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (NEW.trope_pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_examples_update
+AFTER UPDATE ON examples
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (NEW.trope_pk, 1) {_BUMP};
+    INSERT INTO trope_versions (trope_pk, version)
+    SELECT OLD.trope_pk, 1 WHERE OLD.trope_pk IS NOT NEW.trope_pk {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_examples_delete
+AFTER DELETE ON examples
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version) VALUES (OLD.trope_pk, 1) {_BUMP};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_works_update
+AFTER UPDATE ON works
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version)
+    SELECT trope_pk, 1 FROM examples WHERE work_pk = NEW.pk {_BUMP};
+END;
+
+-- BEFORE so the examples are still there when deletes cascade
+CREATE TRIGGER IF NOT EXISTS trg_trope_versions_works_delete
+BEFORE DELETE ON works
+BEGIN
+    INSERT INTO trope_versions (trope_pk, version)
+    SELECT trope_pk, 1 FROM examples WHERE work_pk = OLD.pk {_BUMP};
+END;
+"""
+
+
+def ensure_schema(conn):
+    """Create the version table and its triggers"""
+    # Counters keyed by the public id predate schema version 3. Payloads are
+    # only cached by running processes, so the counters can start over.
+    if 'trope_id' in schema.columns(conn, 'trope_versions'):
+        conn.execute('DROP TABLE trope_versions')
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS trope_versions (
+        trope_pk INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    """ + _TRIGGERS)
+
+
+def current_version(conn, trope_id):
+    """Version counter for a trope; 0 if it has never changed, None if it does not exist"""
+    row = conn.execute(
+        'SELECT COALESCE(v.version, 0) FROM tropes t '
+        'LEFT JOIN trope_versions v ON v.trope_pk = t.pk WHERE t.id = ?',
+        (trope_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+_WORK_TYPE = "(SELECT name FROM work_types WHERE id = w.type_id)"
+_WORK_JSON = f"json_object('id', w.id, 'title', w.title, 'type', {_WORK_TYPE}, 'year', w.year, 'author', w.author)"
+
+_DETAIL_QUERY = f"""
+SELECT
+    t.id, t.name, t.description, t.version,
+    (SELECT json_group_array(json_object('id', c.id, 'name', c.name))
+     FROM trope_categories tc
+     JOIN categories c ON c.pk = tc.category_pk
+     WHERE tc.trope_pk = t.pk) AS categories_json,
+    (SELECT json_group_array(json(example))
+     FROM (SELECT json_object(
+               'id', e.id,
+               'description', e.description,
+               'page_reference', e.page_reference,
+               'created_at', e.created_at,
+               'work', {_WORK_JSON}) AS example
+           FROM examples e
+           JOIN works w ON w.pk = e.work_pk
+           WHERE e.trope_pk = t.pk
+           ORDER BY w.title, e.created_at)) AS examples_json,
+    (SELECT json_group_array(json(work))
+     FROM (SELECT {_WORK_JSON} AS work
+           FROM works w
+           WHERE w.pk IN (SELECT work_pk FROM examples WHERE trope_pk = t.pk)
+           ORDER BY w.title)) AS related_works_json,
+    (SELECT version FROM trope_versions WHERE trope_pk = t.pk) AS cache_version
+FROM tropes t
+WHERE t.id = ?
+"""
+
+_WORKS_QUERY = f"""
+SELECT
+    t.name,
+    (SELECT json_group_array(json(work))
+     FROM (SELECT json_object(
+               'id', w.id,
+               'title', w.title,
+               'type', {_WORK_TYPE},
+               'year', w.year,
+               'author', w.author,
+               'description', w.description,
+               'examples', (
+                   SELECT json_group_array(json(example))
+                   FROM (SELECT json_object(
+                             'id', e.id,
+                             'description', e.description,
+                             'page_reference', e.page_reference,
+                             'created_at', e.created_at) AS example
+                         FROM examples e
+                         WHERE e.trope_pk = t.pk AND e.work_pk = w.pk
+                         ORDER BY e.created_at))) AS work
+           FROM works w
+           WHERE w.pk IN (SELECT work_pk FROM examples WHERE trope_pk = t.pk)
+           ORDER BY w.title)) AS works_json,
+    (SELECT version FROM trope_versions WHERE trope_pk = t.pk) AS cache_version
+FROM tropes t
+WHERE t.id = ?
+"""
+
+
+def load_detail(conn, trope_id, format_category_name=None):
+    """(payload, version) for the trope detail endpoint, or (None, None)"""
+    row = conn.execute(_DETAIL_QUERY, (trope_id,)).fetchone()
+    if not row:
+        return None, None
+
+    result = {key: row[key] for key in row.keys()}
+    version = result.pop('cache_version') or 0
+    categories = json.loads(result.pop('categories_json'))
+    if format_category_name:
+        for category in categories:
+            category['name'] = format_category_name(category['name'])
+    result['categories'] = categories
+    result['examples'] = json.loads(result.pop('examples_json'))
+    result['related_works'] = json.loads(result.pop('related_works_json'))
+
+    # Add summary counts
+    result['stats'] = {
+        'example_count': len(result['examples']),
+        'work_count': len(result['related_works']),
+        'category_count': len(result['categories'])
+    }
+    return result, version
+
+
+def load_works(conn, trope_id):
+    """(payload, version) for the trope works endpoint, or (None, None)"""
+    row = conn.execute(_WORKS_QUERY, (trope_id,)).fetchone()
+    if not row:
+        return None, None
+
+    works = json.loads(row['works_json'])
+    return {
+        'trope_name': row['name'],
+        'trope_id': trope_id,
+        'works': works,
+        'work_count': len(works)
+    }, row['cache_version'] or 0
+
+
+class PayloadCache:
+    """Thread-safe LRU of serialized payloads tagged with the version they were built from"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Cached body if it was built from `version`, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
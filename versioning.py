@@ -0,0 +1,50 @@
+"""
+Row versions for optimistic concurrency.
+
+Tropes, works and examples carry a `version` column that every update bumps
+in the same statement that changes the row. Single-resource responses expose
+it as the ETag, and writes sent with `If-Match` only apply while the row is
+still at one of the listed versions, so a concurrent edit is reported as
+412 Precondition Failed instead of being silently overwritten.
+"""
+import json
+
+TABLES = ('tropes', 'works', 'examples')
+
+
+def ensure_schema(conn):
+    """Add the version column to tables created before it existed"""
+    for table in TABLES:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if 'version' not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+
+def expected_versions(if_match):
+    """Versions an `If-Match` header allows, or None when any version will do.
+
+    `if_match` is werkzeug's parsed ETags; tags that are not versions can never
+    match, so a header made only of those yields an empty list.
+    """
+    if not if_match or if_match.star_tag:
+        return None
+    return [int(tag) for tag in if_match.as_set() if tag.isdigit()]
+
+
+def precondition(expected, column='version'):
+    """(sql, params) to AND onto an UPDATE/DELETE's WHERE clause"""
+    if expected is None:
+        return '', ()
+    return f' AND {column} IN (SELECT value FROM json_each(?))', (json.dumps(expected),)
+
+
+def current_version(conn, table, row_id):
+    """A row's version, or None if it does not exist"""
+    row = conn.execute(f'SELECT version FROM {table} WHERE id = ?', (row_id,)).fetchone()
+    return row[0] if row else None
+
+
+def with_etag(response, version):
+    """Set the response's ETag to a row version"""
+    response.set_etag(str(version))
+    return response
@@ -0,0 +1,245 @@
+"""
+Single-writer commit queue with group commit.
+
+Mutating requests are funnelled through one writer thread per process. Each
+queued operation runs on the writer's connection inside its own SAVEPOINT, so
+a failing request only rolls back its own changes. Operations that arrive
+within GROUP_WINDOW of the first one share a transaction and a single commit,
+turning a burst of writes into one fsync. Callers wait on a future that
+resolves only after their group has committed. A caller that gives up after
+WRITE_TIMEOUT cancels its operation if the writer has not started it yet;
+an operation that has already started is always waited for, so a timeout
+means the write did not and will not happen.
+
+Contention with other processes is handled by the connection busy timeout
+plus a jittered retry around BEGIN and COMMIT.
+
+Request writes, including a whole /api/batch containing writes, go through
+the queue. Background jobs and maintenance tasks do not. Their bookkeeping is
+single-row updates whose heartbeats must not wait behind the queue, and
+their handlers run too long to hold the writer, or, like VACUUM and
+checkpoints, cannot run inside its transaction. Those rely on the busy
+timeout alone.
+"""
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import metrics
+
+# How long the writer keeps a transaction open to collect more operations,
+# and the most operations committed together
+GROUP_WINDOW = 0.002
+MAX_GROUP_SIZE = 64
+
+# Jittered exponential backoff for SQLITE_BUSY on BEGIN/COMMIT
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.01
+
+# How long a request waits for its write to start before cancelling it
+WRITE_TIMEOUT = 30
+
+_local = threading.local()
+
+
+class WriteTimeout(Exception):
+    """The operation waited WRITE_TIMEOUT in the queue and was cancelled unrun"""
+
+
+class WriterConnection:
+    """Connection handed to handlers on the writer thread.
+
+    commit() is deferred to the group commit and rollback() only undoes the
+    current operation's savepoint.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.rolled_back = False
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rolled_back = True
+        self._conn.execute('ROLLBACK TO write_op')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def current_connection():
+    """The writer's connection if called from inside a queued operation"""
+    return getattr(_local, 'connection', None)
+
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def with_busy_retry(operation, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+    """Run operation(), retrying SQLITE_BUSY with jittered exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            metrics.incr('writer.busy_retries')
+            time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+
+
+class _Operation:
+    __slots__ = ('fn', 'future', 'result', 'error', 'enqueued')
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+        self.result = None
+        self.error = None
+        self.enqueued = time.perf_counter()
+
+
+class WriteCoordinator:
+    """Owns the writer thread and its connection"""
+
+    def __init__(self, connect, database_key, failed=None):
+        # connect() opens a connection; database_key() identifies the current
+        # database so the writer reconnects when it changes; failed(result)
+        # says whether an operation's result should roll its savepoint back
+        self.connect = connect
+        self.database_key = database_key
+        self.failed = failed or (lambda result: False)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+        self._conn_key = None
+        metrics.set_gauge('writer.queue_depth', self._queue.qsize)
+
+    def submit(self, fn):
+        """Run fn() on the writer thread and return its result once committed.
+
+        Raises WriteTimeout if fn() had not started within WRITE_TIMEOUT; it
+        is then cancelled and never runs.
+        """
+        self._ensure_started()
+        operation = _Operation(fn)
+        self._queue.put(operation)
+        try:
+            return operation.future.result(timeout=WRITE_TIMEOUT)
+        except FutureTimeout:
+            if operation.future.cancel():
+                metrics.incr('writer.cancelled')
+                raise WriteTimeout(
+                    f"Write did not start within {WRITE_TIMEOUT} s and was cancelled"
+                ) from None
+            # Already running: it commits or fails with its group
+            return operation.future.result()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            # A forked worker needs its own thread and queue
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._conn = None
+            metrics.set_gauge('writer.queue_depth', self._queue.qsize)
+            self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def _connection(self):
+        key = self.database_key()
+        if self._conn is None or self._conn_key != key:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = self.connect()
+            # Transactions are managed explicitly below
+            self._conn.isolation_level = None
+            self._conn_key = key
+        return self._conn
+
+    def _loop(self):
+        work = self._queue
+        while True:
+            first = work.get()
+            # Callers that timed out cancelled their operations; skip those
+            if not first.future.set_running_or_notify_cancel():
+                continue
+            group = [first]
+            try:
+                conn = self._connection()
+                with_busy_retry(lambda: conn.execute('BEGIN IMMEDIATE'))
+            except Exception as e:
+                self._conn = None
+                first.future.set_exception(e)
+                continue
+
+            try:
+                self._run(conn, first)
+                deadline = time.perf_counter() + GROUP_WINDOW
+                while len(group) < MAX_GROUP_SIZE:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        operation = work.get(timeout=remaining) if remaining > 0 else work.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not operation.future.set_running_or_notify_cancel():
+                        continue
+                    group.append(operation)
+                    self._run(conn, operation)
+
+                started = time.perf_counter()
+                with_busy_retry(lambda: conn.execute('COMMIT'))
+            except Exception as e:
+                self._abort(conn, group, e)
+                continue
+
+            finished = time.perf_counter()
+            metrics.incr('writer.commits')
+            metrics.incr('writer.operations', len(group))
+            metrics.observe('writer.group_size', len(group), buckets=(1, 2, 4, 8, 16, 32, 64))
+            metrics.observe('writer.commit_ms', (finished - started) * 1000)
+            for operation in group:
+                metrics.observe('writer.latency_ms', (finished - operation.enqueued) * 1000)
+                if operation.error is not None:
+                    operation.future.set_exception(operation.error)
+                else:
+                    operation.future.set_result(operation.result)
+
+    def _abort(self, conn, group, error):
+        """Roll the group back and fail every operation in it"""
+        try:
+            conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            self._conn = None
+        metrics.incr('writer.commit_failures')
+        for operation in group:
+            operation.future.set_exception(error)
+
+    def _run(self, conn, operation):
+        """Run one operation inside its own savepoint"""
+        shared = WriterConnection(conn)
+        _local.connection = shared
+        conn.execute('SAVEPOINT write_op')
+        try:
+            operation.result = operation.fn()
+            if self.failed(operation.result) and not shared.rolled_back:
+                conn.execute('ROLLBACK TO write_op')
+        except Exception as e:
+            operation.error = e
+            conn.execute('ROLLBACK TO write_op')
+            metrics.incr('writer.operation_errors')
+        finally:
+            conn.execute('RELEASE write_op')
+            _local.connection = None